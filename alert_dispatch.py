@@ -0,0 +1,497 @@
+"""
+SupplySentinel Alert Dispatch
+Durable outbound queue and background sender for critical alerts
+
+The dispatcher stage only enqueues: submit() appends the alert to a journal
+(logs/outbox.jsonl) and returns. A background thread groups pending alerts
+per sink and recipient, waits up to `window` seconds so a burst of alerts
+becomes one digest, delivers it, and retries failures with exponential
+backoff. Undelivered alerts in the journal are re-queued on start-up.
+
+One process owns a journal at a time (an exclusive lock on <journal>.lock).
+When the CLI, --serve and the Streamlit server run side by side, the first
+takes logs/outbox.jsonl and the others journal to logs/outbox.<pid>-<n>.jsonl.
+A journal whose owner has exited is adopted by the next dispatcher to start,
+so its undelivered alerts are sent exactly once.
+
+Sinks (configured from the environment by dispatcher_from_env):
+    FileSink     SENTINEL_ALERT_FILE (default logs/alerts.jsonl, recipient "procurement")
+    WebhookSink  SENTINEL_ALERT_WEBHOOK=https://...
+    SmtpSink     SENTINEL_SMTP_HOST, SENTINEL_SMTP_PORT, SENTINEL_SMTP_USER, SENTINEL_SMTP_PASSWORD,
+                 SENTINEL_ALERT_EMAIL_FROM, SENTINEL_ALERT_EMAILS (comma-separated recipients)
+    MemorySink   in-process stand-in for any of the above (tests, benchmarks)
+
+Delivery timings land in stage_metrics as alert_send (per digest) and
+alert_delivery (enqueue to delivered, per alert and recipient).
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from logging_config import LOGS_DIR, dispatcher_logger, log_context
+from stage_metrics import registry as stage_registry
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+OUTBOX_FILE = os.path.join(LOGS_DIR, "outbox.jsonl")
+ALERTS_FILE = os.path.join(LOGS_DIR, "alerts.jsonl")
+
+# Seconds an alert may wait for others to the same recipient before its digest is sent
+DEFAULT_WINDOW = 30.0
+DEFAULT_MAX_ATTEMPTS = 5
+# Journal is rewritten once it is this large and nothing is pending
+COMPACT_BYTES = 1 << 20
+
+
+def _try_lock(journal_path):
+    """Open file holding the exclusive lock on a journal, or None while another dispatcher owns it"""
+    directory = os.path.dirname(journal_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(journal_path + ".lock", "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def render_digest(alerts):
+    """(subject, plain-text body) for a list of alert dicts"""
+    if len(alerts) == 1:
+        subject = f"🚨 CRITICAL supply risk: {alerts[0]['material']} ({alerts[0]['location']})"
+    else:
+        subject = f"🚨 {len(alerts)} critical supply risks"
+    lines = []
+    for alert in alerts:
+        lines.append(f"- {alert['material']} from {alert['location']}: {alert['score']}/10 — {alert['reason']}")
+    return subject, "SupplySentinel critical alerts\n\n" + "\n".join(lines) + "\n"
+
+
+class FileSink:
+    """Appends one JSON line per digest; the default sink and a local stand-in for the others"""
+    name = "file"
+
+    def __init__(self, path=ALERTS_FILE):
+        self.path = path
+
+    def send(self, recipient, alerts):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        subject, _ = render_digest(alerts)
+        record = {"sent_at": time.time(), "to": recipient, "subject": subject, "alerts": alerts}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POSTs {"recipient", "subject", "text", "alerts"} as JSON; any non-2xx status is a failure"""
+    name = "webhook"
+
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, recipient, alerts):
+        import urllib.request
+        subject, text = render_digest(alerts)
+        payload = json.dumps({"recipient": recipient, "subject": subject, "text": text, "alerts": alerts}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=payload, headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise OSError(f"webhook returned HTTP {response.status}")
+
+
+class SmtpSink:
+    """One email per digest over SMTP (STARTTLS unless use_tls=False)"""
+    name = "smtp"
+
+    def __init__(self, host, port=587, sender="supplysentinel@localhost", username=None, password=None,
+                 use_tls=True, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, recipient, alerts):
+        import smtplib
+        from email.message import EmailMessage
+        subject, text = render_digest(alerts)
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = recipient
+        message.set_content(text)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as server:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password or "")
+            server.send_message(message)
+
+
+class MemorySink:
+    """Keeps digests in memory; fails the first `fail_times` sends (retry tests)"""
+
+    def __init__(self, name="memory", fail_times=0, delay=0.0):
+        self.name = name
+        self.fail_times = fail_times
+        self.delay = delay
+        self.digests = []  # (recipient, alerts)
+
+    def send(self, recipient, alerts):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise OSError(f"{self.name} sink unavailable")
+        self.digests.append((recipient, list(alerts)))
+
+
+class Delivery:
+    """One alert for one sink/recipient"""
+    __slots__ = ("alert", "sink", "recipient", "queued_at", "attempts", "next_attempt")
+
+    def __init__(self, alert, sink, recipient, queued_at):
+        self.alert = alert
+        self.sink = sink
+        self.recipient = recipient
+        self.queued_at = queued_at
+        self.attempts = 0
+        self.next_attempt = 0.0
+
+
+class AlertDispatcher:
+    """
+    Journaled queue plus one sender thread
+
+    Args:
+        routes: list of (sink, [recipients])
+        journal_path: append-only outbox journal (None keeps the queue in memory only); if another
+            process owns it, this dispatcher journals to a per-process file beside it instead
+        window: seconds to coalesce alerts per recipient into one digest
+        max_attempts: deliveries failing this often are dropped and logged
+        retry_base: first retry delay in seconds, doubled per attempt
+    """
+
+    def __init__(self, routes, journal_path=OUTBOX_FILE, window=DEFAULT_WINDOW,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_base=2.0, registry=None):
+        self.routes = routes
+        self.sinks = {sink.name: sink for sink, _ in routes}
+        self.journal_path = journal_path
+        self.shared_path = journal_path
+        self.window = window
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.registry = registry or stage_registry
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._in_flight = 0
+        self._flush = False
+        self._stopping = False
+        self._journal = None
+        self._lock_file = None
+        self.counts = {"queued": 0, "delivered": 0, "digests": 0, "failed_attempts": 0, "dead": 0}
+        self.send_seconds = 0.0
+
+        if journal_path:
+            self._claim_journal()
+            self._recover()
+        self._thread = threading.Thread(target=self._run, name="alert-dispatch", daemon=True)
+        self._thread.start()
+
+    # ---- producer side -----------------------------------------------------
+
+    def submit(self, outcome, alert_id):
+        """Queue a critical DispatchOutcome for every route; returns immediately"""
+        alert = {"alert_id": alert_id, "material": outcome.material, "location": outcome.location,
+                 "score": outcome.score, "reason": outcome.reason, "created_at": time.time()}
+        now = time.time()
+        deliveries = [Delivery(alert, sink.name, recipient, now) for sink, recipients in self.routes for recipient in recipients]
+        with self._cond:
+            self._append({"op": "enqueue", "alert": alert, "to": [[d.sink, d.recipient] for d in deliveries], "at": now})
+            self._pending.extend(deliveries)
+            self.counts["queued"] += len(deliveries)
+            self._cond.notify()
+        return alert
+
+    def flush(self, timeout=None):
+        """Send everything now, ignoring the window; True once nothing is pending or in flight"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush = True
+            self._cond.notify()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._flush = False
+            return True
+
+    def close(self, timeout=10.0):
+        """Flush, stop the sender and close the journal; undelivered alerts stay in the journal"""
+        delivered = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+        with self._cond:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._lock_file is not None:
+                self._lock_file.close()  # releases the journal for the next dispatcher
+                self._lock_file = None
+        return delivered
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counts)
+            stats["pending"] = len(self._pending) + self._in_flight
+        stats["deliveries_per_sec"] = stats["delivered"] / self.send_seconds if self.send_seconds else None
+        return stats
+
+    # ---- journal -----------------------------------------------------------
+
+    def _append(self, record):
+        if not self.journal_path:
+            return
+        if self._journal is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._journal.flush()
+
+    def _claim_journal(self):
+        """Lock the configured journal, or a fresh per-process one beside it if another process holds it"""
+        self._lock_file = _try_lock(self.journal_path)
+        if self._lock_file is not None:
+            return
+        base, ext = os.path.splitext(self.journal_path)
+        n = 0
+        while self._lock_file is None:
+            n += 1
+            path = f"{base}.{os.getpid()}-{n}{ext}"
+            if not os.path.exists(path):
+                self._lock_file = _try_lock(path)
+        dispatcher_logger.info("%s is in use by another process; journaling alerts to %s", self.journal_path, path)
+        self.journal_path = path
+
+    def _orphans(self):
+        """Per-process journals beside the shared one whose owner has exited, each with its lock (now held)"""
+        base, ext = os.path.splitext(self.shared_path)
+        orphans = []
+        for path in sorted(glob.glob(glob.escape(base) + ".*" + ext)):
+            if path == self.journal_path or not re.fullmatch(r"\d+-\d+", path[len(base) + 1:-len(ext) or None]):
+                continue
+            lock_file = _try_lock(path)
+            if lock_file is not None:
+                orphans.append((path, lock_file))
+        return orphans
+
+    @staticmethod
+    def _read_pending(path, pending):
+        """Fold one journal into pending: {(alert_id, sink, recipient): (alert, queued_at)}"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final line
+                    if record["op"] == "enqueue":
+                        for sink, recipient in record["to"]:
+                            pending[(record["alert"]["alert_id"], sink, recipient)] = (record["alert"], record["at"])
+                    else:
+                        pending.pop((record["alert_id"], record["sink"], record["recipient"]), None)
+        except OSError:
+            pass
+
+    def _recover(self):
+        """Re-queue deliveries that were enqueued but never sent or dropped, here or in an abandoned per-process journal"""
+        pending = {}
+        self._read_pending(self.journal_path, pending)
+        orphans = self._orphans()
+        for path, _ in orphans:
+            self._read_pending(path, pending)
+
+        # Rewrite the journal with just the survivors (atomic), so it never grows without bound
+        self._pending = [Delivery(alert, sink, recipient, queued_at)
+                         for (_, sink, recipient), (alert, queued_at) in pending.items() if sink in self.sinks]
+        self._rewrite_journal()
+        for path, lock_file in orphans:
+            # Adopted: its deliveries are in our journal now
+            for leftover in (path, path + ".lock"):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+            lock_file.close()
+        if self._pending:
+            dispatcher_logger.warning("Re-queued %d undelivered alert deliveries from %s", len(self._pending), self.journal_path)
+            self.counts["queued"] += len(self._pending)
+
+    def _rewrite_journal(self):
+        tmp_path = self.journal_path + ".tmp"
+        by_alert = defaultdict(list)
+        for delivery in self._pending:
+            by_alert[delivery.alert["alert_id"]].append(delivery)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for deliveries in by_alert.values():
+                record = {"op": "enqueue", "alert": deliveries[0].alert,
+                          "to": [[d.sink, d.recipient] for d in deliveries], "at": deliveries[0].queued_at}
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.journal_path)
+
+    # ---- sender thread -----------------------------------------------------
+
+    def _take_batches(self, now):
+        """Pop due deliveries grouped by (sink, recipient); returns (batches, seconds until next due)"""
+        groups = defaultdict(list)
+        for delivery in self._pending:
+            if delivery.next_attempt <= now:
+                groups[(delivery.sink, delivery.recipient)].append(delivery)
+
+        batches, wait = [], None
+        for key, deliveries in groups.items():
+            due_at = min(d.queued_at for d in deliveries) + self.window
+            if self._flush or self._stopping or any(d.attempts for d in deliveries) or due_at <= now:
+                batches.append((key, deliveries))
+            else:
+                wait = due_at - now if wait is None else min(wait, due_at - now)
+        for delivery in self._pending:
+            if delivery.next_attempt > now:
+                retry_in = delivery.next_attempt - now
+                wait = retry_in if wait is None else min(wait, retry_in)
+
+        taken = {id(d) for _, deliveries in batches for d in deliveries}
+        self._pending = [d for d in self._pending if id(d) not in taken]
+        self._in_flight += len(taken)
+        return batches, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batches, wait = self._take_batches(time.time())
+                while not batches:
+                    if self._stopping:
+                        return
+                    if not self._pending and not self._in_flight:
+                        self._flush = False
+                        self._maybe_compact()
+                        self._cond.notify_all()
+                    self._cond.wait(wait)
+                    batches, wait = self._take_batches(time.time())
+
+            for (sink_name, recipient), deliveries in batches:
+                self._deliver(sink_name, recipient, deliveries)
+
+    def _deliver(self, sink_name, recipient, deliveries):
+        alerts = [d.alert for d in deliveries]
+        started = time.perf_counter()
+        try:
+            self.sinks[sink_name].send(recipient, alerts)
+            error = None
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+        self.registry.observe("alert_send", "error" if error else "ok", elapsed)
+
+        now = time.time()
+        with self._cond:
+            self._in_flight -= len(deliveries)
+            self.send_seconds += elapsed
+            if error is None:
+                self.counts["delivered"] += len(deliveries)
+                self.counts["digests"] += 1
+                for delivery in deliveries:
+                    self._append({"op": "sent", "alert_id": delivery.alert["alert_id"], "sink": sink_name,
+                                  "recipient": recipient, "at": now})
+                    self.registry.observe("alert_delivery", "ok", now - delivery.queued_at)
+                dispatcher_logger.info("Alert digest delivered to %s via %s (%d alerts, %.0f ms)", recipient, sink_name,
+                                       len(deliveries), elapsed * 1000, extra=log_context("dispatcher"))
+            else:
+                self.counts["failed_attempts"] += 1
+                for delivery in deliveries:
+                    delivery.attempts += 1
+                    if delivery.attempts >= self.max_attempts:
+                        self.counts["dead"] += 1
+                        self._append({"op": "dead", "alert_id": delivery.alert["alert_id"], "sink": sink_name,
+                                      "recipient": recipient, "at": now, "error": str(error)})
+                        self.registry.observe("alert_delivery", "error", now - delivery.queued_at)
+                        dispatcher_logger.error("Alert delivery abandoned after %d attempts — %s via %s to %s: %s",
+                                                delivery.attempts, delivery.alert["alert_id"], sink_name, recipient, error,
+                                                extra=log_context("dispatcher", delivery.alert["material"], delivery.alert["location"]))
+                    else:
+                        delivery.next_attempt = now + self.retry_base * 2 ** (delivery.attempts - 1)
+                        self._pending.append(delivery)
+                dispatcher_logger.warning("Alert digest to %s via %s failed (%d alerts): %s", recipient, sink_name,
+                                          len(deliveries), error, extra=log_context("dispatcher"))
+            self._cond.notify_all()
+
+    def _maybe_compact(self):
+        if self._journal is None or self._journal.tell() < COMPACT_BYTES:
+            return
+        self._journal.close()
+        self._journal = None
+        self._rewrite_journal()
+
+
+def routes_from_env():
+    """Sinks and recipients from SENTINEL_ALERT_* / SENTINEL_SMTP_* (file sink when nothing is set)"""
+    routes = []
+    webhook = os.getenv("SENTINEL_ALERT_WEBHOOK")
+    if webhook:
+        routes.append((WebhookSink(webhook), ["webhook"]))
+    smtp_host = os.getenv("SENTINEL_SMTP_HOST")
+    emails = [e.strip() for e in os.getenv("SENTINEL_ALERT_EMAILS", "").split(",") if e.strip()]
+    if smtp_host and emails:
+        routes.append((SmtpSink(smtp_host, int(os.getenv("SENTINEL_SMTP_PORT", "587")),
+                                os.getenv("SENTINEL_ALERT_EMAIL_FROM", "supplysentinel@localhost"),
+                                os.getenv("SENTINEL_SMTP_USER"), os.getenv("SENTINEL_SMTP_PASSWORD")), emails))
+    alert_file = os.getenv("SENTINEL_ALERT_FILE")
+    if alert_file or not routes:
+        routes.append((FileSink(alert_file or ALERTS_FILE), ["procurement"]))
+    return routes
+
+
+def dispatcher_from_env():
+    window = float(os.getenv("SENTINEL_ALERT_WINDOW", DEFAULT_WINDOW))
+    return AlertDispatcher(routes_from_env(), window=window)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_dispatcher():
+    """Process-wide dispatcher for long-lived hosts (the Streamlit server); closed at exit"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            import atexit
+            _shared = dispatcher_from_env()
+            atexit.register(_shared.close)
+        return _shared
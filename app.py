@@ -1,18 +1,73 @@
 import streamlit as st
 import json
 import os
+import re
+import secrets
 import time
 import logging
 from datetime import datetime
-from google import genai
+from itertools import chain
 from google.genai import types
 from dotenv import load_dotenv
 
 # Import logging configuration
-from logging_config import setup_logging, config_logger, watchman_logger, analyst_logger, dispatcher_logger, get_recent_logs, clear_log_buffer
+from logging_config import setup_logging, log_context, config_logger, dispatcher_logger, get_recent_logs, clear_log_buffer
 
 # Import metrics tracker
-from metrics_tracker import MetricsTracker
+from metrics_tracker import AssessmentHistory, MetricsTracker
+
+# Per-supplier EWMA, z-score anomalies, volatility and trend over the assessment history
+from risk_trends import DEFAULT_WINDOW, shared_trends
+
+# Import stage metrics (latency histograms, call/token/retry counters)
+from stage_metrics import registry as stage_registry, time_stage
+
+# Token accounting per supplier/stage and the per-cycle token budget
+from token_ledger import TokenLedger, budget_from_env
+
+# cProfile + tracemalloc per analysis run (Profile Mode)
+from profiling import CycleProfiler, ProfilerBusy
+
+# Record/replay of model calls (SENTINEL_CASSETTE / SENTINEL_CASSETTE_MODE)
+from cassette import make_client, replaying
+
+# Per-supplier trace spans (Chrome trace-event export), captured per analysis run
+from tracing import TraceBuffer, tracer, span
+
+# Canonical material/location names
+from normalize import normalizer
+
+# Durable outbound alert queue, one background sender per server process
+from alert_dispatch import shared_dispatcher
+
+# Watchman → Analyst → Dispatcher pipeline shared with the CLI
+from sentinel_engine import EngineCallbacks, MonitoringEngine
+
+# Process-wide keep-alive connection pool behind every live model client
+from http_pool import pool_stats
+
+# Model calls spread over several API keys (comma-separated in the sidebar or GEMINI_API_KEY)
+from key_pool import key_pool_stats
+
+# Shared businesses → materials → countries graph; a pair scanned for one business serves all of them
+from supply_graph import shared_graph
+
+# Append-only analysis progress, so a restarted instance can resume an interrupted run
+from checkpoint import CHECKPOINTS_DIR, CycleCheckpoint, prune_checkpoints
+
+# Filter/sort/paginate/aggregate view for catalogs too large for one card per supplier
+from results_catalog import CARD_LIMIT, GROUP_LIMIT, PAGE_SIZES, SORT_FIELDS, STATUSES, ResultsCatalog, group_counts, paginate
+
+# One checkpoint per browser session (streamlit-<run id>.jsonl); abandoned ones are dropped after a day
+CHECKPOINT_PREFIX = "streamlit-"
+CHECKPOINT_TTL = 24 * 3600
+_RUN_ID_RE = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
+# Seconds between live metric redraws while a large catalog is scanned
+METRICS_REFRESH = 0.5
+
+# Spans kept from a session's last analysis run (Diagnostics page)
+SESSION_TRACE_EVENTS = 50_000
 
 # Load environment variables
 load_dotenv()
@@ -234,9 +289,10 @@ def load_custom_css():
     """, unsafe_allow_html=True)
 
 class StreamlitConfigAgent:
-    def __init__(self, api_key):
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, api_key, ledger=None):
+        self.client = make_client(api_key)
         self.model_id = "gemini-2.5-flash"
+        self.ledger = ledger or TokenLedger()
 
     def generate_suppliers(self, business_context: str):
         system_instruction = """You are a Global Supply Chain Expert specializing in materials sourcing. 
@@ -258,194 +314,60 @@ class StreamlitConfigAgent:
         This simulates industry-standard dependencies to provide instant risk coverage without requiring sensitive data uploads.
         """
         
-        try:
-            config_logger.debug("Dependency mapping initiated")
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    response_mime_type="application/json"
-                )
-            )
-            suppliers = json.loads(response.text)
-            config_logger.info(f"Dependency mapping complete — {len(suppliers)} dependencies extracted")
-            return suppliers
-        except Exception as e:
-            config_logger.error(f"Error generating suppliers: {str(e)}", exc_info=True)
-            st.error(f"Error generating suppliers: {e}")
-            return []
-
-class StreamlitSentinel:
-    def __init__(self, api_key, debug_mode=True):
-        self.client = genai.Client(api_key=api_key)
-        self.model_id = "gemini-2.5-flash"
-        self.debug_mode = debug_mode
-        self.history_file = "alert_history.json"
-        self.alert_history = self._load_history()
-        
-        self.search_tool = types.Tool(
-            google_search=types.GoogleSearch()
-        )
-
-    def _load_history(self):
-        if os.path.exists(self.history_file):
+        with time_stage("config") as timer:
             try:
-                with open(self.history_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                return set()
-        return set()
+                config_logger.debug("Dependency mapping initiated", extra=log_context("config"))
+                with span("generate_content", model=self.model_id):
+                    response = self.client.models.generate_content(
+                        model=self.model_id,
+                        contents=prompt,
+                        config=types.GenerateContentConfig(
+                            system_instruction=system_instruction,
+                            response_mime_type="application/json"
+                        )
+                    )
+                self.ledger.record(timer.stage, response)
+                # Canonical names; variant spellings of the same dependency collapse into one
+                suppliers = normalizer.suppliers(json.loads(response.text))
+                config_logger.info("Dependency mapping complete — %d dependencies extracted", len(suppliers),
+                                   extra=log_context("config"))
+                return suppliers
+            except Exception as e:
+                timer.outcome = "error"
+                config_logger.error("Error generating suppliers: %s", str(e), exc_info=True, extra=log_context("config"))
+                st.error(f"Error generating suppliers: {e}")
+                return []
 
-    def _save_history(self):
-        with open(self.history_file, 'w') as f:
-            json.dump(list(self.alert_history), f)
+class StreamlitCallbacks(EngineCallbacks):
+    """Renders engine progress into one status placeholder (replaces per-stage spinners)"""
 
-    def watchman_agent(self, material, location, retry_without_location=False):
-        if retry_without_location:
-            # Retry with broader search (material only)
-            prompt = f"""
-            Find recent logistics, weather, or political news affecting {material} supply globally.
-            Focus on strikes, shortages, or natural disasters in the last 7 days.
-            """
-            watchman_logger.info(f"Retrying search with broader query (material-only): {material}")
-        else:
-            # Normal search with location
-            prompt = f"""
-            Find recent logistics, weather, or political news affecting {material} supply from {location}.
-            Focus on strikes, shortages, or natural disasters in the last 7 days.
-            """
-            watchman_logger.debug(f"Initiating search for {material} in {location}")
-        
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    tools=[self.search_tool],
-                    response_mime_type="text/plain"
-                )
-            )
-            result = response.text
-            article_count = len([line for line in result.split('\n') if line.strip()])
-            
-            if retry_without_location:
-                watchman_logger.info(f"Retry search returned {article_count} data points for {material}")
-            else:
-                watchman_logger.info(f"Search returned {article_count} data points for {material} in {location}")
-            
-            return result
-        except Exception as e:
-            watchman_logger.error(f"Search error for {material} in {location}: {str(e)}", exc_info=True)
-            return f"Search error: {str(e)}"
+    MESSAGES = {
+        "watchman": "🔍 Watchman scanning: {material} in {location}...",
+        "watchman_retry": "🔄 Agent retrying with broader search: {material}...",
+        "analyst": "📊 Analyst evaluating risk: {material}...",
+        "dispatcher": "✉️ Dispatcher reviewing: {material}...",
+    }
 
-    def analyst_agent(self, material, location, search_data):
-        if not search_data or "error" in search_data.lower():
-            analyst_logger.warning(f"Insufficient data for analysis: {material} in {location}")
-            return None
+    def __init__(self):
+        self.status = None
 
-        prompt = f"""
-        CONTEXT: You are a Supply Chain Risk Officer.
-        INPUT DATA: {search_data}
-        TASK: Analyze risk for {material} from {location}.
-        
-        OUTPUT JSON:
-        - risk_score (0-10, where 10 is factory shutdown, 0 means no relevant information found)
-        - reason (1 sentence)
-        - action_needed (boolean)
-        - retry_search (boolean - true if score is 0 and a broader search might help)
-        """
+    def on_stage(self, stage, material, location):
+        if self.status is None:
+            self.status = st.empty()
+        self.status.info(self.MESSAGES[stage].format(material=material, location=location))
 
-        try:
-            analyst_logger.debug(f"Risk analysis initiated for {material} in {location}")
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            risk_data = json.loads(response.text)
-            score = risk_data.get('risk_score', 0)
-            
-            # Log based on severity
-            if score == 0:
-                analyst_logger.warning(f"No relevant data found for {material} in {location} — Agent recommends retry")
-            elif score >= 7:
-                analyst_logger.critical(f"Risk score computed: {score}/10 — CRITICAL threat level for {material} in {location}")
-            elif score >= 5:
-                analyst_logger.warning(f"Risk score computed: {score}/10 — ELEVATED threat level for {material} in {location}")
-            else:
-                analyst_logger.info(f"Risk score computed: {score}/10 — NORMAL threat level for {material} in {location}")
-            
-            return risk_data
-        except Exception as e:
-            analyst_logger.error(f"Analysis error for {material} in {location}: {str(e)}", exc_info=True)
-            return None
+    def on_result(self, result):
+        if self.status is not None:
+            self.status.empty()
+
+class StreamlitSentinel:
+    def __init__(self, api_key, debug_mode=True, ledger=None):
+        self.debug_mode = debug_mode
+        self.engine = MonitoringEngine(make_client(api_key), ledger=ledger, callbacks=StreamlitCallbacks(),
+                                       outbox=shared_dispatcher())
 
     def check_item(self, material, location):
-        alert_id = f"{material}-{location}-{datetime.now().strftime('%Y-%m-%d')}"
-        
-        if alert_id in self.alert_history:
-            dispatcher_logger.debug(f"Duplicate alert suppressed: {alert_id}")
-            return {
-                "material": material,
-                "location": location,
-                "status": "skipped",
-                "message": "Already assessed today"
-            }
-        
-        # PHASE 1: Initial search with location
-        with st.spinner(f"🔍 Watchman scanning: {material} in {location}..."):
-            news = self.watchman_agent(material, location)
-        
-        # PHASE 2: Analyst evaluation
-        with st.spinner(f"📊 Analyst evaluating risk..."):
-            risk_data = self.analyst_agent(material, location, news)
-        
-        # PHASE 3: Agentic retry logic - if no relevant data found
-        if risk_data and risk_data.get('risk_score', 0) == 0 and risk_data.get('retry_search', False):
-            dispatcher_logger.info(f"Agent decision: Retry with broader search for {material}")
-            
-            with st.spinner(f"🔄 Agent retrying with broader search: {material}..."):
-                news_retry = self.watchman_agent(material, location, retry_without_location=True)
-            
-            with st.spinner(f"📊 Re-analyzing with new data..."):
-                risk_data = self.analyst_agent(material, location, news_retry)
-        
-        if not risk_data:
-            dispatcher_logger.info(f"No significant risks detected for {material} in {location}")
-            return {
-                "material": material,
-                "location": location,
-                "status": "safe",
-                "score": 0,
-                "message": "No significant risks detected"
-            }
-        
-        score = risk_data.get('risk_score', 0)
-        reason = risk_data.get('reason', 'Unknown')
-        
-        if score >= 7:
-            self.alert_history.add(alert_id)
-            self._save_history()
-            dispatcher_logger.critical(f"Critical alert sent — {material}-{location} — Score: {score}/10 — Reason: {reason}")
-            return {
-                "material": material,
-                "location": location,
-                "status": "critical",
-                "score": score,
-                "reason": reason
-            }
-        else:
-            dispatcher_logger.info(f"Risk monitored (non-critical) — {material}-{location} — Score: {score}/10")
-            return {
-                "material": material,
-                "location": location,
-                "status": "safe",
-                "score": score,
-                "reason": reason
-            }
+        return self.engine.check_item(material, location)
 
 def main():
     load_custom_css()
@@ -455,7 +377,7 @@ def main():
         st.markdown("### 🧭 Navigation")
         page = st.radio(
             "Select Page",
-            ["🛡️ Supply Chain Monitor", "📋 Live Logs"],
+            ["🛡️ Supply Chain Monitor", "📈 Risk Trends", "📋 Live Logs", "🩺 Diagnostics"],
             label_visibility="collapsed"
         )
         
@@ -466,7 +388,7 @@ def main():
             "GEMINI_API_KEY", 
             type="password", 
             value=os.getenv("GEMINI_API_KEY", ""),
-            help="Enter your Google Gemini API key"
+            help="Enter your Google Gemini API key. Several keys separated by commas spread calls across their quotas"
         )
         
         debug_mode = st.toggle(
@@ -475,6 +397,26 @@ def main():
             help="Run single cycle for testing"
         )
         
+        profile_mode = st.toggle(
+            "🔬 Profile Mode",
+            value=False,
+            help="Profile the analysis run (cProfile + tracemalloc); artifacts go to logs/profiles"
+        )
+        
+        try:
+            env_budget = budget_from_env() or 0
+        except ValueError as e:
+            st.warning(f"⚠️ {e}. Ignoring it.")
+            env_budget = 0
+        
+        token_budget = st.number_input(
+            "🪙 Token budget per cycle",
+            min_value=0,
+            value=env_budget,
+            step=10000,
+            help="0 = unlimited. Once reached, normal/low priority suppliers are deferred"
+        )
+        
         st.markdown("---")
         st.markdown("### ✨ Multi-Agent System")
         st.markdown("""
@@ -501,7 +443,7 @@ def main():
         
         st.markdown("---")
         
-        if api_key:
+        if api_key or replaying():
             st.markdown("""
             <div style='display: flex; align-items: center; gap: 0.5rem; color: #10B981;'>
                 <span style='font-size: 1.5rem;'>●</span>
@@ -519,8 +461,12 @@ def main():
     # Route to appropriate page
     if page == "📋 Live Logs":
         show_logs_page()
+    elif page == "📈 Risk Trends":
+        show_trends_page()
+    elif page == "🩺 Diagnostics":
+        show_diagnostics_page()
     else:
-        show_monitor_page(api_key, debug_mode)
+        show_monitor_page(api_key, debug_mode, token_budget, profile_mode)
 
 def show_logs_page():
     """Display live logs page"""
@@ -575,10 +521,10 @@ def show_logs_page():
     logs = get_recent_logs(limit=log_limit)
     
     if agent_filter:
-        logs = [log for log in logs if log['agent'] in agent_filter]
+        logs = [log for log in logs if log.agent in agent_filter]
     
     if level_filter:
-        logs = [log for log in logs if log['level'] in level_filter]
+        logs = [log for log in logs if log.level in level_filter]
     
     # Display log statistics
     if logs:
@@ -594,7 +540,7 @@ def show_logs_page():
             """, unsafe_allow_html=True)
         
         with stat_col2:
-            critical_count = len([log for log in logs if log['level'] == 'CRITICAL'])
+            critical_count = len([log for log in logs if log.level == 'CRITICAL'])
             st.markdown(f"""
             <div class='metric-card'>
                 <div class='metric-label'>🚨 Critical</div>
@@ -603,7 +549,7 @@ def show_logs_page():
             """, unsafe_allow_html=True)
         
         with stat_col3:
-            warning_count = len([log for log in logs if log['level'] == 'WARNING'])
+            warning_count = len([log for log in logs if log.level == 'WARNING'])
             st.markdown(f"""
             <div class='metric-card'>
                 <div class='metric-label'>⚠️ Warnings</div>
@@ -612,7 +558,7 @@ def show_logs_page():
             """, unsafe_allow_html=True)
         
         with stat_col4:
-            error_count = len([log for log in logs if log['level'] == 'ERROR'])
+            error_count = len([log for log in logs if log.level == 'ERROR'])
             st.markdown(f"""
             <div class='metric-card'>
                 <div class='metric-label'>❌ Errors</div>
@@ -626,7 +572,7 @@ def show_logs_page():
         st.markdown("### 📜 Log Entries")
         
         for log in reversed(logs):  # Show most recent first
-            level = log['level']
+            level = log.level
             
             # Color coding based on level
             if level == 'CRITICAL':
@@ -650,7 +596,7 @@ def show_logs_page():
                 border_color = '#3B82F6'
                 icon = 'ℹ️'
             
-            timestamp_str = log['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+            timestamp_str = log.timestamp.strftime('%Y-%m-%d %H:%M:%S')
             
             st.markdown(f"""
             <div style='
@@ -666,10 +612,10 @@ def show_logs_page():
                     <span style='font-size: 1.2rem;'>{icon}</span>
                     <span style='color: #94A3B8; font-size: 0.85rem;'>{timestamp_str}</span>
                     <span style='color: {border_color}; font-weight: 600;'>[{level}]</span>
-                    <span style='color: #3B82F6; font-weight: 600;'>[Agent.{log['agent']}]</span>
+                    <span style='color: #3B82F6; font-weight: 600;'>[Agent.{log.agent}]</span>
                 </div>
                 <div style='color: #F1F5F9; padding-left: 2rem;'>
-                    {log['message']}
+                    {log.message}
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -683,7 +629,392 @@ def show_logs_page():
         </div>
         """, unsafe_allow_html=True)
 
-def show_monitor_page(api_key, debug_mode):
+def show_diagnostics_page():
+    """Display per-stage latency histograms and call/token/retry counters"""
+    st.markdown("""
+    <div style='text-align: center; padding: 1rem 0 2rem 0;'>
+        <h1 style='font-size: 2.5rem; font-weight: 700; margin-bottom: 0.5rem; background: linear-gradient(135deg, #3B82F6 0%, #8B5CF6 100%); -webkit-background-clip: text; -webkit-text-fill-color: transparent;'>
+            🩺 Pipeline Diagnostics
+        </h1>
+        <p style='color: #94A3B8; font-size: 1.1rem;'>Where each cycle spends its time, across every session of this server process</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    with col2:
+        if st.button("🔄 Refresh", use_container_width=True):
+            st.rerun()
+    
+    with col3:
+        # Stage metrics are process-wide (and exported to Prometheus): reset only this session's view of them
+        if st.button("🗑️ Reset My View", use_container_width=True,
+                     help="Count from now on in this browser session; other sessions and /metrics are unaffected"):
+            st.session_state["metrics_baseline"] = stage_registry.snapshot()
+            st.session_state.pop("run_trace", None)
+            st.success("View reset!")
+            time.sleep(1)
+            st.rerun()
+    
+    baseline = st.session_state.get("metrics_baseline")
+    if baseline:
+        st.caption("Showing activity since you reset this view. Metrics are shared by every session on this server.")
+    rows = stage_registry.stage_summary(since=baseline)
+    counters = stage_registry.counter_values(since=baseline)
+    
+    if not rows:
+        st.info("No stage timings yet. Run a supply chain analysis to collect metrics.")
+        return
+    
+    model_calls = sum(value for name, _, value in counters if name == "model_calls")
+    tokens = sum(value for name, _, value in counters if name == "tokens")
+    retries = sum(value for name, _, value in counters if name == "retries")
+    errors = sum(row["count"] for row in rows if row["outcome"] == "error")
+    
+    stat_cols = st.columns(4)
+    for col, label, value, color in (
+        (stat_cols[0], "Model Calls", f"{model_calls:g}", "#3B82F6"),
+        (stat_cols[1], "Tokens", f"{tokens:,.0f}", "#8B5CF6"),
+        (stat_cols[2], "🔄 Retries", f"{retries:g}", "#F59E0B"),
+        (stat_cols[3], "❌ Errors", f"{errors}", "#EF4444"),
+    ):
+        with col:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>{label}</div>
+                <div class='metric-value' style='color: {color};'>{value}</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Bottleneck: the stage with the largest total time spent
+    slowest = max(rows, key=lambda row: row["total_s"])
+    st.markdown(f"""
+    <div class='premium-card'>
+        <div style='color: #94A3B8; font-size: 0.9rem;'>Bottleneck stage</div>
+        <div style='font-size: 1.4rem; font-weight: 600; color: #F1F5F9;'>{slowest['stage']} ({slowest['outcome']})</div>
+        <div style='color: #94A3B8; font-size: 0.9rem;'>{slowest['total_s']:.1f}s total over {slowest['count']} calls • p95 {slowest['p95_s']:.2f}s</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    st.markdown("### ⏱️ Stage Latency")
+    st.dataframe(
+        [{
+            "Stage": row["stage"],
+            "Outcome": row["outcome"],
+            "Count": row["count"],
+            "Mean (s)": round(row["mean_s"], 3),
+            "p50 (s)": round(row["p50_s"], 3),
+            "p95 (s)": round(row["p95_s"], 3),
+            "Total (s)": round(row["total_s"], 1),
+        } for row in rows],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    http = pool_stats()
+    if http:
+        st.markdown("### 🔌 Connection Pool")
+        st.caption(f"Shared by every agent in this process • up to {http['max_connections']} connections • "
+                   f"HTTP/2 {'on' if http['http2'] else 'off'}")
+        st.dataframe(
+            [{"Requests": http["requests"], "New connections": http["connections"], "Reused": http["reused"],
+              "Reuse ratio": f"{100 * (http['reuse_ratio'] or 0):.0f}%", "Connect time (s)": round(http["connect_s"], 3)}],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    keys = key_pool_stats()
+    if keys:
+        st.markdown("### 🔑 API Keys")
+        st.caption("Calls go to the key with the most per-minute quota left; throttled or rejected keys sit out a cooldown")
+        st.dataframe(
+            [{"Key": key["key"], "State": key["state"], "Calls": key["calls"],
+              "Last minute": f"{key['used']}/{key['rpm']}" if key["rpm"] else key["used"],
+              "Utilization": f"{100 * key['utilization']:.0f}%" if key["utilization"] is not None else "—",
+              "In flight": key["in_flight"], "429s": key["throttled"], "Rejected": key["rejected"],
+              "Back in (s)": round(key["back_in_s"]) if key["back_in_s"] else None}
+             for key in keys],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    st.markdown("### 🔢 Counters")
+    st.dataframe(
+        [{"Counter": name, "Labels": ", ".join(f"{k}={v}" for k, v in labels.items()), "Value": value}
+         for name, labels, value in counters],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    st.markdown("### 📤 Prometheus Export")
+    st.caption("Whole process since start-up, whatever this view was reset to")
+    prometheus_text = stage_registry.render_prometheus()
+    st.download_button("⬇️ Download metrics.prom", prometheus_text, file_name="metrics.prom", mime="text/plain")
+    with st.expander("Raw metrics"):
+        st.code(prometheus_text, language="text")
+    
+    st.markdown("### 🧵 Supplier Traces")
+    run_trace = st.session_state.get("run_trace")
+    if run_trace is None:
+        st.info("Run a supply chain analysis in this session to see its supplier traces.")
+        return
+    st.caption("Your last analysis run only")
+    events = run_trace.events()
+    suppliers = sorted((e for e in events if e["name"] == "supplier"), key=lambda e: e["dur"], reverse=True)
+    if suppliers:
+        # Time per span name inside each of the slowest supplier passes
+        breakdown = {}
+        for event in events:
+            if event["name"] != "supplier":
+                per_trace = breakdown.setdefault(event["args"]["trace_id"], {})
+                per_trace[event["name"]] = per_trace.get(event["name"], 0.0) + event["dur"] / 1e6
+        st.dataframe(
+            [{
+                "Trace": e["args"]["trace_id"],
+                "Material": e["args"].get("material"),
+                "Location": e["args"].get("location"),
+                "Total (s)": round(e["dur"] / 1e6, 3),
+                "Model calls (s)": round(breakdown.get(e["args"]["trace_id"], {}).get("generate_content", 0.0), 3),
+                "Retry (s)": round(breakdown.get(e["args"]["trace_id"], {}).get("retry", 0.0), 3),
+            } for e in suppliers[:20]],
+            use_container_width=True,
+            hide_index=True
+        )
+    st.download_button(
+        "⬇️ Download Chrome trace",
+        json.dumps(run_trace.chrome_trace()),
+        file_name=f"sentinel-trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+        mime="application/json",
+        help="Open in chrome://tracing or ui.perfetto.dev"
+    )
+
+def show_trends_page():
+    """Display per-supplier risk drift: EWMA, anomaly flags, volatility and trend slope"""
+    st.markdown("""
+    <div style='text-align: center; padding: 1rem 0 2rem 0;'>
+        <h1 style='font-size: 2.5rem; font-weight: 700; margin-bottom: 0.5rem; background: linear-gradient(135deg, #3B82F6 0%, #8B5CF6 100%); -webkit-background-clip: text; -webkit-text-fill-color: transparent;'>
+            📈 Risk Trends
+        </h1>
+        <p style='color: #94A3B8; font-size: 1.1rem;'>How each supplier's risk is drifting across every scan on record</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        anomalies_only = st.toggle("⚠️ Anomalies only", value=False,
+                                   help="Suppliers whose newest score is far outside their recent range")
+    
+    with col2:
+        if st.button("🔄 Refresh", use_container_width=True):
+            st.rerun()
+    
+    # Shared across reruns: only history lines appended since the last visit are read
+    trends = shared_trends()
+    stats = trends.stats()
+    
+    if not stats["suppliers"]:
+        st.info("No assessment history yet. Run a supply chain analysis to start collecting scores.")
+        return
+    
+    stat_cols = st.columns(4)
+    for col, label, value, color in (
+        (stat_cols[0], "Suppliers", f"{stats['suppliers']:,}", "#3B82F6"),
+        (stat_cols[1], "Days of History", f"{stats['days']:,}", "#8B5CF6"),
+        (stat_cols[2], "Scores", f"{stats['scores']:,}", "#10B981"),
+        (stat_cols[3], "⚠️ Anomalies", f"{stats['anomalies']}", "#EF4444"),
+    ):
+        with col:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>{label}</div>
+                <div class='metric-value' style='color: {color};'>{value}</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    st.markdown("### 🧭 Supplier Drift")
+    st.caption(f"z-score of the newest score against the preceding {DEFAULT_WINDOW} days; "
+               f"volatility and slope over the last {DEFAULT_WINDOW} days")
+    rows = trends.rows(limit=500, anomalies_only=anomalies_only)
+    st.dataframe(
+        [{
+            "": "⚠️" if row["anomaly"] else "",
+            "Material": row["material"],
+            "Location": row["location"],
+            "Last Scored": row["last_scored"],
+            "Score": row["score"],
+            "EWMA": row["ewma"],
+            "z-score": row["z"],
+            "Volatility": row["volatility"],
+            "Slope / day": row["slope_per_day"],
+            "Scans": row["observations"],
+        } for row in rows],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    if not rows:
+        return
+    
+    st.markdown("### 📉 Supplier History")
+    choice = st.selectbox("Supplier", range(len(rows)),
+                          format_func=lambda i: f"{rows[i]['material']} — {rows[i]['location']}")
+    series = trends.series(rows[choice]["material"], rows[choice]["location"])
+    st.line_chart(
+        {"Day": series["days"], "Score": series["score"], "EWMA": series["ewma"]},
+        x="Day",
+        y=["Score", "EWMA"],
+        color=["#3B82F6", "#F59E0B"]
+    )
+    flagged = [(day, score, z) for day, score, z, flag in
+               zip(series["days"], series["score"], series["z"], series["anomaly"]) if flag]
+    if flagged:
+        st.markdown("**⚠️ Anomalous scores**")
+        st.dataframe(
+            [{"Day": day, "Score": float(score), "z-score": round(float(z), 2)} for day, score, z in flagged],
+            use_container_width=True,
+            hide_index=True
+        )
+
+def render_result_card(result):
+    """One status card per supplier result (small catalogs, and the first critical alerts of large ones)"""
+    material = result.material
+    location = result.location
+    
+    if result.status == 'critical':
+        st.markdown(f"""
+        <div class='status-card critical'>
+            <div style='display: flex; align-items: start; gap: 1rem;'>
+                <div style='font-size: 2rem; line-height: 1;'>🚨</div>
+                <div style='flex: 1;'>
+                    <h3 style='margin: 0 0 0.5rem 0; color: #EF4444;'>CRITICAL: {material}</h3>
+                    <div style='display: grid; grid-template-columns: auto 1fr; gap: 0.5rem 1rem; font-size: 0.95rem;'>
+                        <span style='color: #94A3B8;'>📍 Location:</span>
+                        <span style='color: #F1F5F9; font-weight: 500;'>{location}</span>
+                        <span style='color: #94A3B8;'>⚠️ Risk Score:</span>
+                        <span style='color: #EF4444; font-weight: 700;'>{result.score}/10</span>
+                        <span style='color: #94A3B8;'>📋 Reason:</span>
+                        <span style='color: #F1F5F9;'>{result.reason}</span>
+                        <span style='color: #94A3B8;'>✉️ Dispatcher:</span>
+                        <span style='color: #10B981; font-weight: 500;'>Alert queued for procurement</span>
+                    </div>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    elif result.status == 'safe':
+        st.markdown(f"""
+        <div class='status-card safe'>
+            <div style='display: flex; align-items: center; gap: 1rem;'>
+                <div style='font-size: 1.5rem;'>✓</div>
+                <div style='flex: 1;'>
+                    <span style='font-weight: 600; color: #F1F5F9;'>{material}</span>
+                    <span style='color: #94A3B8;'> from </span>
+                    <span style='color: #10B981; font-weight: 500;'>{location}</span>
+                    <div style='color: #94A3B8; font-size: 0.9rem; margin-top: 0.25rem;'>
+                        Risk: {result.score}/10 • {result.reason or 'No risks'}
+                    </div>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class='status-card info'>
+            <div style='display: flex; align-items: center; gap: 1rem;'>
+                <div style='font-size: 1.5rem;'>ℹ️</div>
+                <div>
+                    <span style='font-weight: 600; color: #F1F5F9;'>{material}</span>
+                    <span style='color: #94A3B8;'> from {location} • {result.message}</span>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+def show_results_catalog(results):
+    """
+    Sortable, filterable grid of a scan's results with server-side paging and per-country/material counts
+    
+    Only one page of rows and GROUP_LIMIT group rows reach the browser, so render
+    time does not grow with the catalog.
+    """
+    catalog = ResultsCatalog(results)
+    counts = catalog.counts()
+    
+    st.markdown("### 🗂️ Results Catalog")
+    st.caption(" • ".join(f"{counts.get(status, 0):,} {status}" for status in STATUSES) + f" • {len(catalog):,} total")
+    
+    filter_cols = st.columns([2, 2, 1])
+    with filter_cols[0]:
+        statuses = st.multiselect("Status", STATUSES, default=[s for s in STATUSES if counts.get(s)], key="catalog_status")
+    with filter_cols[1]:
+        text = st.text_input("Search", placeholder="Material or location", key="catalog_search")
+    with filter_cols[2]:
+        min_score = st.number_input("Min score", min_value=0, max_value=10, value=0, key="catalog_min_score")
+    
+    sort_cols = st.columns([2, 1, 1])
+    with sort_cols[0]:
+        sort = st.selectbox("Sort by", list(SORT_FIELDS), format_func=SORT_FIELDS.get, key="catalog_sort")
+    with sort_cols[1]:
+        descending = st.toggle("Descending", value=True, key="catalog_descending")
+    with sort_cols[2]:
+        size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="catalog_page_size")
+    
+    rows = catalog.query(statuses, text, min_score, sort, descending)
+    # No max_value: a filter that shrinks the result set would invalidate the widget; paginate() clamps instead
+    requested = st.number_input("Page", min_value=1, value=1, key="catalog_page")
+    page_rows, page, pages = paginate(rows, requested, size)
+    
+    st.dataframe(
+        [{
+            "": {"critical": "🚨", "safe": "✓"}.get(row["status"], "ℹ️"),
+            "Material": row["material"],
+            "Location": row["location"],
+            "Status": row["status"],
+            "Score": row["score"],
+            "Reason": row["reason"] or row["message"],
+        } for row in page_rows],
+        use_container_width=True,
+        hide_index=True
+    )
+    first = (page - 1) * size + 1 if rows else 0
+    last = first + len(page_rows) - 1 if rows else 0
+    st.caption(f"Page {page} of {pages} • rows {first:,}–{last:,} of {len(rows):,} matching")
+    
+    by_location, by_material = st.tabs(["🌍 By country", "📦 By material"])
+    for tab, field, label in ((by_location, "location", "Country"), (by_material, "material", "Material")):
+        with tab:
+            st.dataframe(
+                [{label: group[field], "Suppliers": group["suppliers"], "🚨 Critical": group["critical"],
+                  "✓ Safe": group["safe"], "Other": group["other"], "Max score": group["max_score"],
+                  "Avg score": group["avg_score"]}
+                 for group in catalog.aggregate(field, rows, GROUP_LIMIT)],
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption(f"Top {GROUP_LIMIT} groups among the matching rows, most critical first")
+
+def session_checkpoint():
+    """
+    This session's checkpoint, keyed by a random run id kept in the page URL
+
+    The id survives a reload after an instance restart, so the same browser tab
+    finds its run again; without it nobody can see or resume another visitor's run.
+    """
+    run_id = st.session_state.get("run_id") or st.query_params.get("run")
+    if not run_id or not _RUN_ID_RE.fullmatch(run_id):
+        run_id = secrets.token_urlsafe(16)
+    st.session_state["run_id"] = run_id
+    if st.query_params.get("run") != run_id:
+        st.query_params["run"] = run_id
+    return CycleCheckpoint(os.path.join(CHECKPOINTS_DIR, f"{CHECKPOINT_PREFIX}{run_id}.jsonl"))
+
+
+def show_monitor_page(api_key, debug_mode, token_budget=0, profile_mode=False):
     """Display main supply chain monitor page"""
     
     # Hero
@@ -702,7 +1033,7 @@ def show_monitor_page(api_key, debug_mode):
     </div>
     """, unsafe_allow_html=True)
     
-    if not api_key:
+    if not api_key and not replaying():
         st.markdown("""
         <div class='premium-card' style='text-align: center; padding: 3rem;'>
             <div style='font-size: 3rem; margin-bottom: 1rem;'>🔑</div>
@@ -751,207 +1082,280 @@ def show_monitor_page(api_key, debug_mode):
             help="Complete workflow: Map → Monitor → Alert"
         )
     
-    if analyze_btn and business_input:
-        config_agent = StreamlitConfigAgent(api_key)
-        sentinel = StreamlitSentinel(api_key, debug_mode)
-        
-        # PHASE 1: Config Agent
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        st.markdown("### 🤖 Phase 1: Configuration Agent")
-        
-        with st.spinner("🔍 Analyzing business & mapping supply chain..."):
-            suppliers = config_agent.generate_suppliers(business_input)
-            time.sleep(1)
-        
-        if not suppliers:
-            st.error("❌ Failed to analyze. Please try again.")
-            return
+    # An instance restart (redeploy, scale-in) interrupted this session's run: offer to finish it
+    checkpoint = session_checkpoint()
+    unfinished = checkpoint.load()
+    resume_btn = False
+    if unfinished and not analyze_btn:
+        with col2:
+            resume_btn = st.button(
+                f"♻️ Resume interrupted analysis ({len(unfinished.results)}/{len(unfinished.suppliers)} done)",
+                use_container_width=True,
+                help=f"Continue the run for: {unfinished.context or 'previous business description'}"
+            )
+    
+    if (analyze_btn and business_input) or resume_btn:
+        ledger = TokenLedger(token_budget or None)
+        config_agent = StreamlitConfigAgent(api_key, ledger)
+        sentinel = StreamlitSentinel(api_key, debug_mode, ledger)
+        try:
+            profiler = CycleProfiler("streamlit").start() if profile_mode else None
+        except ProfilerBusy as e:
+            st.warning(f"🔬 {e}. Running without the profiler.")
+            profiler = None
         
-        st.markdown(f"""
-        <div class='success-banner'>
-            <span style='font-size: 2rem;'>✓</span>
-            <div>
-                <div style='font-weight: 600; color: #10B981; font-size: 1.1rem;'>Supply Chain Mapped!</div>
-                <div style='color: #94A3B8; font-size: 0.9rem;'>Identified {len(suppliers)} critical dependencies</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        # This session's node in the shared graph; only while its run is in progress
+        graph = shared_graph()
+        graph_id = f"streamlit:{st.session_state['run_id']}"
         
-        st.markdown("<br>", unsafe_allow_html=True)
+        # Spans of this run only, for this session's Diagnostics page
+        run_trace = TraceBuffer(SESSION_TRACE_EVENTS)
+        trace_token = tracer.capture(run_trace)
         
-        # Display map
-        st.markdown("""
-        <div class='premium-card'>
-            <h3 style='margin-top: 0;'>📊 Supply Chain Map</h3>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        cols = st.columns(len(suppliers))
-        for idx, item in enumerate(suppliers):
-            with cols[idx]:
-                st.markdown(f"""
-                <div class='metric-card' style='text-align: left; padding: 1rem;'>
-                    <div style='font-size: 1.5rem; margin-bottom: 0.5rem;'>📦</div>
-                    <div style='font-weight: 600; color: #3B82F6; margin-bottom: 0.25rem;'>{item['material']}</div>
-                    <div style='color: #94A3B8; font-size: 0.85rem;'>📍 {item['location']}</div>
+        # A rerun, stop or error mid-scan must not leave cProfile and tracemalloc on (or the business in the graph)
+        try:
+            # PHASE 1: Config Agent
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            st.markdown("### 🤖 Phase 1: Configuration Agent")
+            
+            if resume_btn:
+                # Supplier map comes from the checkpoint; no config call needed
+                checkpoint.reopen(unfinished)
+                suppliers, restored, todo = unfinished.suppliers, unfinished.results, unfinished.remaining()
+                dispatcher_logger.info("Resuming interrupted analysis — %d/%d suppliers already done",
+                                       len(restored), len(suppliers))
+            else:
+                with st.spinner("🔍 Analyzing business & mapping supply chain..."):
+                    suppliers = config_agent.generate_suppliers(business_input)
+                    time.sleep(1)
+                restored, todo = [], suppliers
+            
+            if not suppliers:
+                st.error("❌ Failed to analyze. Please try again.")
+                return
+            
+            if not resume_btn:
+                prune_checkpoints(CHECKPOINT_PREFIX, CHECKPOINT_TTL)
+                checkpoint.begin(1, suppliers, context=business_input)
+            
+            # Register the business; pairs another business already had scanned this cycle are not scanned again
+            graph.add_business(graph_id, suppliers)
+            shared = [r for r in (graph.result(item["material"], item["location"]) for item in todo) if r is not None]
+            if shared:
+                shared_keys = {(r.material, r.location) for r in shared}
+                todo = [item for item in todo if normalizer.key(item["material"], item["location"]) not in shared_keys]
+                dispatcher_logger.info("Supply graph — %d/%d dependencies already scanned this cycle for other businesses",
+                                       len(shared), len(suppliers))
+            
+            st.markdown(f"""
+            <div class='success-banner'>
+                <span style='font-size: 2rem;'>✓</span>
+                <div>
+                    <div style='font-weight: 600; color: #10B981; font-size: 1.1rem;'>Supply Chain Mapped!</div>
+                    <div style='color: #94A3B8; font-size: 0.9rem;'>Identified {len(suppliers)} critical dependencies</div>
                 </div>
-                """, unsafe_allow_html=True)
-        
-        # PHASE 2: Monitoring
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        st.markdown("### 👁️ Phase 2: Watchman → Analyst → Dispatcher")
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        st.markdown("#### 📈 Real-Time Metrics")
-        metric_cols = st.columns(4)
-        
-        with metric_cols[0]:
-            total_metric = st.empty()
-        with metric_cols[1]:
-            safe_metric = st.empty()
-        with metric_cols[2]:
-            critical_metric = st.empty()
-        with metric_cols[3]:
-            progress_metric = st.empty()
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        st.markdown("---")
-        st.markdown("#### 🔍 Risk Analysis Results")
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        results = st.container()
-        
-        safe_count = 0
-        critical_count = 0
-        risk_scores = []
-        
-        for idx, item in enumerate(suppliers):
-            material = item.get('material')
-            location = item.get('location')
+            </div>
+            """, unsafe_allow_html=True)
             
-            result = sentinel.check_item(material, location)
+            st.markdown("<br>", unsafe_allow_html=True)
             
-            # Track risk scores
-            if result['score'] is not None:
-                risk_scores.append(result['score'])
+            # Display map
+            st.markdown("""
+            <div class='premium-card'>
+                <h3 style='margin-top: 0;'>📊 Supply Chain Map</h3>
+            </div>
+            """, unsafe_allow_html=True)
             
-            with results:
-                if result['status'] == 'critical':
-                    st.markdown(f"""
-                    <div class='status-card critical'>
-                        <div style='display: flex; align-items: start; gap: 1rem;'>
-                            <div style='font-size: 2rem; line-height: 1;'>🚨</div>
-                            <div style='flex: 1;'>
-                                <h3 style='margin: 0 0 0.5rem 0; color: #EF4444;'>CRITICAL: {material}</h3>
-                                <div style='display: grid; grid-template-columns: auto 1fr; gap: 0.5rem 1rem; font-size: 0.95rem;'>
-                                    <span style='color: #94A3B8;'>📍 Location:</span>
-                                    <span style='color: #F1F5F9; font-weight: 500;'>{location}</span>
-                                    <span style='color: #94A3B8;'>⚠️ Risk Score:</span>
-                                    <span style='color: #EF4444; font-weight: 700;'>{result['score']}/10</span>
-                                    <span style='color: #94A3B8;'>📋 Reason:</span>
-                                    <span style='color: #F1F5F9;'>{result['reason']}</span>
-                                    <span style='color: #94A3B8;'>✉️ Dispatcher:</span>
-                                    <span style='color: #10B981; font-weight: 500;'>Alert sent to procurement</span>
-                                </div>
-                            </div>
+            # One card per dependency only while they fit on a row; larger catalogs are summarized
+            large = len(suppliers) > CARD_LIMIT
+            if large:
+                map_cols = st.columns(2)
+                with map_cols[0]:
+                    st.dataframe([{"Country": value, "Dependencies": count} for value, count in group_counts(suppliers, "location")],
+                                 use_container_width=True, hide_index=True)
+                with map_cols[1]:
+                    st.dataframe([{"Material": value, "Dependencies": count} for value, count in group_counts(suppliers, "material")],
+                                 use_container_width=True, hide_index=True)
+            else:
+                cols = st.columns(len(suppliers))
+                for idx, item in enumerate(suppliers):
+                    with cols[idx]:
+                        st.markdown(f"""
+                        <div class='metric-card' style='text-align: left; padding: 1rem;'>
+                            <div style='font-size: 1.5rem; margin-bottom: 0.5rem;'>📦</div>
+                            <div style='font-weight: 600; color: #3B82F6; margin-bottom: 0.25rem;'>{item['material']}</div>
+                            <div style='color: #94A3B8; font-size: 0.85rem;'>📍 {item['location']}</div>
                         </div>
+                        """, unsafe_allow_html=True)
+            
+            # PHASE 2: Monitoring
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            st.markdown("### 👁️ Phase 2: Watchman → Analyst → Dispatcher")
+            st.markdown("<br>", unsafe_allow_html=True)
+            
+            st.markdown("#### 📈 Real-Time Metrics")
+            metric_cols = st.columns(4)
+            
+            with metric_cols[0]:
+                total_metric = st.empty()
+            with metric_cols[1]:
+                safe_metric = st.empty()
+            with metric_cols[2]:
+                critical_metric = st.empty()
+            with metric_cols[3]:
+                progress_metric = st.empty()
+            
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("---")
+            st.markdown("#### 🔍 Risk Analysis Results")
+            st.markdown("<br>", unsafe_allow_html=True)
+            
+            if large:
+                st.caption(f"Showing cards for the first {CARD_LIMIT} critical alerts; every result is in the catalog below when the scan completes")
+            results = st.container()
+            
+            safe_count = 0
+            critical_count = 0
+            risk_scores = []
+            collected = []
+            last_update = 0.0
+            
+            scan = checkpoint.track(graph.track(AssessmentHistory().track(sentinel.engine.scan(todo))))
+            for idx, result in enumerate(chain(restored, checkpoint.track(shared), scan)):
+                collected.append(result)
+                
+                # Track risk scores
+                if result.score is not None:
+                    risk_scores.append(result.score)
+                if result.status == 'critical':
+                    critical_count += 1
+                elif result.status == 'safe':
+                    safe_count += 1
+                
+                # Large catalogs keep cards for the first critical alerts only; the rest go to the grid below
+                if not large or (result.status == 'critical' and critical_count <= CARD_LIMIT):
+                    with results:
+                        render_result_card(result)
+                
+                # Update metrics (large catalogs: a few redraws a second, not one per supplier)
+                if not large or idx + 1 == len(suppliers) or time.monotonic() - last_update >= METRICS_REFRESH:
+                    last_update = time.monotonic()
+                    total_metric.markdown(f"""
+                    <div class='metric-card'>
+                        <div class='metric-label'>Scanned</div>
+                        <div class='metric-value'>{idx + 1}</div>
                     </div>
                     """, unsafe_allow_html=True)
-                    critical_count += 1
-                elif result['status'] == 'safe':
-                    st.markdown(f"""
-                    <div class='status-card safe'>
-                        <div style='display: flex; align-items: center; gap: 1rem;'>
-                            <div style='font-size: 1.5rem;'>✓</div>
-                            <div style='flex: 1;'>
-                                <span style='font-weight: 600; color: #F1F5F9;'>{material}</span>
-                                <span style='color: #94A3B8;'> from </span>
-                                <span style='color: #10B981; font-weight: 500;'>{location}</span>
-                                <div style='color: #94A3B8; font-size: 0.9rem; margin-top: 0.25rem;'>
-                                    Risk: {result['score']}/10 • {result.get('reason', 'No risks')}
-                                </div>
-                            </div>
-                        </div>
+                    
+                    safe_metric.markdown(f"""
+                    <div class='metric-card'>
+                        <div class='metric-label'>✓ Safe</div>
+                        <div class='metric-value' style='color: #10B981;'>{safe_count}</div>
                     </div>
                     """, unsafe_allow_html=True)
-                    safe_count += 1
-                else:
-                    st.markdown(f"""
-                    <div class='status-card info'>
-                        <div style='display: flex; align-items: center; gap: 1rem;'>
-                            <div style='font-size: 1.5rem;'>ℹ️</div>
-                            <div>
-                                <span style='font-weight: 600; color: #F1F5F9;'>{material}</span>
-                                <span style='color: #94A3B8;'> from {location} • {result['message']}</span>
-                            </div>
-                        </div>
+                    
+                    critical_metric.markdown(f"""
+                    <div class='metric-card'>
+                        <div class='metric-label'>⚠️ Critical</div>
+                        <div class='metric-value' style='color: #EF4444;'>{critical_count}</div>
                     </div>
                     """, unsafe_allow_html=True)
+                    
+                    progress_pct = int(((idx + 1) / len(suppliers)) * 100)
+                    progress_metric.markdown(f"""
+                    <div class='metric-card'>
+                        <div class='metric-label'>Progress</div>
+                        <div class='metric-value' style='font-size: 2rem;'>{progress_pct}%</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                if not large and idx >= len(restored) + len(shared):
+                    time.sleep(1)
             
-            # Update metrics
-            total_metric.markdown(f"""
-            <div class='metric-card'>
-                <div class='metric-label'>Scanned</div>
-                <div class='metric-value'>{idx + 1}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            # Finished: nothing left to resume, so the session's file goes
+            checkpoint.discard()
             
-            safe_metric.markdown(f"""
-            <div class='metric-card'>
-                <div class='metric-label'>✓ Safe</div>
-                <div class='metric-value' style='color: #10B981;'>{safe_count}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            # Kept in the session so filtering, sorting and paging (each a rerun) don't need another scan
+            st.session_state["catalog_results"] = [result.as_dict() for result in collected]
             
-            critical_metric.markdown(f"""
-            <div class='metric-card'>
-                <div class='metric-label'>⚠️ Critical</div>
-                <div class='metric-value' style='color: #EF4444;'>{critical_count}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            # Log cycle completion statistics
+            usage = ledger.summary()
+            scanned = len(suppliers) - usage["deferred"]
+            skipped_count = scanned - safe_count - critical_count
+            dispatcher_logger.info("Cycle complete — Scanned: %d | Safe: %d | Critical: %d | Skipped: %d | Deferred: %d",
+                                   scanned, safe_count, critical_count, skipped_count, usage["deferred"])
+            dispatcher_logger.info("Cycle tokens — Input: %d | Output: %d | Tool: %d | Total: %d%s | Est. cost: $%.4f",
+                                   usage["input"], usage["output"], usage["tool"], usage["total"],
+                                   f"/{usage['budget']}" if usage["budget"] else "", usage["estimated_cost_usd"])
             
-            progress_pct = int(((idx + 1) / len(suppliers)) * 100)
-            progress_metric.markdown(f"""
-            <div class='metric-card'>
-                <div class='metric-label'>Progress</div>
-                <div class='metric-value' style='font-size: 2rem;'>{progress_pct}%</div>
-            </div>
-            """, unsafe_allow_html=True)
+            # Record metrics
+            metrics_tracker = MetricsTracker()
+            metrics_tracker.record_scan(scanned, critical_count, risk_scores, token_usage=usage)
             
-            time.sleep(1)
-        
-        # Log cycle completion statistics
-        skipped_count = len(suppliers) - safe_count - critical_count
-        dispatcher_logger.info(f"Cycle complete — Scanned: {len(suppliers)} | Safe: {safe_count} | Critical: {critical_count} | Skipped: {skipped_count}")
-        
-        # Record metrics
-        metrics_tracker = MetricsTracker()
-        metrics_tracker.record_scan(len(suppliers), critical_count, risk_scores)
-        
-        # Summary
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        
-        st.markdown(f"""
-        <div class='premium-card' style='text-align: center; padding: 2.5rem;'>
-            <div style='font-size: 3.5rem; margin-bottom: 1rem;'>✅</div>
-            <h2 style='margin-bottom: 1rem; color: #10B981;'>Multi-Agent Analysis Complete</h2>
-            <p style='color: #94A3B8; margin-bottom: 2rem;'>All agents completed their tasks successfully</p>
-            <div style='display: flex; justify-content: center; gap: 3rem; flex-wrap: wrap;'>
-                <div>
-                    <div style='font-size: 2.5rem; font-weight: 700; color: #3B82F6;'>{len(suppliers)}</div>
-                    <div style='color: #94A3B8; font-size: 0.95rem;'>Dependencies Mapped</div>
-                </div>
-                <div>
-                    <div style='font-size: 2.5rem; font-weight: 700; color: #10B981;'>{safe_count}</div>
-                    <div style='color: #94A3B8; font-size: 0.95rem;'>Safe Operations</div>
-                </div>
-                <div>
-                    <div style='font-size: 2.5rem; font-weight: 700; color: #EF4444;'>{critical_count}</div>
-                    <div style='color: #94A3B8; font-size: 0.95rem;'>Critical Alerts</div>
+            # Summary
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            
+            st.markdown(f"""
+            <div class='premium-card' style='text-align: center; padding: 2.5rem;'>
+                <div style='font-size: 3.5rem; margin-bottom: 1rem;'>✅</div>
+                <h2 style='margin-bottom: 1rem; color: #10B981;'>Multi-Agent Analysis Complete</h2>
+                <p style='color: #94A3B8; margin-bottom: 2rem;'>All agents completed their tasks successfully</p>
+                <div style='display: flex; justify-content: center; gap: 3rem; flex-wrap: wrap;'>
+                    <div>
+                        <div style='font-size: 2.5rem; font-weight: 700; color: #3B82F6;'>{len(suppliers)}</div>
+                        <div style='color: #94A3B8; font-size: 0.95rem;'>Dependencies Mapped</div>
+                    </div>
+                    <div>
+                        <div style='font-size: 2.5rem; font-weight: 700; color: #10B981;'>{safe_count}</div>
+                        <div style='color: #94A3B8; font-size: 0.95rem;'>Safe Operations</div>
+                    </div>
+                    <div>
+                        <div style='font-size: 2.5rem; font-weight: 700; color: #EF4444;'>{critical_count}</div>
+                        <div style='color: #94A3B8; font-size: 0.95rem;'>Critical Alerts</div>
+                    </div>
+                    <div>
+                        <div style='font-size: 2.5rem; font-weight: 700; color: #8B5CF6;'>{usage['total']:,}</div>
+                        <div style='color: #94A3B8; font-size: 0.95rem;'>Tokens (≈ ${usage['estimated_cost_usd']:.4f})</div>
+                    </div>
                 </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
+            
+            if large:
+                st.markdown("<br>", unsafe_allow_html=True)
+                show_results_catalog(st.session_state["catalog_results"])
+            
+            token_label = "🪙 Token usage by supplier"
+            if usage["deferred"]:
+                token_label += f" • {usage['deferred']} deferred to the next cycle"
+            with st.expander(token_label):
+                st.dataframe(
+                    [{"Material": row["material"], "Location": row["location"], "Input": row["input"],
+                      "Output": row["output"], "Tool": row["tool"], "Total": row["total"]}
+                     for row in ledger.supplier_rows()],
+                    use_container_width=True,
+                    hide_index=True
+                )
+                st.dataframe(
+                    [{"Stage": stage, **tokens} for stage, tokens in usage["by_stage"].items()],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            
+            if profiler:
+                prof_path, summary_path = profiler.stop()
+                dispatcher_logger.info("Profile written to %s (summary: %s)", prof_path, summary_path)
+                with st.expander("🔬 Profile: CPU hotspots & allocation sites"):
+                    st.code(profiler.summary, language="text")
+                    with open(prof_path, "rb") as f:
+                        st.download_button("⬇️ Download .prof", f.read(), file_name=os.path.basename(prof_path),
+                                           mime="application/octet-stream", help="Open with snakeviz or pstats")
+        finally:
+            tracer.release(trace_token)
+            st.session_state["run_trace"] = run_trace
+            graph.remove_business(graph_id)
+            if profiler:
+                profiler.cancel()
         
         # Historical Metrics Section
         st.markdown("<br><br>", unsafe_allow_html=True)
@@ -1016,6 +1420,12 @@ def show_monitor_page(api_key, debug_mode):
             st.info("🔧 Debug mode: Single cycle complete. Disable for 24/7 monitoring.")
     
     else:
+        # The last large scan stays browsable across reruns (every filter or page change is one)
+        catalog_results = st.session_state.get("catalog_results")
+        if catalog_results and len(catalog_results) > CARD_LIMIT:
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            show_results_catalog(catalog_results)
+        
         # Show historical metrics even when not analyzing
         st.markdown("<br><br>", unsafe_allow_html=True)
         
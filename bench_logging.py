@@ -0,0 +1,85 @@
+"""
+Logging overhead benchmark for SupplySentinel
+Compares per-call cost on the agent thread with and without the queue listener
+
+Usage:
+    python bench_logging.py [--calls 20000] [--threads 4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import logging_config
+from logging_config import setup_logging, shutdown_logging, log_context, watchman_logger
+
+
+def _run_calls(calls):
+    """Emit `calls` agent log lines and return the elapsed time on this thread"""
+    start = time.perf_counter()
+    for i in range(calls):
+        watchman_logger.info("Search returned %d data points for %s in %s", i % 17, "Steel", "China",
+                             extra=log_context("watchman", "Steel", "China"))
+    return time.perf_counter() - start
+
+
+def bench(environment, use_queue, calls, threads):
+    """Return (single-thread µs/call, multi-thread µs/call, flush seconds)"""
+    setup_logging(environment=environment, use_queue=use_queue)
+
+    single = _run_calls(calls) / calls * 1e6
+
+    # Concurrent workers: the synchronous mode serializes on handler locks
+    per_thread = calls // threads
+    elapsed = [0.0] * threads
+
+    def worker(idx):
+        elapsed[idx] = _run_calls(per_thread)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    multi = max(elapsed) / per_thread * 1e6
+
+    # Time spent draining the queue at shutdown (zero for synchronous mode)
+    start = time.perf_counter()
+    shutdown_logging()
+    flush = time.perf_counter() - start
+    return single, multi, flush
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SupplySentinel logging overhead")
+    parser.add_argument("--calls", type=int, default=20000, help="log calls per scenario")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent logging threads")
+    args = parser.parse_args()
+
+    # Keep benchmark output out of the real log directory and off the terminal
+    logging_config.LOGS_DIR = tempfile.mkdtemp(prefix="sentinel-bench-")
+    real_stderr = sys.stderr
+
+    results = []
+    for environment in ("cli", "streamlit"):
+        for use_queue in (False, True):
+            with open(os.devnull, "w") as devnull:
+                sys.stderr = devnull
+                try:
+                    single, multi, flush = bench(environment, use_queue, args.calls, args.threads)
+                finally:
+                    sys.stderr = real_stderr
+            results.append((environment, "queue" if use_queue else "sync", single, multi, flush))
+
+    print(f"{args.calls} calls per scenario, {args.threads} threads for the concurrent run\n")
+    print(f"{'environment':<12} {'mode':<6} {'µs/call':>10} {'µs/call (threads)':>18} {'flush (s)':>10}")
+    print("-" * 60)
+    for environment, mode, single, multi, flush in results:
+        print(f"{environment:<12} {mode:<6} {single:>10.2f} {multi:>18.2f} {flush:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Offline pipeline benchmark for SupplySentinel
+Runs the CLI monitoring loop and the Streamlit check_item path against the
+simulated model client (fake_genai.py) over synthetic supplier catalogs, so
+cycle throughput can be measured without spending API quota
+
+Each cycle of a scenario runs in a fresh subprocess (clean state, isolated
+peak memory), --cycles times with a different seed each, and the scenario
+reports p50/p95 of the cycle times. Results are appended to bench_results.jsonl together with the git commit, so
+regressions can be compared across commits with --compare.
+
+Usage:
+    python bench_pipeline.py
+    python bench_pipeline.py --sizes 10,1000 --paths cli --latency-scale 0.01 --cycles 10
+    python bench_pipeline.py --error-rate 0.02 --rate-429 0.05 --compare
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from fake_genai import FakeGenaiClient, DEFAULT_LATENCY
+
+RESULTS_FILE = "bench_results.jsonl"
+
+MATERIALS = ["Lithium", "Cobalt", "Rare Earths", "Semiconductors", "Steel", "Copper", "Nickel", "Graphite"]
+COUNTRIES = ["Chile", "Democratic Republic of Congo", "China", "Taiwan", "Australia", "Peru", "Indonesia", "Brazil"]
+
+
+def synthetic_suppliers(size):
+    """Distinct material/location rows, so alert deduplication never short-circuits"""
+    return [{"material": f"{MATERIALS[i % len(MATERIALS)]} lot {i}", "location": COUNTRIES[(i // len(MATERIALS)) % len(COUNTRIES)]}
+            for i in range(size)]
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize_cycles(runs):
+    """One scenario result from its per-cycle worker results; supplier latencies are pooled across cycles"""
+    cycles = [run["cycle_seconds"] for run in runs]
+    latencies = [latency for run in runs for latency in run["supplier_latencies_s"]]
+    size = runs[0]["size"]
+    median = _percentile(cycles, 0.50)
+    calls = {}
+    for run in runs:
+        for stage, count in run["model_calls"].items():
+            calls[stage] = calls.get(stage, 0) + count
+    return {
+        "path": runs[0]["path"],
+        "size": size,
+        "cycles": len(runs),
+        "suppliers_per_sec": size / median if median else 0.0,
+        "calls_per_supplier": sum(run["calls_per_supplier"] for run in runs) / len(runs),
+        "p50_cycle_s": median,
+        "p95_cycle_s": _percentile(cycles, 0.95),
+        "cycle_seconds": cycles,
+        "p50_supplier_latency_s": _percentile(latencies, 0.50),
+        "p95_supplier_latency_s": _percentile(latencies, 0.95),
+        "peak_memory_mb": max(run["peak_memory_mb"] for run in runs),
+        "model_calls": calls,
+        "model_errors": sum(run["model_errors"] for run in runs),
+        "throttled": sum(run["throttled"] for run in runs),
+    }
+
+
+def _peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows: fall back to the traced Python heap
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1024
+
+
+def bench_cli(suppliers, client):
+    """SupplySentinel.run_loop(debug_mode=True); returns per-supplier latencies"""
+    import supply_sentinel
+    supply_sentinel.init_cli()
+
+    with open("suppliers.json", "w") as f:
+        json.dump(suppliers, f)
+
+    sentinel = supply_sentinel.SupplySentinel()
+    sentinel.engine.client = client
+    sentinel.item_spacing = 0
+
+    # check_item covers one supplier end to end: time between completions = supplier latency
+    finished = []
+    check_item = sentinel.engine.check_item
+
+    def timed_check_item(*args, **kwargs):
+        result = check_item(*args, **kwargs)
+        finished.append(time.perf_counter())
+        return result
+
+    sentinel.engine.check_item = timed_check_item
+    start = time.perf_counter()
+    sentinel.run_loop(debug_mode=True)
+    elapsed = time.perf_counter() - start
+    marks = [start] + finished
+    return elapsed, [b - a for a, b in zip(marks, marks[1:])]
+
+
+def bench_streamlit(suppliers, client):
+    """StreamlitSentinel.check_item for every supplier; returns per-supplier latencies"""
+    import app
+
+    sentinel = app.StreamlitSentinel("offline-benchmark", debug_mode=True)
+    sentinel.engine.client = client
+
+    latencies = []
+    start = time.perf_counter()
+    for item in suppliers:
+        t0 = time.perf_counter()
+        sentinel.check_item(item["material"], item["location"])
+        latencies.append(time.perf_counter() - t0)
+    return time.perf_counter() - start, latencies
+
+
+def run_worker(args):
+    """Run one scenario in this process and print its result as JSON on stdout"""
+    try:
+        import resource  # noqa: F401  (peak RSS is read at the end)
+    except ImportError:
+        import tracemalloc
+        tracemalloc.start()
+
+    workdir = tempfile.mkdtemp(prefix="sentinel-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+
+    import logging_config
+    logging_config.LOGS_DIR = os.path.join(workdir, "logs")
+    os.makedirs(logging_config.LOGS_DIR, exist_ok=True)
+
+    suppliers = synthetic_suppliers(args.size)
+    client = FakeGenaiClient(
+        seed=args.seed,
+        latency={"watchman": args.watchman_latency, "analyst": args.analyst_latency},
+        latency_scale=args.latency_scale,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        critical_rate=args.critical_rate,
+        zero_rate=args.zero_rate,
+    )
+
+    runner = bench_cli if args.worker == "cli" else bench_streamlit
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = sys.stderr = devnull  # agents print and log to the console
+        try:
+            elapsed, latencies = runner(suppliers, client)
+            logging_config.shutdown_logging()
+        finally:
+            sys.stdout, sys.stderr = real_stdout, real_stderr
+
+    print(json.dumps({
+        "path": args.worker,
+        "size": args.size,
+        "suppliers_per_sec": args.size / elapsed if elapsed else 0.0,
+        "calls_per_supplier": client.total_calls / args.size,
+        "supplier_latencies_s": [round(latency, 6) for latency in latencies],
+        "cycle_seconds": elapsed,
+        "peak_memory_mb": _peak_memory_mb(),
+        "model_calls": dict(client.calls),
+        "model_errors": client.errors,
+        "throttled": client.throttled,
+    }))
+
+
+def _git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _scenario_params(args):
+    return {
+        "watchman_latency": args.watchman_latency,
+        "analyst_latency": args.analyst_latency,
+        "latency_scale": args.latency_scale,
+        "error_rate": args.error_rate,
+        "rate_429": args.rate_429,
+        "critical_rate": args.critical_rate,
+        "zero_rate": args.zero_rate,
+        "seed": args.seed,
+        "cycles": args.cycles,
+    }
+
+
+def _load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _previous_result(history, result, commit):
+    """Most recent saved result for the same scenario from another commit"""
+    for old in reversed(history):
+        if (old["path"], old["size"], old["params"]) == (result["path"], result["size"], result["params"]) \
+                and old["commit"] != commit:
+            return old
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline SupplySentinel pipeline benchmark")
+    parser.add_argument("--sizes", default="10,1000,100000", help="comma-separated supplier counts")
+    parser.add_argument("--paths", default="cli,streamlit", help="cli, streamlit or both")
+    parser.add_argument("--watchman-latency", default=DEFAULT_LATENCY["watchman"], help="latency spec, e.g. lognormal:4.0,0.45")
+    parser.add_argument("--analyst-latency", default=DEFAULT_LATENCY["analyst"], help="latency spec, e.g. fixed:1.5")
+    parser.add_argument("--latency-scale", type=float, default=0.001,
+                        help="multiplier on simulated latency (1.0 = real time, 0 = Python overhead only)")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="probability of a 500 per call")
+    parser.add_argument("--rate-429", type=float, default=0.02, help="probability of a 429 per call")
+    parser.add_argument("--critical-rate", type=float, default=0.1, help="share of disruption news")
+    parser.add_argument("--zero-rate", type=float, default=0.3, help="share of quiet news (analyst asks for a retry)")
+    parser.add_argument("--seed", type=int, default=7, help="seed of the first cycle; cycle n uses seed + n")
+    parser.add_argument("--cycles", type=int, default=5, help="cycles per scenario, for cycle-time percentiles")
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSONL file results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="do not append results")
+    parser.add_argument("--compare", action="store_true", help="show change against the last run from another commit")
+    parser.add_argument("--worker", choices=["cli", "streamlit"], help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    commit = _git_revision()
+    output = os.path.abspath(args.output)
+    history = _load_results(output)
+    params = _scenario_params(args)
+    script = os.path.abspath(__file__)
+    passthrough = [f"--{key.replace('_', '-')}={value}" for key, value in params.items() if key not in ("seed", "cycles")]
+
+    print(f"🧪 SupplySentinel offline benchmark @ {commit}\n")
+    print(f"{'path':<10} {'suppliers':>9} {'sup/s':>10} {'calls/sup':>10} {'p50 cycle':>10} {'p95 cycle':>10} {'peak MB':>8}  change")
+    print("-" * 92)
+
+    for path in [p.strip() for p in args.paths.split(",") if p.strip()]:
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            runs, failure = [], None
+            for cycle in range(args.cycles):
+                proc = subprocess.run([sys.executable, script, f"--worker={path}", f"--size={size}",
+                                       f"--seed={args.seed + cycle}", *passthrough], capture_output=True, text=True)
+                if proc.returncode != 0:
+                    failure = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode
+                    break
+                runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            if failure is not None:
+                print(f"{path:<10} {size:>9}  ❌ failed: {failure}")
+                continue
+
+            result = summarize_cycles(runs)
+            result.update({"commit": commit, "timestamp": datetime.now().isoformat(timespec="seconds"),
+                           "python": sys.version.split()[0], "params": params})
+
+            change = ""
+            if args.compare:
+                previous = _previous_result(history, result, commit)
+                if previous:
+                    delta = (result["p95_cycle_s"] / previous["p95_cycle_s"] - 1) * 100 if previous["p95_cycle_s"] else 0.0
+                    change = f"{delta:+.1f}% p95 cycle vs {previous['commit']}"
+
+            print(f"{path:<10} {size:>9} {result['suppliers_per_sec']:>10.1f} {result['calls_per_supplier']:>10.2f} "
+                  f"{result['p50_cycle_s']:>10.2f} {result['p95_cycle_s']:>10.2f} {result['peak_memory_mb']:>8.1f}  {change}")
+
+            if not args.no_save:
+                with open(output, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+
+    if not args.no_save:
+        print(f"\nResults appended to {output}")
+
+
+if __name__ == "__main__":
+    main()
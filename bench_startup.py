@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark for the SupplySentinel CLI entry points
+Times fresh interpreters importing each module (what cron-style runs and test
+imports pay before any work starts) and prints the heaviest imports from
+`python -X importtime`
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 20 --top 25
+    python bench_startup.py --max-ms 250     # exit 1 if any target is slower (CI guard)
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = ("supply_sentinel", "config_agent")
+
+# Modules that must never be imported just by importing a CLI module
+HEAVY_MODULES = ("google.genai", "dotenv", "http.server", "pstats")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run(code, extra_args=()):
+    return subprocess.run([sys.executable, *extra_args, "-c", code], cwd=ROOT, capture_output=True, text=True)
+
+
+def time_import(module, runs):
+    """Wall-clock milliseconds for `python -c "import module"` in fresh interpreters"""
+    baseline, timings = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run("pass")
+        baseline.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        proc = _run(f"import {module}")
+        timings.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+    # Subtract bare interpreter start-up so the number is what the module itself costs
+    return statistics.median(timings) * 1000, statistics.median(baseline) * 1000
+
+
+def import_report(module, top):
+    """(cumulative_us, name) of the heaviest imports, parsed from -X importtime"""
+    proc = _run(f"import {module}", extra_args=("-X", "importtime"))
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def leaked_heavy_modules(module):
+    probe = (f"import sys, {module}; "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    return [m for m in _run(probe).stdout.strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SupplySentinel cold-start benchmark")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma-separated modules to import")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=15, help="heaviest imports to list")
+    parser.add_argument("--max-ms", type=float, help="fail if a target's import cost exceeds this")
+    args = parser.parse_args()
+
+    failed = False
+    print("🚀 SupplySentinel cold-start benchmark\n")
+    for module in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        total_ms, interpreter_ms = time_import(module, args.runs)
+        own_ms = total_ms - interpreter_ms
+        leaked = leaked_heavy_modules(module)
+        print(f"{module}: {total_ms:.0f} ms total, {own_ms:.0f} ms import cost "
+              f"(interpreter alone {interpreter_ms:.0f} ms, median of {args.runs})")
+        if leaked:
+            print(f"   ⚠️  imported eagerly: {', '.join(leaked)}")
+            failed = True
+        for cumulative_us, name in import_report(module, args.top):
+            print(f"   {cumulative_us / 1000:>8.1f} ms  {name}")
+        if args.max_ms is not None and own_ms > args.max_ms:
+            print(f"   ❌ import cost {own_ms:.0f} ms exceeds --max-ms {args.max_ms:.0f}")
+            failed = True
+        print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+SupplySentinel Bill-of-Materials Expansion
+Multi-tier dependency DAG below the configuration agent's top 3 materials, so
+upstream exposure (lithium-ion cells -> lithium, cobalt, graphite, each with
+its own source country) is monitored too
+
+Expansion is breadth-first to a configurable depth. Each material's inputs
+are asked for once and memoized by folded material name, in memory and in
+logs/bom_cache.jsonl, so a subtree shared by many businesses (or by several
+branches of one) costs a single model call across businesses and runs. At
+most `max_calls` uncached materials are expanded per tier; the rest are kept
+as leaves and logged.
+
+    expander = BomExpander(agent, depth=2)
+    dag = expander.expand(agent.map_dependencies("I make e-bikes in Texas"))
+    dag.suppliers()   # tier 1 as configured, deeper tiers with "tier", "via" and low priority
+"""
+
+import os
+import threading
+
+from logging_config import LOGS_DIR, log_context, config_logger
+from normalize import COMMODITY_ALIASES, fold, normalizer as default_normalizer
+
+BOM_CACHE_FILE = os.path.join(LOGS_DIR, "bom_cache.jsonl")
+
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 4
+# Uncached materials expanded per tier (model calls per level)
+DEFAULT_MAX_CALLS = 6
+# Inputs asked for per material
+INPUTS_PER_MATERIAL = 3
+
+# Mined and agricultural commodities have no upstream inputs worth a model call
+LEAF_MATERIALS = frozenset(fold(name) for name in COMMODITY_ALIASES) - frozenset(
+    fold(name) for name in ("Semiconductors", "Polysilicon", "Steel", "Liquefied Natural Gas", "Aluminum"))
+
+EXPAND_INSTRUCTION = ("You are a Global Supply Chain Expert. Break a material or component down into the "
+                      "critical inputs it is made from and the dominant export country of each input.")
+
+EXPAND_PROMPT = """
+Which critical input MATERIALS is "{material}" made from? List at most {limit}, most critical first,
+with the DOMINANT EXPORT COUNTRY of each input.
+
+Return a JSON list of objects with "material" and "location" keys, for example:
+[{{"material": "Lithium", "location": "Chile"}}, {{"material": "Graphite", "location": "China"}}]
+
+Return [] if "{material}" is a raw material (mined, grown or extracted) with no significant inputs.
+"""
+
+
+class DependencyDag:
+    """Materials as nodes, "made from" edges; tier 1 is the business's own dependencies"""
+
+    def __init__(self, roots):
+        self.roots = list(roots)
+        self.edges = {}        # parent material -> [child supplier dict]
+        self.tiers = {}        # (material, location) -> tier
+        self.via = {}          # (material, location) -> parent material (first path found)
+        self.truncated = []    # materials left unexpanded by the per-tier call bound
+        for item in self.roots:
+            self.tiers.setdefault((item["material"], item["location"]), 1)
+
+    def add(self, parent, child, tier):
+        """Record parent -> child; returns True the first time the child pair is seen"""
+        self.edges.setdefault(parent, []).append(child)
+        key = (child["material"], child["location"])
+        if key in self.tiers:
+            return False
+        self.tiers[key] = tier
+        self.via[key] = parent
+        return True
+
+    @property
+    def depth(self):
+        return max(self.tiers.values(), default=0)
+
+    def suppliers(self):
+        """
+        Monitoring rows: the roots unchanged, then upstream pairs by tier
+
+        Upstream rows carry "tier" and "via" and default to low priority, so a
+        token budget defers them before any direct dependency.
+        """
+        rows = [dict(item) for item in self.roots]
+        upstream = sorted((tier, key) for key, tier in self.tiers.items() if tier > 1)
+        for tier, (material, location) in upstream:
+            rows.append({"material": material, "location": location, "tier": tier,
+                         "via": self.via[(material, location)], "priority": "low"})
+        return rows
+
+
+class BomExpander:
+    """
+    Memoized, bounded breadth-first expansion; thread-safe (bulk mode shares one)
+
+    Args:
+        agent: ConfigurationAgent; its generate_json() makes the calls (rate limit, ledger, metrics)
+        depth: tiers below the configured materials (1 = their direct inputs)
+        max_calls: uncached materials expanded per tier
+        cache: ConfigCache-like store (get/set) that persists expansions across runs
+    """
+
+    def __init__(self, agent, depth=DEFAULT_DEPTH, max_calls=DEFAULT_MAX_CALLS, cache=None, normalizer=None):
+        self.agent = agent
+        self.depth = max(0, min(depth, MAX_DEPTH))
+        self.max_calls = max_calls
+        self.cache = cache
+        self.normalizer = normalizer or default_normalizer
+        self._lock = threading.Lock()
+        self._memo = {}      # folded material -> [child supplier dict]
+        self._inflight = {}  # folded material -> Event set once the memo holds it
+        self.calls = 0
+
+    def inputs(self, material):
+        """Direct inputs of a material: memo, persistent cache, or one model call"""
+        key = fold(material)
+        if key in LEAF_MATERIALS:
+            return []
+        while True:
+            with self._lock:
+                if key in self._memo:
+                    return self._memo[key]
+                cached = self.cache.get(key) if self.cache is not None else None
+                if cached is not None:
+                    self._memo[key] = cached
+                    return cached
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    done = self._inflight[key] = threading.Event()
+                    break
+            waiting.wait()  # another business is expanding the same material
+            with self._lock:
+                if key in self._memo:
+                    return self._memo[key]
+            # The other expansion failed; try it ourselves
+
+        try:
+            children = self._ask(material)
+            with self._lock:
+                self._memo[key] = children
+                self.calls += 1
+            if self.cache is not None:
+                self.cache.set(key, children)
+            return children
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+    def _ask(self, material):
+        payload = self.agent.generate_json(EXPAND_PROMPT.format(material=material, limit=INPUTS_PER_MATERIAL),
+                                           EXPAND_INSTRUCTION, stage="bom")
+        if not isinstance(payload, list):
+            raise ValueError(f"expected a JSON list of inputs for {material}")
+        rows = [item for item in payload if isinstance(item, dict) and item.get("material") and item.get("location")]
+        children = self.normalizer.suppliers(rows[:INPUTS_PER_MATERIAL])
+        return [{"material": c["material"], "location": c["location"]} for c in children]
+
+    def _known(self, material):
+        key = fold(material)
+        if key in LEAF_MATERIALS:
+            return True
+        with self._lock:
+            return key in self._memo or (self.cache is not None and self.cache.get(key) is not None)
+
+    def expand(self, suppliers):
+        """DependencyDag for one business's configured suppliers"""
+        dag = DependencyDag(suppliers)
+        expanded = set()
+        frontier = list(dict.fromkeys(item["material"] for item in suppliers))
+        for tier in range(2, self.depth + 2):
+            todo = [m for m in frontier if fold(m) not in expanded]
+            # Memoized materials are free; the call bound applies to the rest, most important first
+            fresh = [m for m in todo if not self._known(m)]
+            if len(fresh) > self.max_calls:
+                skipped = fresh[self.max_calls:]
+                dag.truncated.extend(skipped)
+                config_logger.info("BOM tier %d: %d materials left unexpanded (max %d calls per tier)",
+                                   tier, len(skipped), self.max_calls, extra=log_context("config"))
+                todo = [m for m in todo if m not in skipped]
+
+            frontier = []
+            for material in todo:
+                expanded.add(fold(material))
+                try:
+                    children = self.inputs(material)
+                except Exception as e:
+                    config_logger.warning("BOM expansion failed for %s: %s", material, e, extra=log_context("config"))
+                    continue
+                for child in children:
+                    if fold(child["material"]) in expanded:
+                        continue  # an earlier tier already expanded it: this edge would close a cycle
+                    if dag.add(material, child, tier):
+                        frontier.append(child["material"])
+            frontier = list(dict.fromkeys(frontier))
+            if not frontier:
+                break
+        return dag
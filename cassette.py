@@ -0,0 +1,307 @@
+"""
+SupplySentinel Record/Replay Cassettes
+Deterministic model responses for performance runs
+
+Record mode wraps a real genai client and appends every generate_content
+request/response pair, with its latency, to a cassette file. Replay mode
+serves those responses locally, either with the original latencies or with
+none, so the Python side of run_loop / check_item can be profiled in
+isolation and slow production cycles can be reproduced on a laptop.
+
+A cassette is a JSON-lines file (one interaction per line) plus a `.idx`
+sidecar mapping request keys to byte offsets; replay only reads the records
+it serves. A missing or stale index is rebuilt with one sequential scan.
+
+Enable it through the environment (works for the CLI and the Streamlit app):
+
+    SENTINEL_CASSETTE=cassettes/run.jsonl SENTINEL_CASSETTE_MODE=record python supply_sentinel.py
+    SENTINEL_CASSETTE=cassettes/run.jsonl SENTINEL_CASSETTE_MODE=replay-fast python supply_sentinel.py
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+MODES = ("record", "replay", "replay-fast")
+
+_USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "tool_use_prompt_token_count",
+                 "thoughts_token_count", "total_token_count")
+
+
+class ReplayedAPIError(Exception):
+    """Mirrors the attributes of google.genai.errors.APIError that callers inspect"""
+
+    def __init__(self, code, status, message):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.message = message
+
+
+class ReplayedUsage:
+    """Stand-in for a response's usage_metadata"""
+    __slots__ = _USAGE_FIELDS
+
+    def __init__(self, prompt_tokens, output_tokens, tool_tokens=0):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.tool_use_prompt_token_count = tool_tokens or None
+        self.thoughts_token_count = None
+        self.total_token_count = prompt_tokens + output_tokens + tool_tokens
+
+
+class ReplayedResponse:
+    """The parts of a GenerateContentResponse the agents read"""
+    __slots__ = ("text", "usage_metadata")
+
+    def __init__(self, text, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recorded response for a request"""
+
+
+def request_key(model, contents, config):
+    """Stable key for a request: model, prompt and the config fields that change the answer"""
+    fingerprint = {
+        "tools": bool(getattr(config, "tools", None)),
+        "mime": getattr(config, "response_mime_type", None),
+        "system": getattr(config, "system_instruction", None),
+    }
+    payload = json.dumps([model, str(contents), fingerprint], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def request_kind(config):
+    """Agent that issued a request, from its shape (same rule as the simulated client)"""
+    if getattr(config, "tools", None):
+        return "watchman"
+    if getattr(config, "system_instruction", None):
+        return "config"
+    return "analyst"
+
+
+class Cassette:
+    """Append-only interaction log with a key -> offsets index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._lock = threading.Lock()
+        self._index = None   # key -> [offsets]
+        self._cursor = {}    # key -> next occurrence to replay
+        self._writer = None
+
+    # ---- recording -------------------------------------------------------
+
+    def append(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            if self._writer is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._load_index()
+                self._writer = open(self.path, "ab")
+                atexit.register(self.close)
+            offset = self._writer.tell()
+            self._writer.write(line)
+            self._writer.flush()
+            self._index.setdefault(record["key"], []).append(offset)
+
+    def close(self):
+        """Flush the writer and persist the index"""
+        with self._lock:
+            if self._writer is None:
+                return
+            size = self._writer.tell()
+            self._writer.close()
+            self._writer = None
+            self._save_index(size)
+
+    # ---- index -----------------------------------------------------------
+
+    def _save_index(self, size):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"size": size, "keys": self._index}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data["size"] == size:
+                self._index = data["keys"]
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        # Missing or stale index (e.g. the recorder crashed): rebuild with one scan
+        self._index = {}
+        if size:
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        key = json.loads(line)["key"]
+                    except (ValueError, KeyError):
+                        break  # torn final line
+                    self._index.setdefault(key, []).append(offset)
+                    offset += len(line)
+            self._save_index(size)
+
+    # ---- replay ----------------------------------------------------------
+
+    def lookup(self, key):
+        """Next recorded interaction for `key`; repeated requests replay in recorded order"""
+        with self._lock:
+            self._load_index()
+            offsets = self._index.get(key)
+            if not offsets:
+                raise CassetteMiss(key)
+            occurrence = self._cursor.get(key, 0)
+            self._cursor[key] = occurrence + 1
+            offset = offsets[min(occurrence, len(offsets) - 1)]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def __len__(self):
+        with self._lock:
+            self._load_index()
+            return sum(len(offsets) for offsets in self._index.values())
+
+
+class _Models:
+    def __init__(self, generate):
+        self.generate_content = generate
+
+
+class RecordingClient:
+    """Wraps a real genai client and records every generate_content call"""
+
+    def __init__(self, client, cassette):
+        self._client = client
+        self.cassette = cassette
+        self.models = _Models(self._generate)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _generate(self, model, contents, config=None):
+        key = request_key(model, contents, config)
+        started = time.perf_counter()
+        record = {
+            "key": key,
+            "kind": request_kind(config),
+            "model": model,
+            "contents": str(contents),
+            "recorded_at": time.time(),
+        }
+        try:
+            response = self._client.models.generate_content(model=model, contents=contents, config=config)
+        except Exception as e:
+            record["latency_s"] = round(time.perf_counter() - started, 4)
+            record["error"] = {"code": getattr(e, "code", None), "status": getattr(e, "status", None), "message": str(e)}
+            self.cassette.append(record)
+            raise
+        record["latency_s"] = round(time.perf_counter() - started, 4)
+        record["text"] = response.text
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            record["usage"] = {field: getattr(usage, field, None) for field in _USAGE_FIELDS}
+        self.cassette.append(record)
+        return response
+
+
+class ReplayClient:
+    """
+    Serves recorded responses instead of calling the API
+
+    Args:
+        latency_scale: 1.0 sleeps for the recorded latency, 0 returns immediately
+        fallback: optional real client for requests missing from the cassette
+            (otherwise CassetteMiss is raised)
+    """
+
+    def __init__(self, cassette, latency_scale=1.0, fallback=None):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        self.models = _Models(self._generate)
+
+    def _generate(self, model, contents, config=None):
+        try:
+            record = self.cassette.lookup(request_key(model, contents, config))
+        except CassetteMiss:
+            self.misses += 1
+            if self.fallback is None:
+                raise
+            return self.fallback.models.generate_content(model=model, contents=contents, config=config)
+
+        self.hits += 1
+        if self.latency_scale:
+            time.sleep(record.get("latency_s", 0.0) * self.latency_scale)
+        error = record.get("error")
+        if error:
+            raise ReplayedAPIError(error.get("code"), error.get("status"), error.get("message"))
+        usage = record.get("usage") or {}
+        return ReplayedResponse(record["text"], ReplayedUsage(
+            usage.get("prompt_token_count") or 0,
+            usage.get("candidates_token_count") or 0,
+            usage.get("tool_use_prompt_token_count") or 0,
+        ))
+
+
+def cassette_mode():
+    """Active mode from SENTINEL_CASSETTE_MODE, or None when cassettes are off"""
+    mode = os.getenv("SENTINEL_CASSETTE_MODE")
+    if mode and mode not in MODES:
+        raise ValueError(f"SENTINEL_CASSETTE_MODE must be one of {', '.join(MODES)}")
+    return mode if mode and os.getenv("SENTINEL_CASSETTE") else None
+
+
+def replaying():
+    return cassette_mode() in ("replay", "replay-fast")
+
+
+_cassettes = {}
+
+
+def _shared_cassette(path):
+    # One Cassette per file per process, so concurrent agents share offsets and cursors
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+def make_client(api_key):
+    """
+    Build the model client for an agent, honouring the cassette environment
+
+    Replay modes need no API key and never touch the network. Live clients are
+    shared per API key across agents, on one pooled keep-alive transport (http_pool).
+    Several comma-separated keys give a KeyPool that spreads calls across their quotas.
+    """
+    mode = cassette_mode()
+    if mode in ("replay", "replay-fast"):
+        return ReplayClient(_shared_cassette(os.environ["SENTINEL_CASSETTE"]),
+                            latency_scale=1.0 if mode == "replay" else 0.0)
+
+    from http_pool import genai_client
+    from key_pool import shared_key_pool, split_keys
+    keys = split_keys(api_key)
+    client = shared_key_pool(keys) if len(keys) > 1 else genai_client(api_key)
+    if mode == "record":
+        return RecordingClient(client, _shared_cassette(os.environ["SENTINEL_CASSETTE"]))
+    return client
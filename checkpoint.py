@@ -0,0 +1,194 @@
+"""
+SupplySentinel Cycle Checkpoints
+Append-only record of an in-progress monitoring cycle, so a restarted process
+(crash, redeploy, Cloud Run instance recycling) resumes the cycle instead of
+re-scanning every supplier
+
+A checkpoint is a JSON-lines file:
+    {"type": "cycle", "cycle_id": 3, "started_at": ..., "suppliers": [...], "context": ...}
+    {"type": "result", "material": ..., "location": ..., "status": ..., "score": ..., ...}
+    ...
+    {"type": "complete", "finished_at": ...}
+
+Each finished supplier costs one appended line (flushed, not fsynced: it
+survives the process dying, which is what restarts do). Deferred suppliers are
+not recorded, so a resumed cycle tries them again.
+
+    checkpoint = CycleCheckpoint("logs/checkpoints/cli.jsonl")
+    state = checkpoint.load(suppliers)           # unfinished cycle for this supplier list, or None
+    if state:
+        checkpoint.reopen(state)
+        todo, done = state.remaining(), state.results
+    else:
+        checkpoint.begin(cycle_id, suppliers)
+        todo, done = suppliers, []
+    for result in checkpoint.track(engine.scan(todo)):
+        ...
+    checkpoint.finish()
+
+Checkpoints live in logs/checkpoints/, or SENTINEL_CHECKPOINT_DIR. They only
+outlive a restart if that directory does: on Cloud Run the container disk is
+discarded with the instance, so point it at a mounted volume (Cloud Storage
+FUSE, Filestore) for resumes across redeploys.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from logging_config import LOGS_DIR
+from normalize import normalizer
+from sentinel_engine import DispatchOutcome
+
+CHECKPOINTS_DIR = os.getenv("SENTINEL_CHECKPOINT_DIR") or os.path.join(LOGS_DIR, "checkpoints")
+
+
+class CycleState:
+    """An unfinished cycle read back from disk"""
+    __slots__ = ("cycle_id", "started_at", "suppliers", "context", "results", "size")
+
+    def __init__(self, cycle_id, started_at, suppliers, context=None, results=None):
+        self.cycle_id = cycle_id
+        self.started_at = started_at
+        self.suppliers = suppliers
+        self.context = context
+        self.results = results if results is not None else []
+        self.size = 0  # bytes of intact records on disk
+
+    def remaining(self):
+        """Suppliers without a recorded result, in their original order"""
+        # Outcomes carry canonical names; the supplier list may hold raw variants
+        done = Counter(normalizer.key(r.material, r.location) for r in self.results)
+        todo = []
+        for item in self.suppliers:
+            key = normalizer.key(item.get("material"), item.get("location"))
+            if done[key]:
+                done[key] -= 1
+            else:
+                todo.append(item)
+        return todo
+
+
+class CycleCheckpoint:
+    """One cycle at a time per file; begin() starts over, finish() marks it done"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self, suppliers=None):
+        """
+        The unfinished cycle on disk, or None
+
+        With `suppliers`, a checkpoint for a different supplier list is ignored
+        (the configuration changed, so the old cycle is not worth resuming).
+        """
+        try:
+            with open(self.path, "rb") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+
+        state = None
+        size = 0
+        for line in lines:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("unterminated")
+                record = json.loads(line)
+            except ValueError:
+                break  # torn final line from a crash mid-write
+            size += len(line)
+            kind = record.pop("type", None)
+            if kind == "cycle":
+                state = CycleState(record["cycle_id"], record["started_at"], record["suppliers"], record.get("context"))
+            elif kind == "result" and state is not None:
+                state.results.append(DispatchOutcome(**record))
+            elif kind == "complete":
+                return None
+            if state is not None:
+                state.size = size
+
+        if state is None or (suppliers is not None and state.suppliers != suppliers):
+            return None
+        return state
+
+    def begin(self, cycle_id, suppliers, context=None):
+        """Start a new cycle, discarding whatever the file held"""
+        self.close()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        state = CycleState(cycle_id, time.time(), suppliers, context)
+        with self._lock:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._write({"type": "cycle", "cycle_id": cycle_id, "started_at": state.started_at,
+                         "suppliers": suppliers, "context": context})
+        return state
+
+    def reopen(self, state):
+        """Continue appending to the unfinished cycle returned by load()"""
+        self.close()
+        with self._lock:
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._file.truncate(state.size)  # drop a torn final line before appending
+        return state
+
+    def record(self, outcome):
+        if outcome.status == "deferred":
+            return
+        with self._lock:
+            self._write({"type": "result", **outcome.as_dict()})
+
+    def track(self, outcomes):
+        """Pass outcomes through, checkpointing each one as it is produced"""
+        for outcome in outcomes:
+            self.record(outcome)
+            yield outcome
+
+    def finish(self):
+        with self._lock:
+            if self._file is not None:
+                self._write({"type": "complete", "finished_at": time.time()})
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Close and delete the file (per-session checkpoints are not kept once done)"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+
+def prune_checkpoints(prefix, max_age, directory=None):
+    """Delete checkpoints named prefix* that nothing has written to for max_age seconds; returns the count"""
+    directory = directory or CHECKPOINTS_DIR
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if name.startswith(prefix) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
@@ -1,28 +1,124 @@
 import os
 import json
-from typing import List, Dict
+import time
+import threading
+from typing import Dict, Iterable, Iterator, List
 import sys
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
 # Import logging configuration
-from logging_config import setup_logging, config_logger
+from logging_config import LOGS_DIR, setup_logging, log_context, config_logger
 
-load_dotenv()
+# Import stage metrics
+from stage_metrics import time_stage
+
+# Token accounting (input/output/tool tokens per stage)
+from token_ledger import TokenLedger
+
+# Record/replay of model calls (SENTINEL_CASSETTE / SENTINEL_CASSETTE_MODE)
+from cassette import make_client, replaying
+
+# Trace spans around model calls
+from tracing import span
+
+# Canonical material/location names
+from normalize import fold, normalizer
+
+# Multi-tier bill-of-materials expansion (memoized per material)
+from bom import BOM_CACHE_FILE, DEFAULT_MAX_CALLS, BomExpander
+
+# Shared token bucket for model calls (SENTINEL_RATE_LIMIT calls per minute)
+from sentinel_engine import RateLimiter, limiter_from_env
+
+# Bulk onboarding: concurrent Config calls and a cache keyed by normalized description
+BULK_WORKERS = 8
+BULK_RETRY_BASE = 2.0
+CONFIG_CACHE_FILE = os.path.join(LOGS_DIR, "config_cache.jsonl")
+
+
+class ConfigCache:
+    """Append-only JSON-lines cache of dependency maps by normalized key (business description, or material for BOM)"""
+
+    def __init__(self, path=CONFIG_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn final line
+                    self._entries[entry["key"]] = entry["suppliers"]
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, suppliers):
+        with self._lock:
+            self._entries[key] = suppliers
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "suppliers": suppliers}, ensure_ascii=False) + "\n")
+
+
+def read_businesses(path: str) -> Iterator[Dict]:
+    """
+    Business rows from a CSV (description/business column, optional id) or JSONL file.
+
+    Yields {"row", "id", "description"}; unreadable JSONL lines come back with an "error".
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            import csv
+            reader = csv.DictReader(f)
+            fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+            text_field = next((fields[n] for n in ("description", "business", "business_description") if n in fields),
+                              (reader.fieldnames or [None])[0])
+            id_field = next((fields[n] for n in ("id", "business_id", "name") if n in fields), None)
+            for number, record in enumerate(reader, start=1):
+                yield {"row": number, "id": record.get(id_field) if id_field else str(number),
+                       "description": (record.get(text_field) or "").strip()}
+            return
+        
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield {"row": number, "id": str(number), "description": None, "error": f"invalid JSON: {e}"}
+                continue
+            if isinstance(record, str):
+                record = {"description": record}
+            description = record.get("description") or record.get("business") or ""
+            yield {"row": number, "id": str(record.get("id") or record.get("business_id") or number),
+                   "description": description.strip()}
 
-# Configure logging for CLI
-setup_logging(environment="cli")
 
 class ConfigurationAgent:
-    def __init__(self):
+    def __init__(self, limiter: RateLimiter = None):
         api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if not api_key and not replaying():
             print("Error: GEMINI_API_KEY environment variable not set.")
             sys.exit(1)
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = make_client(api_key)
         self.model_id = "gemini-2.5-flash"
+        self.ledger = TokenLedger()
+        self.limiter = limiter if limiter is not None else limiter_from_env()
+        
+        # Optional bom.BomExpander: adds upstream tiers below the top 3 materials
+        self.expander = None
 
     def run_interview(self) -> List[Dict[str, str]]:
         """
@@ -43,7 +139,33 @@ class ConfigurationAgent:
         Generates a list of suppliers based on the business context.
         """
         print(f"\nAnalyzing supply chain for: '{business_context}'...")
-        config_logger.debug("Dependency mapping initiated")
+        try:
+            suppliers = self.configure(business_context)
+            config_logger.info("Dependency mapping complete — %d dependencies extracted", len(suppliers),
+                               extra=log_context("config"))
+            return suppliers
+        except Exception as e:
+            config_logger.error("Error generating suppliers: %s", str(e), exc_info=True, extra=log_context("config"))
+            print(f"Error generating suppliers: {e}")
+            return []
+
+    def configure(self, business_context: str) -> List[Dict[str, str]]:
+        """
+        Top 3 materials, plus their upstream tiers when an expander is set; raises on failure.
+        """
+        suppliers = self.map_dependencies(business_context)
+        if self.expander is None:
+            return suppliers
+        dag = self.expander.expand(suppliers)
+        config_logger.info("BOM expansion — %d pairs across %d tiers (%d materials truncated)",
+                           len(dag.tiers), dag.depth, len(dag.truncated), extra=log_context("config"))
+        return dag.suppliers()
+
+    def map_dependencies(self, business_context: str) -> List[Dict[str, str]]:
+        """
+        One Config model call; returns canonical suppliers or raises.
+        """
+        config_logger.debug("Dependency mapping initiated", extra=log_context("config"))
         
         prompt = f"""
         Based on: "{business_context}", identify the top 3 critical MATERIALS this business depends on.
@@ -66,24 +188,103 @@ class ConfigurationAgent:
         
         system_instruction = "You are a Global Supply Chain Expert specializing in materials sourcing. Your goal is to identify critical MATERIALS (not specific companies) and their dominant export countries for a given business. Focus on industry-standard dependencies based on the business type."
         
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    response_mime_type="application/json"
-                )
-            )
+        payload = self.generate_json(prompt, system_instruction)
+        if not isinstance(payload, list) or not payload:
+            raise ValueError("model returned no dependency list")
+        # Canonical names; variant spellings of the same dependency collapse into one
+        return normalizer.suppliers(payload)
+
+    def generate_json(self, prompt: str, system_instruction: str, stage: str = "config"):
+        """
+        One JSON-mode model call under the shared rate limit, timed and token-accounted as `stage`.
+        """
+        from google.genai import types  # deferred: heavy import, only needed for the model call
+        
+        with time_stage(stage) as timer:
+            try:
+                if self.limiter is not None:
+                    with span("rate_limit_wait"):
+                        self.limiter.acquire()
+                with span("generate_content", model=self.model_id):
+                    response = self.client.models.generate_content(
+                        model=self.model_id,
+                        contents=prompt,
+                        config=types.GenerateContentConfig(
+                            system_instruction=system_instruction,
+                            response_mime_type="application/json"
+                        )
+                    )
             
-            suppliers = json.loads(response.text)
-            config_logger.info(f"Dependency mapping complete — {len(suppliers)} dependencies extracted")
-            return suppliers
+                self.ledger.record(timer.stage, response)
+                return json.loads(response.text)
+            except Exception:
+                timer.outcome = "error"
+                raise
+
+    def _map_with_retries(self, business_context: str, retries: int):
+        for attempt in range(retries + 1):
+            try:
+                return self.configure(business_context)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                config_logger.warning("Dependency mapping failed (attempt %d/%d), retrying: %s", attempt + 1, retries + 1, e,
+                                      extra=log_context("config"))
+                time.sleep(BULK_RETRY_BASE * 2 ** attempt)
+
+    def generate_bulk(self, rows: Iterable[Dict], workers: int = BULK_WORKERS, cache=None,
+                      retries: int = 2) -> Iterator[Dict]:
+        """
+        Maps many businesses concurrently; yields one record per row as soon as it is done.
+
+        Rows are {"row", "id", "description"} (see read_businesses). Descriptions that
+        normalize to the same text share one model call, and `cache` (a ConfigCache)
+        serves descriptions mapped in earlier runs. Every row comes back exactly once,
+        with "suppliers" on success or "error" on failure.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        def record(row, suppliers=None, error=None, cached=False):
+            return {"row": row.get("row"), "id": row.get("id"), "description": row.get("description"),
+                    "suppliers": suppliers, "cached": cached, "error": error}
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="config") as pool:
+            pending = {}   # Future -> rows waiting on it
+            inflight = {}  # normalized description -> Future
+            for row in rows:
+                if row.get("error"):
+                    yield record(row, error=row["error"])
+                    continue
+                key = fold(row.get("description") or "")
+                if not key:
+                    yield record(row, error="empty business description")
+                    continue
+                if self.expander is not None:
+                    key += f" |bom depth {self.expander.depth}"
+                suppliers = cache.get(key) if cache is not None else None
+                if suppliers is not None:
+                    yield record(row, suppliers, cached=True)
+                    continue
+                future = inflight.get(key)
+                if future is None:
+                    future = inflight[key] = pool.submit(self._map_with_retries, row["description"], retries)
+                    pending[future] = []
+                pending[future].append(row)
             
-        except Exception as e:
-            config_logger.error(f"Error generating suppliers: {str(e)}", exc_info=True)
-            print(f"Error generating suppliers: {e}")
-            return []
+            keys = {future: key for key, future in inflight.items()}
+            for future in as_completed(pending):
+                try:
+                    suppliers = future.result()
+                except Exception as e:
+                    config_logger.error("Dependency mapping failed for %d row(s): %s", len(pending[future]), e,
+                                        extra=log_context("config"))
+                    for row in pending[future]:
+                        yield record(row, error=str(e) or type(e).__name__)
+                    continue
+                if cache is not None:
+                    cache.set(keys[future], suppliers)
+                for index, row in enumerate(pending[future]):
+                    yield record(row, suppliers, cached=index > 0)
 
     def save_suppliers(self, suppliers: List[Dict[str, str]], filepath: str = "suppliers.json"):
         """
@@ -92,14 +293,77 @@ class ConfigurationAgent:
         try:
             with open(filepath, "w") as f:
                 json.dump(suppliers, f, indent=4)
-            config_logger.info(f"Successfully saved {len(suppliers)} suppliers to {filepath}")
+            config_logger.info("Successfully saved %d suppliers to %s", len(suppliers), filepath)
             print(f"\nSuccessfully saved {len(suppliers)} suppliers to {filepath}.")
         except Exception as e:
-            config_logger.error(f"Error saving suppliers to {filepath}: {str(e)}", exc_info=True)
+            config_logger.error("Error saving suppliers to %s: %s", filepath, str(e), exc_info=True)
             print(f"Error saving suppliers: {e}")
 
 if __name__ == "__main__":
-    agent = ConfigurationAgent()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Map a business's critical materials and source countries")
+    parser.add_argument("--bulk", metavar="FILE",
+                        help="configure every business in a CSV or JSONL file instead of the interview")
+    parser.add_argument("--output", metavar="FILE", default="-",
+                        help="JSONL results for --bulk, one line per row as it finishes (default: stdout)")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS, help="concurrent Config calls for --bulk")
+    parser.add_argument("--rpm", type=int,
+                        help="max model calls per minute across workers (default: SENTINEL_RATE_LIMIT)")
+    parser.add_argument("--cache", metavar="PATH", default=CONFIG_CACHE_FILE,
+                        help="dependency maps by normalized description, reused across runs")
+    parser.add_argument("--graph", metavar="PATH",
+                        help="also add each configured business to this supply graph")
+    parser.add_argument("--expand-depth", type=int, default=0,
+                        help="expand materials into their upstream inputs this many tiers deep (bill of materials)")
+    parser.add_argument("--max-expansions", type=int, default=DEFAULT_MAX_CALLS,
+                        help="uncached materials expanded per tier (bounds model calls per level)")
+    args = parser.parse_args()
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    # Configure logging for CLI
+    setup_logging(environment="cli")
+    
+    agent = ConfigurationAgent(RateLimiter(args.rpm, burst=args.workers) if args.rpm else None)
+    if args.expand_depth:
+        agent.expander = BomExpander(agent, depth=args.expand_depth, max_calls=args.max_expansions,
+                                     cache=ConfigCache(BOM_CACHE_FILE))
+    
+    if args.bulk:
+        graph = None
+        if args.graph:
+            from supply_graph import SupplyGraph
+            graph = SupplyGraph.load(args.graph)
+        
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        started = time.perf_counter()
+        done = failed = cached = 0
+        try:
+            for record in agent.generate_bulk(read_businesses(args.bulk), workers=args.workers,
+                                              cache=ConfigCache(args.cache)):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                done += 1
+                if record["error"]:
+                    failed += 1
+                    print(f"❌ Row {record['row']} ({record['id']}): {record['error']}", file=sys.stderr)
+                    continue
+                cached += record["cached"]
+                if graph is not None:
+                    graph.add_business(record["id"], record["suppliers"], context=record["description"])
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if graph is not None:
+            graph.save()
+        usage = agent.ledger.summary()
+        print(f"\n✅ {done - failed}/{done} businesses configured ({cached} from cache, {failed} failed) "
+              f"in {time.perf_counter() - started:.1f}s — tokens: {usage['total']:,} (≈ ${usage['estimated_cost_usd']:.4f})",
+              file=sys.stderr)
+        sys.exit(1 if failed else 0)
+    
     suppliers = agent.run_interview()
     
     if suppliers:
@@ -113,4 +377,6 @@ if __name__ == "__main__":
             suppliers = agent.run_interview()
         
         agent.save_suppliers(suppliers)
+        usage = agent.ledger.summary()
+        print(f"Tokens used: {usage['total']:,} (≈ ${usage['estimated_cost_usd']:.4f})")
         print("Configuration complete. You can now run 'supply_sentinel.py'.")
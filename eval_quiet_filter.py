@@ -0,0 +1,108 @@
+"""
+Quiet-filter evaluation against recorded analyst decisions
+Replays every analyst call in a cassette through the local pre-filter and
+reports how its "quiet" verdicts line up with the scores the model gave
+
+A verdict of "quiet" is correct when the recorded analyst score is at or below
+--max-score (default 0). Missed alerts are quiet verdicts on results the
+analyst scored critical; that number must stay at zero.
+
+Usage:
+    python eval_quiet_filter.py cassettes/run.jsonl
+    python eval_quiet_filter.py cassettes/*.jsonl --max-score 2 --show 10
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import Counter
+
+from quiet_filter import QUIET, QuietFilter
+from sentinel_engine import CRITICAL_SCORE
+
+# Search text embedded in the analyst prompt (CLI, Streamlit and engine prompt layouts)
+_INPUT_RE = re.compile(r"INPUT DATA: (.*?)\n\s*TASK:", re.DOTALL)
+
+
+def analyst_decisions(paths):
+    """(search_text, recorded_score) for every successful analyst call in the cassettes"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn final line
+                if record.get("kind") != "analyst" or "text" not in record:
+                    continue
+                match = _INPUT_RE.search(record.get("contents", ""))
+                try:
+                    score = json.loads(record["text"]).get("risk_score", 0)
+                except (ValueError, AttributeError):
+                    continue
+                if match:
+                    yield match.group(1).strip(), score
+
+
+def evaluate(decisions, prefilter=None, max_score=0):
+    """Confusion counts and precision/recall of the "quiet" verdict"""
+    prefilter = prefilter or QuietFilter()
+    verdicts = Counter()
+    tp = fp = fn = missed_alerts = 0
+    false_positives = []
+    for text, score in decisions:
+        verdict = prefilter.classify(text)
+        verdicts[verdict] += 1
+        quiet = score <= max_score
+        if verdict == QUIET and quiet:
+            tp += 1
+        elif verdict == QUIET:
+            fp += 1
+            false_positives.append((score, text))
+            if score >= CRITICAL_SCORE:
+                missed_alerts += 1
+        elif quiet:
+            fn += 1
+    total = sum(verdicts.values())
+    return {
+        "decisions": total,
+        "verdicts": dict(verdicts),
+        "precision": tp / (tp + fp) if tp + fp else None,
+        "recall": tp / (tp + fn) if tp + fn else None,
+        "calls_saved_pct": 100.0 * (tp + fp) / total if total else 0.0,
+        "missed_alerts": missed_alerts,
+        "false_positives": sorted(false_positives, reverse=True),
+    }
+
+
+def _pct(value):
+    return "n/a" if value is None else f"{value * 100:.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the quiet-news pre-filter on recorded analyst calls")
+    parser.add_argument("cassettes", nargs="+", help="cassette JSONL files recorded with SENTINEL_CASSETTE_MODE=record")
+    parser.add_argument("--max-score", type=int, default=0, help="highest analyst score that counts as quiet")
+    parser.add_argument("--show", type=int, default=5, help="false positives to print (highest score first)")
+    args = parser.parse_args()
+
+    report = evaluate(analyst_decisions(args.cassettes), max_score=args.max_score)
+    if not report["decisions"]:
+        print("❌ No analyst calls found in the cassettes")
+        sys.exit(1)
+
+    print(f"🧪 Quiet filter vs {report['decisions']} recorded analyst decisions (quiet = score ≤ {args.max_score})\n")
+    print("Verdicts:  " + "  ".join(f"{k}: {v}" for k, v in sorted(report["verdicts"].items())))
+    print(f"Precision: {_pct(report['precision'])}")
+    print(f"Recall:    {_pct(report['recall'])}")
+    print(f"Analyst calls saved: {report['calls_saved_pct']:.1f}%")
+    print(f"Missed alerts (quiet verdict, score ≥ {CRITICAL_SCORE}): {report['missed_alerts']}")
+    for score, text in report["false_positives"][:args.show]:
+        print(f"\n   ⚠️  score {score}: {text[:160]!r}")
+
+    sys.exit(1 if report["missed_alerts"] else 0)
+
+
+if __name__ == "__main__":
+    main()
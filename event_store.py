@@ -0,0 +1,303 @@
+"""
+SupplySentinel Event Clustering
+Structured disruption events parsed from watchman results, deduplicated across
+suppliers, so one typhoon or port strike is analyzed once and its assessment
+is reused by every supplier it affects
+
+Each watchman result is split into sentences; disruption terms (the quiet
+filter's vocabulary, with the same negation handling) are mapped to an event
+type, and each event gets a place, an optional date and source:
+
+    labor, weather, geologic, conflict, port   -> location-wide: every material from the place
+    trade, industrial, supply                  -> commodity-specific: only the searched material
+
+Effects such as backlogs, shortages or force majeure describe the cause in the
+same result rather than a second event; on their own they form a "supply" event.
+
+A sighting merges into a stored event only when type, place and commodity
+agree, the dates do not contradict each other, and the sentences describe the
+same thing (word overlap, with a lower bar when both cite the same source on the
+same date). "A strike in Chile" is not enough: a minor trucker strike and a
+copper mine strike stay separate events with separate verdicts. Events are
+indexed by place and by commodity. The engine asks the store before calling
+the analyst:
+
+    events = store.observe(search_text, material, location)
+    known = store.known_assessment(events)      # its one event already assessed today?
+    if known is None:
+        assessment = analyst(...)
+        store.assess(events, assessment, material, location)
+
+A verdict belongs to a whole search text, so it is only attached to an event,
+and only reused, when that text reports exactly one event: a copper export ban
+scored alongside a trucker strike must not reach Lithium through the strike.
+Every supplier is still searched; only the analyst call is shared, and only
+when its own search reported the same single event.
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from normalize import COUNTRY_ALIASES, normalizer as default_normalizer
+from quiet_filter import QuietFilter
+
+# Events not seen again for this long are dropped (watchman searches cover the last 7 days)
+EVENT_TTL = 7 * 24 * 3600
+
+LOCATION_WIDE = frozenset(("labor", "weather", "geologic", "conflict", "port"))
+
+# Word overlap (Jaccard) at which two sightings describe the same event; lower when source and date agree
+SAME_EVENT = 0.5
+SAME_EVENT_SOURCED = 0.35
+
+# Disruption term (as matched by the quiet filter) -> event type; generic effect verbs
+# ("halted", "delays", "disruption") carry no type of their own
+EVENT_TYPES = (
+    ("labor", r"strik|walk-?out|lock-?out|stoppage"),
+    ("port", r"port closure|blockade"),
+    ("weather", r"typhoon|hurricane|cyclone|storm|flood|rain|drought|wildfire"),
+    ("geologic", r"earthquake|tsunami|landslide"),
+    ("conflict", r"coup|war|conflict|attack|unrest|riot|protest|evacuat"),
+    ("trade", r"ban|embargo|sanction|tariff|quota|export restriction|nationali"),
+    ("industrial", r"explosion|fire|outage|blackout"),
+)
+EFFECT_TERMS = re.compile(r"shortage|force majeure|backlog|congestion")
+
+_signals = QuietFilter().signals
+_TYPE_RES = tuple((name, re.compile(pattern)) for name, pattern in EVENT_TYPES)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset((
+    "the", "and", "for", "with", "from", "that", "this", "was", "were", "has", "have", "had", "been", "are",
+    "its", "their", "into", "over", "after", "amid", "on", "in", "at", "of", "to", "by", "as", "an", "a",
+    "is", "it", "up", "due", "than", "said", "says", "will", "would", "could", "which", "while"))
+_DATE_RE = re.compile(
+    r"\b(\d{4}-\d{2}-\d{2}"
+    r"|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.? \d{1,2}(?:, \d{4})?"
+    r"|\d{1,2} (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*(?: \d{4})?"
+    r"|(?:Mon|Tues|Wednes|Thurs|Fri|Satur|Sun)day|yesterday|today)\b")
+_SOURCE_RE = re.compile(
+    r"(?:[Ss]ources?:\s*|according to |reported by |\()"
+    r"((?:Reuters|Bloomberg|AP|AFP|Xinhua|Nikkei|Financial Times|FT|WSJ|Wall Street Journal|Mining\.com|Argus|Fastmarkets)\b"
+    r"|(?:https?://)?(?:www\.)?[\w-]+(?:\.[\w-]+)*\.(?:com|org|net|gov|io|co|news)\b)")
+# Country names and aliases as they appear in text; two-letter aliases only in capitals ("US", not "us")
+_COUNTRY_RE = re.compile(r"\b(" + "|".join(sorted(
+    (re.escape(name) for canonical, aliases in COUNTRY_ALIASES.items() for name in (canonical, *aliases)
+     if len(name) > 3 or name.isupper()), key=len, reverse=True)) + r")\b")
+
+
+def event_type(term):
+    """Event type for one disruption term, or None for generic effects"""
+    for name, pattern in _TYPE_RES:
+        if pattern.search(term):
+            return name
+    return None
+
+
+def _today():
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def _words(text):
+    return frozenset(w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 1)
+
+
+def similarity(a, b):
+    """Word overlap of two event summaries, 0..1"""
+    a, b = _words(a), _words(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class Event:
+    """One real-world disruption, shared by every supplier it affects"""
+    __slots__ = ("event_id", "type", "place", "commodity", "date", "sources", "summary",
+                 "first_seen", "last_seen", "suppliers", "assessment", "assessed_on", "assessed_for")
+
+    def __init__(self, type, place, commodity=None, date=None, sources=(), summary=""):
+        self.event_id = f"{type}:{place}:{commodity or '*'}:{date or '?'}"
+        self.type = type
+        self.place = place
+        self.commodity = commodity
+        self.date = date
+        self.sources = set(sources)
+        self.summary = summary
+        self.first_seen = self.last_seen = time.time()
+        self.suppliers = set()     # (material, location) that reported or inherited it
+        self.assessment = None     # the analyst's verdict, reused for the rest of the day
+        self.assessed_on = None
+        self.assessed_for = None   # (material, location) the analyst actually scored
+
+    @property
+    def scope(self):
+        """(type, place, commodity): sightings can only be the same event within one scope"""
+        return self.type, self.place, self.commodity
+
+    def same_as(self, other):
+        """Another sighting of this event: no conflicting dates and the same story"""
+        if self.date and other.date and self.date != other.date:
+            return False
+        sourced = self.date and self.date == other.date and self.sources & other.sources
+        return similarity(self.summary, other.summary) >= (SAME_EVENT_SOURCED if sourced else SAME_EVENT)
+
+    def describe(self):
+        scope = "all materials" if self.commodity is None else self.commodity
+        return f"{self.type} event in {self.place} ({scope})"
+
+    def as_dict(self):
+        return {"event_id": self.event_id, "type": self.type, "place": self.place, "commodity": self.commodity,
+                "date": self.date, "sources": sorted(self.sources), "summary": self.summary,
+                "suppliers": sorted(self.suppliers), "score": getattr(self.assessment, "score", None),
+                "assessed_on": self.assessed_on}
+
+    def __repr__(self):
+        return f"Event({self.event_id!r}, score={getattr(self.assessment, 'score', None)!r})"
+
+
+def extract_events(text, material, location, normalizer=None):
+    """Structured events in one watchman result (not yet deduplicated)"""
+    normalizer = normalizer or default_normalizer
+    source_match = _SOURCE_RE.search(text or "")
+    source = source_match.group(1) if source_match else None
+
+    found = {}      # event_id -> Event, first sentence wins
+    effects = []    # sentences reporting only consequences
+    for sentence in _SENTENCE_RE.split(text or ""):
+        terms = _signals(sentence)
+        if not terms:
+            continue
+        types = {t for t in (event_type(term) for term in terms) if t}
+        if not types:
+            if any(EFFECT_TERMS.search(term) for term in terms):
+                effects.append(sentence)
+            continue
+        places = {normalizer.location(name) for name in _COUNTRY_RE.findall(sentence)}
+        place = places.pop() if len(places) == 1 else location
+        date_match = _DATE_RE.search(sentence)
+        for kind in sorted(types):
+            commodity = None if kind in LOCATION_WIDE else material
+            event = Event(kind, place, commodity, date_match.group(1) if date_match else None,
+                          [source] if source else (), sentence.strip()[:240])
+            found.setdefault(event.scope, event)
+
+    # Shortages and backlogs with no cause in the text are a commodity-specific supply event
+    if not found and effects:
+        event = Event("supply", location, material, None, [source] if source else (), effects[0].strip()[:240])
+        found[event.scope] = event
+    return list(found.values())
+
+
+class EventStore:
+    """
+    Deduplicated events with inverted indexes by place and commodity; thread-safe
+
+    Args:
+        ttl: seconds after the last sighting before an event is forgotten
+        normalizer: canonical country names for places mentioned in the text
+    """
+
+    def __init__(self, ttl=EVENT_TTL, normalizer=None):
+        self.ttl = ttl
+        self.normalizer = normalizer or default_normalizer
+        self._lock = threading.Lock()
+        self.events = {}          # event_id -> Event
+        self.by_place = {}        # place -> {event_id}
+        self.by_commodity = {}    # commodity -> {event_id} (commodity-specific events only)
+        self.by_scope = {}        # (type, place, commodity) -> {event_id}
+        self.counts = {"sightings": 0, "new": 0, "reused": 0}
+
+    def __len__(self):
+        return len(self.events)
+
+    def observe(self, text, material, location):
+        """Parse a watchman result and merge its events into the store; returns the stored events"""
+        parsed = extract_events(text, material, location, self.normalizer)
+        now = time.time()
+        stored = []
+        with self._lock:
+            self._expire(now)
+            for event in parsed:
+                existing = self._match(event)
+                if existing is None:
+                    event.event_id = self._unique_id(event.event_id)
+                    existing = self.events[event.event_id] = event
+                    self.by_scope.setdefault(event.scope, set()).add(event.event_id)
+                    self.by_place.setdefault(event.place, set()).add(event.event_id)
+                    if event.commodity is not None:
+                        self.by_commodity.setdefault(event.commodity, set()).add(event.event_id)
+                    self.counts["new"] += 1
+                else:
+                    existing.last_seen = now
+                    existing.sources.update(event.sources)
+                    existing.date = existing.date or event.date
+                existing.suppliers.add((material, location))
+                self.counts["sightings"] += 1
+                stored.append(existing)
+        return stored
+
+    def _match(self, event):
+        for event_id in self.by_scope.get(event.scope, ()):
+            if self.events[event_id].same_as(event):
+                return self.events[event_id]
+        return None
+
+    def _unique_id(self, event_id):
+        suffix = 1
+        candidate = event_id
+        while candidate in self.events:
+            suffix += 1
+            candidate = f"{event_id}#{suffix}"
+        return candidate
+
+    def affecting(self, material, location):
+        """Events that apply to a supplier: location-wide ones at its place plus ones for its material there"""
+        with self._lock:
+            ids = self.by_place.get(location, set())
+            if not ids:
+                return []
+            specific = self.by_commodity.get(material, set())
+            return [self.events[i] for i in ids if self.events[i].commodity is None or i in specific]
+
+    def known_assessment(self, events, day=None):
+        """The event carrying today's assessment when the text reported just that one event, else None"""
+        if len(events) != 1:
+            return None
+        day = day or _today()
+        with self._lock:
+            if events[0].assessed_on != day:
+                return None
+            self.counts["reused"] += 1
+            return events[0]
+
+    def assess(self, events, assessment, material, location, day=None):
+        """Attach the analyst's verdict to the event its text reported, if it reported only one"""
+        if not assessment.ok or len(events) != 1:
+            return
+        day = day or _today()
+        event = events[0]
+        with self._lock:
+            if event.assessed_on != day:
+                event.assessment = assessment
+                event.assessed_on = day
+                event.assessed_for = (material, location)
+
+    def snapshot(self):
+        """JSON-ready events, most widely shared first"""
+        with self._lock:
+            events = sorted(self.events.values(), key=lambda event: len(event.suppliers), reverse=True)
+            return [event.as_dict() for event in events]
+
+    def _expire(self, now):
+        for event_id in [i for i, event in self.events.items() if now - event.last_seen > self.ttl]:
+            event = self.events.pop(event_id)
+            self.by_place.get(event.place, set()).discard(event_id)
+            self.by_scope.get(event.scope, set()).discard(event_id)
+            if event.commodity is not None:
+                self.by_commodity.get(event.commodity, set()).discard(event_id)
+
+
+def events_from_env():
+    """A fresh EventStore when SENTINEL_EVENT_CLUSTERING=1, else None (off by default)"""
+    return EventStore() if os.getenv("SENTINEL_EVENT_CLUSTERING", "0") == "1" else None
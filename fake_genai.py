@@ -0,0 +1,179 @@
+"""
+Simulated Gemini client for offline benchmarks
+Drop-in stand-in for genai.Client's `models.generate_content` with configurable
+latency distributions, error and 429 rates, and canned agent payloads
+
+    client = FakeGenaiClient(seed=7, error_rate=0.01, rate_429=0.02)
+    sentinel.client = client
+"""
+
+import json
+import math
+import random
+import threading
+import time
+
+# The simulated client answers with the same types a replayed cassette does
+from cassette import ReplayedAPIError as FakeAPIError
+from cassette import ReplayedResponse as FakeResponse
+from cassette import ReplayedUsage as FakeUsage
+
+
+class LatencyModel:
+    """
+    Latency distribution in seconds, parsed from a spec string:
+
+        none                  always 0
+        fixed:0.8             constant
+        uniform:0.2,1.5       uniform between bounds
+        lognormal:1.2,0.5     lognormal with the given median (s) and sigma
+    """
+
+    def __init__(self, spec="none"):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",")] if params else []
+        if kind == "none":
+            self._sample = lambda rng: 0.0
+        elif kind == "fixed":
+            self._sample = lambda rng: values[0]
+        elif kind == "uniform":
+            self._sample = lambda rng: rng.uniform(values[0], values[1])
+        elif kind == "lognormal":
+            mu = math.log(values[0])
+            self._sample = lambda rng: rng.lognormvariate(mu, values[1])
+        else:
+            raise ValueError(f"Unknown latency spec: {spec!r}")
+
+    def sample(self, rng):
+        return self._sample(rng)
+
+
+# Typical per-call latencies observed for gemini-2.5-flash
+DEFAULT_LATENCY = {
+    "watchman": "lognormal:4.0,0.45",  # search grounding dominates
+    "analyst": "lognormal:1.6,0.35",
+    "config": "lognormal:2.5,0.3",
+}
+
+WATCHMAN_QUIET = (
+    "No significant disruptions affecting {subject} were reported in the last 7 days.\n"
+    "Shipping schedules and export volumes remain in line with seasonal norms."
+)
+WATCHMAN_ALARM = (
+    "Dockworkers at the main export terminal began an indefinite strike on Monday, halting {subject} shipments.\n"
+    "Port authorities warned of backlogs of up to three weeks.\n"
+    "Several buyers have declared force majeure on contracts due this month.\n"
+    "Source: Reuters"
+)
+WATCHMAN_MIXED = (
+    "Heavy rainfall slowed trucking routes serving {subject} producers earlier this week.\n"
+    "Officials expect normal operations to resume within days.\n"
+    "Spot prices rose 2% before easing."
+)
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        return self._client._generate(model, contents, config)
+
+
+class FakeGenaiClient:
+    """
+    Simulated client; thread-safe and deterministic for a given seed.
+
+    Args:
+        latency: dict of kind -> LatencyModel spec (kinds: watchman, analyst, config)
+        latency_scale: multiplier applied to every sampled latency (0 disables sleeping)
+        error_rate: probability of a 500 error per call
+        rate_429: probability of a 429 RESOURCE_EXHAUSTED per call
+        critical_rate / zero_rate: share of watchman results reporting a disruption / nothing notable;
+            the analyst scores these 8 and 0 (with a retry request) respectively
+    """
+
+    def __init__(self, seed=0, latency=None, latency_scale=1.0, error_rate=0.0, rate_429=0.0,
+                 critical_rate=0.1, zero_rate=0.3):
+        self.models = _FakeModels(self)
+        self.latency = {kind: LatencyModel(spec) for kind, spec in {**DEFAULT_LATENCY, **(latency or {})}.items()}
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.critical_rate = critical_rate
+        self.zero_rate = zero_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {"watchman": 0, "analyst": 0, "config": 0}
+        self.errors = 0
+        self.throttled = 0
+
+    @staticmethod
+    def classify(contents, config):
+        """Tell the agents apart by their request shape"""
+        if config is not None and getattr(config, "tools", None):
+            return "watchman"
+        if config is not None and getattr(config, "system_instruction", None):
+            return "config"
+        return "analyst"
+
+    def _generate(self, model, contents, config):
+        kind = self.classify(contents, config)
+        with self._lock:
+            self.calls[kind] += 1
+            roll = self._rng.random()
+            delay = self.latency[kind].sample(self._rng) * self.latency_scale
+            payload_roll = self._rng.random()
+        if delay:
+            time.sleep(delay)
+
+        if roll < self.rate_429:
+            with self._lock:
+                self.throttled += 1
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota).")
+        if roll < self.rate_429 + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError(500, "INTERNAL", "An internal error has occurred.")
+
+        prompt_tokens = max(1, len(str(contents)) // 4)
+        if kind == "watchman":
+            return self._watchman_response(contents, payload_roll, prompt_tokens)
+        if kind == "analyst":
+            return self._analyst_response(contents, prompt_tokens)
+        return self._config_response(prompt_tokens)
+
+    def _watchman_response(self, contents, roll, prompt_tokens):
+        subject = "the requested material"
+        if roll < self.critical_rate:
+            text = WATCHMAN_ALARM.format(subject=subject)
+        elif roll < self.critical_rate + self.zero_rate:
+            text = WATCHMAN_QUIET.format(subject=subject)
+        else:
+            text = WATCHMAN_MIXED.format(subject=subject)
+        return FakeResponse(text, FakeUsage(prompt_tokens, len(text) // 4, tool_tokens=180))
+
+    def _analyst_response(self, contents, prompt_tokens):
+        # Score the canned watchman text embedded in the prompt, so decisions stay consistent with the news
+        text = str(contents)
+        if "strike" in text:
+            data = {"risk_score": 8, "reason": "Port strike halting exports.", "action_needed": True, "retry_search": False}
+        elif "No significant disruptions" in text:
+            data = {"risk_score": 0, "reason": "No relevant information found.", "action_needed": False, "retry_search": True}
+        else:
+            data = {"risk_score": 3, "reason": "Minor weather delays, resolving.", "action_needed": False, "retry_search": False}
+        text = json.dumps(data)
+        return FakeResponse(text, FakeUsage(prompt_tokens, len(text) // 4))
+
+    def _config_response(self, prompt_tokens):
+        text = json.dumps([
+            {"material": "Lithium", "location": "Chile"},
+            {"material": "Cobalt", "location": "Democratic Republic of Congo"},
+            {"material": "Graphite", "location": "China"},
+        ])
+        return FakeResponse(text, FakeUsage(prompt_tokens, len(text) // 4))
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
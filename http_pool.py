@@ -0,0 +1,179 @@
+"""
+SupplySentinel HTTP Pool
+One process-wide HTTP connection pool, and one model client per API key, shared
+by every agent: the Config Agent, the monitoring engine behind the CLI and the
+Streamlit app, bulk onboarding workers and scan API jobs
+
+Without it each agent built its own genai.Client with its own transport and
+default pool limits, so concurrent scans in one process opened redundant TLS
+connections. Now a connection opened for one call is kept alive and reused by
+the next, whichever agent makes it.
+
+    client = genai_client(api_key)     # cassette.make_client() calls this
+    pool_stats()                       # requests, new connections, reuse ratio, connect time
+
+Environment:
+    SENTINEL_HTTP_POOL       max open connections (default 32; 0 = one transport per client, as before)
+    SENTINEL_HTTP_KEEPALIVE  seconds an idle connection is kept for reuse (default 60)
+    SENTINEL_HTTP2           1 (default) negotiates HTTP/2 when the h2 package is installed; 0 disables it
+"""
+
+import importlib.util
+import os
+import threading
+import time
+
+from stage_metrics import registry
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_KEEPALIVE = 60.0
+
+
+def http2_available():
+    """True if httpx can speak HTTP/2 here (pip install h2)"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class _ConnectTrace:
+    """httpcore trace hook for one request: counts and times the connections it has to open"""
+    __slots__ = ("pool", "tls", "started")
+
+    def __init__(self, pool, tls):
+        self.pool = pool
+        self.tls = tls
+        self.started = None
+
+    def __call__(self, event, info):
+        if event == "connection.connect_tcp.started":
+            self.started = time.perf_counter()
+        elif event == "connection.start_tls.complete" or (event == "connection.connect_tcp.complete" and not self.tls):
+            self.pool._connected(time.perf_counter() - self.started)
+
+
+class HttpPool:
+    """
+    Shared httpx client with bounded, keep-alive connections; thread-safe
+
+    Args:
+        max_connections: open connections across all hosts; requests beyond it wait for a free slot
+        keepalive: seconds an idle connection stays open for reuse
+        http2: multiplex calls over one connection per host when h2 is installed
+    """
+
+    def __init__(self, max_connections=DEFAULT_POOL_SIZE, keepalive=DEFAULT_KEEPALIVE, http2=True):
+        import httpx  # installed with google-genai; only paid for when a live client is built
+
+        self.max_connections = max_connections
+        self.keepalive = keepalive
+        self.http2 = http2 and http2_available()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+        # Requests wait here rather than in httpcore's own queue: when every connection is busy, httpcore
+        # 1.0 can close an idle connection that another thread has just been handed (EBADF on read)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                keepalive_expiry=keepalive),
+            http2=self.http2,
+        )
+        self._transport_request = self._transport.handle_request
+        self._transport.handle_request = self._handle_request
+        # genai passes its own per-request timeout (none by default); keep the client's default the same
+        self.client = httpx.Client(transport=self._transport, timeout=None,
+                                   event_hooks={"request": [self._on_request]})
+
+    def _handle_request(self, request):
+        self._slots.acquire()
+        try:
+            response = self._transport_request(request)
+        except BaseException:
+            self._slots.release()
+            raise
+        stream, close, released = response.stream, response.stream.close, []
+
+        def release_on_close():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self._slots.release()
+
+        stream.close = release_on_close
+        return response
+
+    def _on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        registry.inc("http_requests")
+        request.extensions["trace"] = _ConnectTrace(self, request.url.scheme == "https")
+
+    def _connected(self, seconds):
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds += seconds
+        registry.inc("http_connections")
+        registry.observe("http_connect", "ok", seconds)
+
+    def stats(self):
+        with self._lock:
+            requests, connections, connect_seconds = self.requests, self.connections, self.connect_seconds
+        return {
+            "requests": requests,
+            "connections": connections,
+            "reused": max(0, requests - connections),
+            "reuse_ratio": (requests - connections) / requests if requests else None,
+            "connect_s": connect_seconds,
+            "max_connections": self.max_connections,
+            "http2": self.http2,
+        }
+
+    def close(self):
+        self.client.close()
+
+
+_pool = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def pool_from_env():
+    """HttpPool configured from SENTINEL_HTTP_POOL / SENTINEL_HTTP_KEEPALIVE / SENTINEL_HTTP2, or None when disabled"""
+    size = int(os.getenv("SENTINEL_HTTP_POOL", DEFAULT_POOL_SIZE))
+    if size <= 0:
+        return None
+    return HttpPool(size, float(os.getenv("SENTINEL_HTTP_KEEPALIVE", DEFAULT_KEEPALIVE)),
+                    http2=os.getenv("SENTINEL_HTTP2", "1") != "0")
+
+
+def shared_pool():
+    """The process-wide pool (None when SENTINEL_HTTP_POOL=0)"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = pool_from_env() or False
+        return _pool or None
+
+
+def pool_stats():
+    """Shared pool stats, or None if no live client has been built in this process"""
+    return _pool.stats() if _pool else None
+
+
+def genai_client(api_key):
+    """
+    One genai.Client per API key for the whole process, on the shared pool
+
+    Agents used to build a client each; reusing one keeps its connections warm.
+    """
+    pool = shared_pool()
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            from google import genai
+            from google.genai import types
+            http_options = types.HttpOptions(httpx_client=pool.client) if pool is not None else None
+            client = _clients[api_key] = genai.Client(api_key=api_key, http_options=http_options)
+        return client
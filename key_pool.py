@@ -0,0 +1,261 @@
+"""
+SupplySentinel Key Pool
+Spread model calls over several Gemini API keys, each within its own per-minute quota
+
+One key caps a scan at that key's quota. Given several (GEMINI_API_KEY=key1,key2,...)
+every call goes to the key with the most quota left in the last minute. A key
+that answers 429 sits out a cooldown (doubling while it keeps failing), and one
+that is rejected (401/403, invalid key) sits out much longer; the call is retried
+on another key. When every key is spent, calls wait for the first to free up.
+
+    client = make_client("key1,key2,key3")   # cassette.make_client builds a KeyPool for several keys
+    client.models.generate_content(...)      # same surface as genai.Client
+    key_pool_stats()                         # per-key use, utilization and state
+
+Environment:
+    SENTINEL_KEY_RPM       calls per minute per key: one number for every key, or one per key
+                           separated by commas (default 0 = unknown; calls go to the least used key)
+    SENTINEL_KEY_COOLDOWN  seconds a throttled key first sits out (default 30)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from logging_config import watchman_logger
+from stage_metrics import registry
+
+WINDOW = 60.0
+DEFAULT_COOLDOWN = 30.0
+MAX_COOLDOWN = 300.0
+# A rejected key stays out this long: long enough to stop paying for it, short enough to notice a fix
+AUTH_COOLDOWN = 900.0
+
+_AUTH_STATUSES = ("UNAUTHENTICATED", "PERMISSION_DENIED")
+
+
+def split_keys(value):
+    """API keys from a comma-separated string, blanks and repeats dropped"""
+    keys = []
+    for key in (value or "").split(","):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def key_label(index, key):
+    """Loggable name for a key: its position and last four characters"""
+    return f"key{index + 1} …{key[-4:]}"
+
+
+def is_throttled(error):
+    return getattr(error, "code", None) == 429 or getattr(error, "status", None) == "RESOURCE_EXHAUSTED"
+
+
+def is_rejected(error):
+    """The key itself is bad: unauthenticated, not permitted, or not a valid key"""
+    return (getattr(error, "code", None) in (401, 403) or getattr(error, "status", None) in _AUTH_STATUSES
+            or "API_KEY_INVALID" in str(error) or "API key not valid" in str(error))
+
+
+class NoUsableKey(RuntimeError):
+    """Every key in the pool has been rejected"""
+
+
+class _Models:
+    def __init__(self, generate):
+        self.generate_content = generate
+
+
+class _KeyState:
+    __slots__ = ("label", "client", "rpm", "starts", "in_flight", "calls", "throttled", "rejected",
+                 "failures", "drained", "drained_until", "last_used", "last_error")
+
+    def __init__(self, label, client, rpm):
+        self.label = label
+        self.client = client
+        self.rpm = rpm
+        self.starts = deque()  # monotonic start time of each call in the last WINDOW seconds
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.failures = 0  # 429s in a row
+        self.drained = None  # why the key is out of rotation: "throttled" or "rejected"
+        self.drained_until = 0.0
+        self.last_used = 0.0
+        self.last_error = None
+
+    def used(self, now):
+        while self.starts and self.starts[0] <= now - WINDOW:
+            self.starts.popleft()
+        return len(self.starts)
+
+    def state(self, now):
+        if self.drained_until > now:
+            return self.drained
+        if self.rpm and self.used(now) >= self.rpm:
+            return "saturated"
+        return "active"
+
+
+class KeyPool:
+    """
+    Client stand-in that schedules each call on the key with the most quota left; thread-safe
+
+    Args:
+        clients: [(label, client)], one genai client per key
+        rpm: calls per minute per key, as one number or a list aligned with clients; 0/None = unknown
+        cooldown: seconds a key sits out after its first 429 (doubled per further 429, up to MAX_COOLDOWN)
+        auth_cooldown: seconds a rejected key sits out
+    """
+
+    def __init__(self, clients, rpm=None, cooldown=DEFAULT_COOLDOWN, auth_cooldown=AUTH_COOLDOWN):
+        if not clients:
+            raise ValueError("KeyPool needs at least one client")
+        limits = list(rpm) if isinstance(rpm, (list, tuple)) else [rpm] * len(clients)
+        if len(limits) != len(clients):
+            raise ValueError(f"Got {len(limits)} per-key limits for {len(clients)} keys")
+        self.keys = [_KeyState(label, client, limit or None) for (label, client), limit in zip(clients, limits)]
+        self.cooldown = cooldown
+        self.auth_cooldown = auth_cooldown
+        self._lock = threading.Lock()
+        self.models = _Models(self._generate)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _pick(self, now):
+        """(key, 0) to call now, (None, seconds) to wait, or (None, None) if every key was rejected"""
+        best, best_rank, wait = None, None, None
+        for key in self.keys:
+            if key.drained_until > now:
+                if key.drained == "throttled":
+                    wait = min(wait or WINDOW, key.drained_until - now)
+                continue
+            used = key.used(now)
+            if key.rpm and used >= key.rpm:
+                wait = min(wait or WINDOW, key.starts[0] + WINDOW - now)
+                continue
+            # Most quota left first; unknown quotas rank by least used. Ties go to the idlest key
+            rank = (used - key.rpm if key.rpm else used, key.in_flight, key.last_used)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = key, rank
+        return (best, 0) if best is not None else (None, wait)
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                key, wait = self._pick(now)
+                if key is not None:
+                    key.starts.append(now)
+                    key.in_flight += 1
+                    key.calls += 1
+                    key.last_used = now
+                    return key
+            if wait is None:
+                raise NoUsableKey(f"All {len(self.keys)} API keys were rejected: {self.keys[0].last_error}")
+            time.sleep(max(wait, 0.01))
+
+    def _generate(self, model, contents, config=None):
+        attempts = len(self.keys) + 1
+        for attempt in range(attempts):
+            key = self._acquire()
+            registry.inc("key_calls", key=key.label)
+            try:
+                response = key.client.models.generate_content(model=model, contents=contents, config=config)
+            except Exception as e:
+                if not (is_throttled(e) or is_rejected(e)):
+                    self._release(key)
+                    raise
+                # The key, not the request, is the problem: take it out of rotation and try another
+                self._drain(key, e)
+                if attempt == attempts - 1:
+                    raise
+                continue
+            self._release(key, ok=True)
+            return response
+
+    def _release(self, key, ok=False):
+        with self._lock:
+            key.in_flight -= 1
+            if ok:
+                key.failures = 0
+
+    def _drain(self, key, error):
+        with self._lock:
+            key.in_flight -= 1
+            key.last_error = str(error)
+            if is_rejected(error):
+                key.rejected += 1
+                key.drained = "rejected"
+                seconds = self.auth_cooldown
+            else:
+                key.throttled += 1
+                key.failures += 1
+                key.drained = "throttled"
+                seconds = min(self.cooldown * 2 ** (key.failures - 1), MAX_COOLDOWN)
+            key.drained_until = time.monotonic() + seconds
+        if key.drained == "rejected":
+            registry.inc("key_rejected", key=key.label)
+            watchman_logger.error("API key %s rejected, out of rotation for %.0fs: %s", key.label, seconds, error)
+        else:
+            registry.inc("key_throttled", key=key.label)
+            watchman_logger.warning("API key %s throttled (429), out of rotation for %.0fs", key.label, seconds)
+
+    def stats(self):
+        """Per key: calls, use in the last minute against its quota, 429s, rejections and state"""
+        with self._lock:
+            now = time.monotonic()
+            return [{
+                "key": key.label,
+                "rpm": key.rpm,
+                "used": key.used(now),
+                "utilization": key.used(now) / key.rpm if key.rpm else None,
+                "in_flight": key.in_flight,
+                "calls": key.calls,
+                "throttled": key.throttled,
+                "rejected": key.rejected,
+                "state": key.state(now),
+                "back_in_s": max(0.0, key.drained_until - now),
+            } for key in self.keys]
+
+
+def rpm_from_env(count):
+    """Per-key limits from SENTINEL_KEY_RPM: one value for all keys or one per key"""
+    values = [int(value or 0) for value in os.getenv("SENTINEL_KEY_RPM", "0").split(",")]
+    if len(values) == 1:
+        return values * count
+    if len(values) != count:
+        raise ValueError(f"SENTINEL_KEY_RPM lists {len(values)} limits for {count} API keys")
+    return values
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def shared_key_pool(keys):
+    """One KeyPool per set of keys for the whole process, so every agent draws on the same quotas"""
+    from http_pool import genai_client
+
+    keys = tuple(keys)
+    with _lock:
+        pool = _pools.get(keys)
+        if pool is None:
+            pool = _pools[keys] = KeyPool(
+                [(key_label(i, key), genai_client(key)) for i, key in enumerate(keys)],
+                rpm=rpm_from_env(len(keys)),
+                cooldown=float(os.getenv("SENTINEL_KEY_COOLDOWN", DEFAULT_COOLDOWN)),
+            )
+        return pool
+
+
+def key_pool_stats():
+    """Per-key stats across the pools built in this process, or None if no key pool is in use"""
+    with _lock:
+        pools = list(_pools.values())
+    return [row for pool in pools for row in pool.stats()] or None
@@ -0,0 +1,358 @@
+"""
+SupplySentinel Log Query Tool
+Time-indexed search over the rotated logs/supplysentinel.log* files
+
+Each log file gets a sparse index (timestamp -> byte offset, one entry every
+INDEX_STRIDE bytes) stored under logs/.index/. Indexes are keyed by file
+identity rather than name, so they survive rotation, and are extended
+incrementally as the active file grows. Queries bisect the index to the start
+of the requested time range and read forward through mmap, so they only touch
+the part of the archive that falls inside the range.
+
+Usage:
+    python log_query.py --since 2025-11-18 --until "2025-11-19 12:00" --agent Analyst --grep cobalt
+    python log_query.py --since 24h --level WARNING
+"""
+
+import argparse
+import bisect
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+from logging_config import LOGS_DIR
+
+LOG_BASENAME = "supplysentinel.log"
+INDEX_DIRNAME = ".index"
+
+# Bytes between sparse index entries
+INDEX_STRIDE = 64 * 1024
+
+# Timestamps are fixed-width "YYYY-MM-DD HH:MM:SS", so byte strings sort chronologically
+TIMESTAMP_LEN = 19
+_RECORD_START = re.compile(rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} \[")
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+def _is_record_start(line):
+    return len(line) > TIMESTAMP_LEN and _RECORD_START.match(line) is not None
+
+
+def _parse_record_line(line):
+    """Split a record's first line into (timestamp, level, logger name)"""
+    level_end = line.find(b"]", TIMESTAMP_LEN + 2)
+    level = line[TIMESTAMP_LEN + 2:level_end]
+    name_start = line.find(b"[", level_end)
+    name_end = line.find(b"]", name_start)
+    name = line[name_start + 1:name_end] if name_start != -1 and name_end != -1 else b""
+    return line[:TIMESTAMP_LEN], level, name
+
+
+class LogIndex:
+    """Sparse timestamp -> byte offset index for one log file"""
+
+    def __init__(self, path, index_dir):
+        self.path = path
+        self.index_dir = index_dir
+        self.identity = None
+        self.size = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.timestamps = []
+        self.offsets = []
+
+    @staticmethod
+    def file_identity(path):
+        """Identity that survives rotation renames: inode plus a hash of the first line"""
+        with open(path, "rb") as f:
+            first_line = f.readline()
+        digest = hashlib.sha1(first_line).hexdigest()[:16]
+        return f"{os.stat(path).st_ino}-{digest}"
+
+    @property
+    def index_path(self):
+        return os.path.join(self.index_dir, f"{self.identity}.json")
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.size = data["size"]
+        self.first_ts = data["first_ts"]
+        self.last_ts = data["last_ts"]
+        self.timestamps = data["timestamps"]
+        self.offsets = data["offsets"]
+        return True
+
+    def _save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "path": os.path.basename(self.path),
+                "size": self.size,
+                "first_ts": self.first_ts,
+                "last_ts": self.last_ts,
+                "timestamps": self.timestamps,
+                "offsets": self.offsets,
+            }, f)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self):
+        """Load the stored index and extend it over any bytes appended since"""
+        self.identity = self.file_identity(self.path)
+        current_size = os.path.getsize(self.path)
+        if not self._load() or self.size > current_size:
+            self.size = 0
+            self.first_ts = self.last_ts = None
+            self.timestamps, self.offsets = [], []
+        if current_size == self.size:
+            return self
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Resume one stride after the last entry (or from the start of a new file)
+            pos = self.offsets[-1] + INDEX_STRIDE if self.offsets else 0
+            while pos < current_size:
+                offset = self._next_record(mm, pos, current_size)
+                if offset is None:
+                    break
+                ts = mm[offset:offset + TIMESTAMP_LEN].decode("ascii")
+                if self.first_ts is None:
+                    self.first_ts = ts
+                self.timestamps.append(ts)
+                self.offsets.append(offset)
+                pos = offset + INDEX_STRIDE
+            self.last_ts = self._last_timestamp(mm, current_size) or self.last_ts
+
+        self.size = current_size
+        self._save()
+        return self
+
+    @staticmethod
+    def _next_record(mm, pos, end):
+        """Offset of the first record line starting at or after pos"""
+        if pos > 0 and mm[pos - 1:pos] != b"\n":
+            newline = mm.find(b"\n", pos, end)
+            if newline == -1:
+                return None
+            pos = newline + 1
+        while pos < end:
+            newline = mm.find(b"\n", pos, end)
+            line_end = end if newline == -1 else newline
+            if _is_record_start(mm[pos:line_end]):
+                return pos
+            if newline == -1:
+                return None
+            pos = newline + 1
+        return None
+
+    @staticmethod
+    def _last_timestamp(mm, end):
+        """Timestamp of the last record, scanning backwards from the end of the file"""
+        line_end = end
+        while line_end > 0:
+            line_start = mm.rfind(b"\n", 0, max(line_end - 1, 0)) + 1
+            line = mm[line_start:line_end]
+            if _is_record_start(line):
+                return line[:TIMESTAMP_LEN].decode("ascii")
+            if line_start == 0:
+                return None
+            line_end = line_start
+        return None
+
+    def start_offset(self, since):
+        """Byte offset to start reading from for records at or after `since`"""
+        if since is None or not self.timestamps:
+            return 0
+        # Entry idx-1 is the last one before `since`; step back one more because
+        # records from concurrent threads can be written slightly out of order
+        idx = bisect.bisect_left(self.timestamps, since)
+        return self.offsets[max(idx - 2, 0)]
+
+
+def log_files(logs_dir=LOGS_DIR):
+    """Rotated log files, oldest first (supplysentinel.log.5 ... supplysentinel.log)"""
+    base = os.path.join(logs_dir, LOG_BASENAME)
+    rotated = []
+    for path in glob.glob(base + ".*"):
+        suffix = path[len(base) + 1:]
+        if suffix.isdigit():
+            rotated.append((int(suffix), path))
+    files = [path for _, path in sorted(rotated, reverse=True)]
+    if os.path.exists(base):
+        files.append(base)
+    return [path for path in files if os.path.getsize(path) > 0]
+
+
+def refresh_indexes(logs_dir=LOGS_DIR):
+    """Bring every file's index up to date and drop indexes of rotated-out files"""
+    index_dir = os.path.join(logs_dir, INDEX_DIRNAME)
+    indexes = [LogIndex(path, index_dir).refresh() for path in log_files(logs_dir)]
+    live = {index.index_path for index in indexes}
+    for stale in glob.glob(os.path.join(index_dir, "*.json")):
+        if stale not in live:
+            os.remove(stale)
+    return indexes
+
+
+def query_logs(since=None, until=None, agent=None, level=None, contains=None,
+               limit=None, logs_dir=LOGS_DIR):
+    """
+    Yield matching log records, oldest first
+
+    Args:
+        since / until: "YYYY-MM-DD HH:MM:SS" bounds (inclusive); None for open-ended
+        agent: Agent name (e.g. "Analyst"), case-insensitive
+        level: Minimum level name (e.g. "WARNING")
+        contains: Case-insensitive substring the record text must contain
+        limit: Stop after this many records
+
+    Yields:
+        dicts with timestamp, level, agent, message and text (full record, including tracebacks)
+    """
+    since_b = since.encode("ascii") if since else None
+    until_b = until.encode("ascii") if until else None
+    agent_b = agent.lower().encode("utf-8") if agent else None
+    levels = {lvl.encode("ascii") for lvl in LEVELS[LEVELS.index(level.upper()):]} if level else None
+    needle = contains.lower().encode("utf-8") if contains else None
+
+    found = 0
+    for index in refresh_indexes(logs_dir):
+        if since and index.last_ts and index.last_ts < since:
+            continue
+        if until and index.first_ts and index.first_ts > until:
+            continue
+
+        with open(index.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            pos = index.start_offset(since)
+            record = None
+
+            while pos < end:
+                newline = mm.find(b"\n", pos, end)
+                line_end = end if newline == -1 else newline
+                line = mm[pos:line_end]
+                pos = line_end + 1
+
+                if not _is_record_start(line):
+                    # Continuation (e.g. traceback) of the current record
+                    if record is not None:
+                        record[1].append(line)
+                    continue
+
+                if record is not None and _matches(record, agent_b, levels, needle):
+                    yield _render(record)
+                    found += 1
+                    if limit and found >= limit:
+                        return
+                record = None
+
+                ts = line[:TIMESTAMP_LEN]
+                if since_b and ts < since_b:
+                    continue
+                if until_b and ts > until_b:
+                    # Allow a little disorder between threads before giving up on this file
+                    if ts[:16] > until_b[:16]:
+                        break
+                    continue
+                record = (_parse_record_line(line), [line])
+
+            if record is not None and _matches(record, agent_b, levels, needle):
+                yield _render(record)
+                found += 1
+                if limit and found >= limit:
+                    return
+
+
+def _matches(record, agent_b, levels, needle):
+    (_, level, name), lines = record
+    if levels is not None and level not in levels:
+        return False
+    if agent_b is not None and name.lower().replace(b"agent.", b"") != agent_b:
+        return False
+    if needle is not None and not any(needle in line.lower() for line in lines):
+        return False
+    return True
+
+
+def _render(record):
+    (ts, level, name), lines = record
+    text = b"\n".join(lines).decode("utf-8", errors="replace")
+    first_line = text.split("\n", 1)[0]
+    # "<ts> [LEVEL] [Agent.X] — message"; the separator may be mis-encoded in old files
+    parts = first_line.split("] ", 2)
+    message = parts[2].split(" ", 1)[-1] if len(parts) == 3 else first_line
+    return {
+        "timestamp": ts.decode("ascii"),
+        "level": level.decode("ascii", errors="replace"),
+        "agent": name.decode("utf-8", errors="replace").replace("Agent.", ""),
+        "message": message,
+        "text": text,
+    }
+
+
+def parse_time(value, end_of_day=False, now=None):
+    """
+    Accept "YYYY-MM-DD", "YYYY-MM-DD HH:MM[:SS]" or a relative "30m" / "24h" / "7d"
+
+    A bare date means midnight, or 23:59:59 when end_of_day is set (for --until).
+    """
+    value = value.strip()
+    now = now or datetime.now()
+    relative = re.fullmatch(r"(\d+)([mhd])", value)
+    if relative:
+        amount, unit = int(relative.group(1)), relative.group(2)
+        delta = {"m": timedelta(minutes=amount), "h": timedelta(hours=amount), "d": timedelta(days=amount)}[unit]
+        return (now - delta).strftime("%Y-%m-%d %H:%M:%S")
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d" and end_of_day:
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.strftime("%Y-%m-%d %H:%M:%S")
+    raise ValueError(f"Unrecognised time: {value!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query SupplySentinel CLI logs by time, agent, level and text")
+    parser.add_argument("--since", help="start time (YYYY-MM-DD[ HH:MM[:SS]] or 30m/24h/7d ago)")
+    parser.add_argument("--until", help="end time (same formats as --since)")
+    parser.add_argument("--agent", help="Config, Watchman, Analyst or Dispatcher")
+    parser.add_argument("--level", choices=LEVELS, type=str.upper, help="minimum level")
+    parser.add_argument("--grep", dest="contains", help="case-insensitive substring")
+    parser.add_argument("--limit", type=int, help="maximum records to print")
+    parser.add_argument("--logs-dir", default=LOGS_DIR, help="log directory (default: logs)")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per record")
+    args = parser.parse_args(argv)
+
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until, end_of_day=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not os.path.isdir(args.logs_dir):
+        print(f"❌ Log directory not found: {args.logs_dir}")
+        return 1
+
+    count = 0
+    for record in query_logs(since, until, args.agent, args.level, args.contains,
+                             args.limit, args.logs_dir):
+        print(json.dumps(record, ensure_ascii=False) if args.json else record["text"])
+        count += 1
+    print(f"— {count} matching records", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
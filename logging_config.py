@@ -3,34 +3,157 @@ SupplySentinel Logging Configuration
 Professional-grade structured logging for all agents
 """
 
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
 from collections import deque
 
+from tracing import current_trace_id
+
 # Log format with timestamp, level, agent name, and message
 LOG_FORMAT = "%(asctime)s [%(levelname)s] [%(name)s] — %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-# Ensure logs directory exists
+# Created by setup_logging() when a file handler needs it (not at import time)
 LOGS_DIR = "logs"
-os.makedirs(LOGS_DIR, exist_ok=True)
 
 # In-memory log storage for Streamlit UI (last 500 logs)
 _log_buffer = deque(maxlen=500)
 
+# Structured fields agents attach to records via extra=log_context(...)
+STRUCTURED_FIELDS = ("material", "location", "score", "stage", "latency_ms", "trace_id")
+
+# Argument types that cannot change between the log call and rendering
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None))
+
+# Used to render tracebacks for in-memory entries
+_EXC_FORMATTER = logging.Formatter()
+
+def _args_are_frozen(args):
+    """True if rendering the message later gives the same text as rendering it now"""
+    return isinstance(args, tuple) and all(type(arg) in _IMMUTABLE_ARG_TYPES for arg in args)
+
+def log_context(stage, material=None, location=None, score=None, latency_ms=None):
+    """
+    Build the `extra` mapping for a structured agent log call
+    
+    Example:
+        analyst_logger.info("Risk score computed: %s/10", score,
+                            extra=log_context("analyst", material, location, score=score))
+    """
+    context = {"stage": stage}
+    if material is not None:
+        context["material"] = material
+    if location is not None:
+        context["location"] = location
+    if score is not None:
+        context["score"] = score
+    if latency_ms is not None:
+        context["latency_ms"] = round(latency_ms, 1)
+    # Correlates the record with its supplier trace (see tracing.py)
+    trace_id = current_trace_id()
+    if trace_id is not None:
+        context["trace_id"] = trace_id
+    return context
+
+class LogEntry:
+    """
+    Compact in-memory log entry for the Streamlit UI.
+    
+    Keeps the unformatted message and its arguments; the text is only
+    rendered (once) when the UI reads `message` or `full_text`.
+    """
+    __slots__ = ("created", "level", "name", "material", "location", "score",
+                 "stage", "latency_ms", "trace_id", "exc_text", "_msg", "_args", "_message")
+    
+    def __init__(self, record):
+        self.created = record.created
+        self.level = record.levelname
+        self.name = record.name
+        self.material = getattr(record, "material", None)
+        self.location = getattr(record, "location", None)
+        self.score = getattr(record, "score", None)
+        self.stage = getattr(record, "stage", None)
+        self.latency_ms = getattr(record, "latency_ms", None)
+        self.trace_id = getattr(record, "trace_id", None)
+        # Tracebacks pin frames in memory, so render them now (errors are rare)
+        self.exc_text = _EXC_FORMATTER.formatException(record.exc_info) if record.exc_info else None
+        self._message = None
+        if record.args and not _args_are_frozen(record.args):
+            self._message = record.getMessage()
+            self._msg = self._args = None
+        else:
+            self._msg = record.msg
+            self._args = record.args
+    
+    @property
+    def agent(self):
+        return self.name.replace("Agent.", "")
+    
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self.created)
+    
+    @property
+    def message(self):
+        if self._message is None:
+            msg = str(self._msg)
+            if self._args:
+                msg = msg % self._args
+            self._message = msg
+            self._msg = self._args = None
+        return self._message
+    
+    @property
+    def full_text(self):
+        text = f"{self.timestamp.strftime(DATE_FORMAT)} [{self.level}] [{self.name}] — {self.message}"
+        if self.exc_text:
+            text = f"{text}\n{self.exc_text}"
+        return text
+
 class StreamlitLogHandler(logging.Handler):
-    """Custom handler to capture logs for Streamlit UI display"""
+    """Custom handler to capture logs for Streamlit UI display (formatting deferred to LogEntry)"""
     def emit(self, record):
-        log_entry = self.format(record)
-        _log_buffer.append({
-            'timestamp': datetime.fromtimestamp(record.created),
-            'level': record.levelname,
-            'agent': record.name.replace('Agent.', ''),
-            'message': record.getMessage(),
-            'full_text': log_entry
-        })
+        _log_buffer.append(LogEntry(record))
+
+class JsonLinesFormatter(logging.Formatter):
+    """Render records as one JSON object per line, structured fields included"""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "agent": record.name.replace("Agent.", ""),
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler for in-process queues.
+
+    The stock QueueHandler.prepare() formats every record on the calling
+    thread so it can be pickled. Our queue never leaves the process, so the
+    record is passed through as-is; message arguments are only rendered here
+    when they are mutable and could change before the listener formats them.
+    """
+    def prepare(self, record):
+        if record.args and not _args_are_frozen(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+# Background listener used when setup_logging(use_queue=True)
+_queue_listener = None
 
 def get_recent_logs(limit=100):
     """Get recent logs for UI display"""
@@ -40,26 +163,35 @@ def clear_log_buffer():
     """Clear in-memory log buffer"""
     _log_buffer.clear()
 
-def setup_logging(environment="streamlit"):
+def setup_logging(environment="streamlit", use_queue=False, json_logs=False):
     """
     Configure logging for SupplySentinel
     
     Args:
         environment: "streamlit" for Cloud Run (stdout only) or "cli" for file-based logging
+        use_queue: If True, agents only enqueue records; formatting, console and
+            file I/O (including rotation) run on a background listener thread
+        json_logs: If True, also write structured JSON lines to logs/supplysentinel.jsonl
     """
+    global _queue_listener
+    
+    # Drain and stop a listener left over from a previous call
+    shutdown_logging()
+    
     # Root logger configuration
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.DEBUG)
     
     # Clear existing handlers
     root_logger.handlers.clear()
+    handlers = []
     
     # Console handler (stdout) - always enabled
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # Streamlit UI handler (in-memory buffer for web display)
     if environment == "streamlit":
@@ -67,19 +199,73 @@ def setup_logging(environment="streamlit"):
         streamlit_handler.setLevel(logging.DEBUG)
         streamlit_formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
         streamlit_handler.setFormatter(streamlit_formatter)
-        root_logger.addHandler(streamlit_handler)
+        handlers.append(streamlit_handler)
+    
+    if environment == "cli" or json_logs:
+        os.makedirs(LOGS_DIR, exist_ok=True)
     
     # File handler for CLI mode only
     if environment == "cli":
         file_handler = RotatingFileHandler(
             os.path.join(LOGS_DIR, "supplysentinel.log"),
             maxBytes=10 * 1024 * 1024,  # 10MB
-            backupCount=5
+            backupCount=5,
+            encoding="utf-8"  # fixed encoding keeps log_query.py byte offsets portable
         )
         file_handler.setLevel(logging.DEBUG)
         file_formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
         file_handler.setFormatter(file_formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # Structured JSON-lines output for downstream tools (no regex parsing)
+    if json_logs:
+        json_handler = RotatingFileHandler(
+            os.path.join(LOGS_DIR, "supplysentinel.jsonl"),
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5,
+            encoding="utf-8"
+        )
+        json_handler.setLevel(logging.DEBUG)
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+    
+    if use_queue:
+        # Hot path: a lock-free SimpleQueue put; the listener respects each handler's level
+        log_queue = queue.SimpleQueue()
+        _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _queue_listener.start()
+        root_logger.addHandler(DeferredQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
+
+def shutdown_logging():
+    """
+    Flush pending records and stop the background listener, if any.
+    
+    Safe to call more than once; registered with atexit so queued records are
+    written before the interpreter exits.
+    """
+    global _queue_listener
+    if _queue_listener is None:
+        return
+    
+    listener = _queue_listener
+    _queue_listener = None
+    # stop() enqueues a sentinel and joins the thread once the queue is drained
+    listener.stop()
+    
+    # Hand the real handlers back to the root logger so late records
+    # (e.g. from other atexit hooks) are still written synchronously
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in listener.handlers:
+        handler.flush()
+        root_logger.addHandler(handler)
+
+atexit.register(shutdown_logging)
 
 def get_agent_logger(agent_name):
     """
@@ -1,15 +1,24 @@
 """
 Metrics tracking for SupplySentinel
-Tracks historical performance metrics across sessions
+Tracks historical performance metrics across sessions, and every scored
+assessment per supplier (the input to risk_trends)
 """
 
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logging_config import LOGS_DIR
+from tracing import span
 
 METRICS_FILE = "metrics_history.json"
 
+# One JSON line per scored supplier result, kept indefinitely (months of history for trend analytics)
+ASSESSMENTS_FILE = os.path.join(LOGS_DIR, "assessments.jsonl")
+
 class MetricsTracker:
     def __init__(self):
         self.metrics = self._load_metrics()
@@ -31,28 +40,43 @@ class MetricsTracker:
             "total_critical_alerts": 0,
             "total_risk_scores": [],
             "last_scan_timestamp": None,
-            "scan_history": []
+            "scan_history": [],
+            "total_tokens": {"input": 0, "output": 0, "tool": 0},
+            "total_cost_usd": 0.0
         }
     
     def _save_metrics(self):
         """Save metrics to file"""
-        with open(METRICS_FILE, 'w') as f:
+        with span("_save_metrics"), open(METRICS_FILE, 'w') as f:
             json.dump(self.metrics, f, indent=2)
     
-    def record_scan(self, suppliers_count: int, critical_count: int, risk_scores: List[float]):
-        """Record a completed scan"""
+    def record_scan(self, suppliers_count: int, critical_count: int, risk_scores: List[float],
+                    token_usage: Optional[Dict] = None):
+        """Record a completed scan (token_usage: TokenLedger.summary() for the cycle)"""
         self.metrics["total_scans"] += suppliers_count
         self.metrics["total_critical_alerts"] += critical_count
         self.metrics["total_risk_scores"].extend(risk_scores)
         self.metrics["last_scan_timestamp"] = datetime.now().isoformat()
         
-        # Add to scan history (keep last 100 scans)
-        self.metrics["scan_history"].append({
+        scan = {
             "timestamp": self.metrics["last_scan_timestamp"],
             "suppliers": suppliers_count,
             "critical": critical_count,
             "avg_risk": sum(risk_scores) / len(risk_scores) if risk_scores else 0
-        })
+        }
+        
+        if token_usage:
+            # Files written before token accounting lack these keys
+            totals = self.metrics.setdefault("total_tokens", {"input": 0, "output": 0, "tool": 0})
+            for kind in totals:
+                totals[kind] += token_usage.get(kind, 0)
+            self.metrics["total_cost_usd"] = self.metrics.get("total_cost_usd", 0.0) + token_usage["estimated_cost_usd"]
+            scan["tokens"] = token_usage["total"]
+            scan["cost_usd"] = token_usage["estimated_cost_usd"]
+            scan["deferred"] = token_usage["deferred"]
+        
+        # Add to scan history (keep last 100 scans)
+        self.metrics["scan_history"].append(scan)
         
         # Keep only last 100 scans
         if len(self.metrics["scan_history"]) > 100:
@@ -79,6 +103,14 @@ class MetricsTracker:
         """Get timestamp of last scan"""
         return self.metrics["last_scan_timestamp"]
     
+    def get_total_tokens(self) -> int:
+        """Get total model tokens (input + output + tool) across all scans"""
+        return sum(self.metrics.get("total_tokens", {}).values())
+    
+    def get_total_cost(self) -> float:
+        """Get estimated model spend in USD across all scans"""
+        return self.metrics.get("total_cost_usd", 0.0)
+    
     def get_recent_scans(self, limit: int = 10) -> List[Dict]:
         """Get recent scan history"""
         return self.metrics["scan_history"][-limit:]
@@ -87,3 +119,61 @@ class MetricsTracker:
         """Reset all metrics"""
         self.metrics = self._default_metrics()
         self._save_metrics()
+
+
+class AssessmentHistory:
+    """
+    Append-only journal of scored results: {"ts", "material", "location", "score", "status"} per line
+
+    Only critical and safe results are kept; skipped, deferred and failed
+    scans carry no new score. read() resumes from a byte offset, so readers
+    such as risk_trends.RiskTrends pick up only what was appended since.
+    """
+
+    def __init__(self, path: str = ASSESSMENTS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, outcome, timestamp: Optional[float] = None) -> bool:
+        """Append a DispatchOutcome; returns False when it carries no score"""
+        if outcome.score is None or outcome.status not in ("critical", "safe"):
+            return False
+        line = json.dumps({"ts": round(timestamp if timestamp is not None else time.time(), 3),
+                           "material": outcome.material, "location": outcome.location,
+                           "score": outcome.score, "status": outcome.status}, ensure_ascii=False)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        return True
+
+    def track(self, outcomes: Iterable) -> Iterator:
+        """Pass outcomes through, recording each one as it is produced"""
+        for outcome in outcomes:
+            self.record(outcome)
+            yield outcome
+
+    def read(self, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Rows appended after byte offset, and the offset to resume from
+
+        A torn final line (a write in progress or a crash mid-write) is left
+        for the next read.
+        """
+        rows = []
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        pass  # corrupt line; skip it rather than stall every later read
+                    offset += len(line)
+        except OSError:
+            pass
+        return rows, offset
@@ -0,0 +1,393 @@
+"""
+SupplySentinel Name Normalization
+Canonical material and location names, so LLM spelling variants ("DRC",
+"Democratic Republic of Congo", "Congo (Kinshasa)") share one supplier key,
+one search cache entry and one alert_id
+
+Lookup order for a raw name:
+    1. folded exact match (case, diacritics, punctuation, plurals) against the
+       built-in alias tables and names seen earlier
+    2. fuzzy match against the built-in names only, through a character-trigram
+       index confirmed by an edit-similarity check, for typos
+    3. otherwise the cleaned-up name becomes a new canonical entry, matched
+       exactly from then on
+
+Learned names never attract fuzzy matches, so the result does not depend on
+which names happened to be seen first ("Iceland" then "Ireland"), and a name
+that merely extends a known one ("Silicone", "Polysilicone") is a different
+name, not a typo.
+
+Names learned in steps 2 and 3 are capped at MAX_LEARNED per index, oldest
+dropped first, so a long-lived server's tables stay bounded. Ambiguous bare
+words ("Korea", "Oil", "Gas") are deliberately not aliases.
+
+    from normalize import normalizer
+    normalizer.location("Congo (Kinshasa)")   # "Democratic Republic of the Congo"
+    normalizer.material("rare earth elements") # "Rare Earths"
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+
+# Canonical name -> aliases (folding handles case, accents, punctuation and plurals)
+COUNTRY_ALIASES = {
+    "Afghanistan": [],
+    "Algeria": [],
+    "Angola": [],
+    "Argentina": [],
+    "Armenia": [],
+    "Australia": [],
+    "Austria": [],
+    "Azerbaijan": [],
+    "Bahrain": [],
+    "Bangladesh": [],
+    "Belarus": [],
+    "Belgium": [],
+    "Bolivia": ["Plurinational State of Bolivia"],
+    "Botswana": [],
+    "Brazil": ["Brasil"],
+    "Bulgaria": [],
+    "Burkina Faso": [],
+    "Cambodia": [],
+    "Cameroon": [],
+    "Canada": [],
+    "Chile": [],
+    "China": ["PRC", "People's Republic of China", "Mainland China", "P.R. China"],
+    "Colombia": [],
+    "Costa Rica": [],
+    "Côte d'Ivoire": ["Ivory Coast", "Cote dIvoire"],
+    "Croatia": [],
+    "Cuba": [],
+    "Cyprus": [],
+    "Czech Republic": ["Czechia"],
+    "Democratic Republic of the Congo": ["DRC", "DR Congo", "D.R.C.", "Congo (Kinshasa)", "Congo-Kinshasa",
+                                         "Democratic Republic of Congo", "Congo, Democratic Republic of the", "Zaire"],
+    "Denmark": [],
+    "Dominican Republic": [],
+    "Ecuador": [],
+    "Egypt": [],
+    "Estonia": [],
+    "Ethiopia": [],
+    "Finland": [],
+    "France": [],
+    "Gabon": [],
+    "Gambia": ["The Gambia"],
+    "Georgia": [],
+    "Germany": ["Deutschland"],
+    "Ghana": [],
+    "Greece": ["Hellenic Republic"],
+    "Guatemala": [],
+    "Guinea": [],
+    "Guyana": [],
+    "Honduras": [],
+    "Hong Kong": ["Hong Kong SAR", "HK"],
+    "Hungary": [],
+    "Iceland": [],
+    "India": [],
+    "Indonesia": [],
+    "Iran": ["Islamic Republic of Iran"],
+    "Iraq": [],
+    "Ireland": ["Republic of Ireland", "Eire"],
+    "Israel": [],
+    "Italy": [],
+    "Jamaica": [],
+    "Japan": [],
+    "Jordan": [],
+    "Kazakhstan": [],
+    "Kenya": [],
+    "Kuwait": [],
+    "Kyrgyzstan": [],
+    "Laos": ["Lao PDR"],
+    "Latvia": [],
+    "Lebanon": [],
+    "Liberia": [],
+    "Libya": [],
+    "Lithuania": [],
+    "Luxembourg": [],
+    "Madagascar": [],
+    "Malawi": [],
+    "Malaysia": [],
+    "Mali": [],
+    "Malta": [],
+    "Mauritania": [],
+    "Mexico": ["México"],
+    "Mongolia": [],
+    "Morocco": [],
+    "Mozambique": [],
+    "Myanmar": ["Burma"],
+    "Namibia": [],
+    "Nepal": [],
+    "Netherlands": ["The Netherlands", "Holland"],
+    "New Caledonia": [],
+    "New Zealand": ["NZ"],
+    "Niger": [],
+    "Nigeria": [],
+    "North Korea": ["DPRK", "Democratic People's Republic of Korea"],
+    "Norway": [],
+    "Oman": [],
+    "Pakistan": [],
+    "Panama": [],
+    "Papua New Guinea": ["PNG"],
+    "Paraguay": [],
+    "Peru": ["Perú"],
+    "Philippines": ["The Philippines"],
+    "Poland": [],
+    "Portugal": [],
+    "Qatar": [],
+    "Republic of the Congo": ["Congo-Brazzaville", "Congo (Brazzaville)", "Congo Republic"],
+    "Romania": [],
+    "Russia": ["Russian Federation"],
+    "Rwanda": [],
+    "Saudi Arabia": ["KSA", "Kingdom of Saudi Arabia"],
+    "Senegal": [],
+    "Serbia": [],
+    "Sierra Leone": [],
+    "Singapore": [],
+    "Slovakia": [],
+    "Slovenia": [],
+    "Somalia": [],
+    "South Africa": ["RSA", "Republic of South Africa"],
+    "South Korea": ["Republic of Korea", "Korea, Republic of", "ROK"],
+    "South Sudan": [],
+    "Spain": [],
+    "Sri Lanka": [],
+    "Sudan": [],
+    "Suriname": [],
+    "Sweden": [],
+    "Switzerland": [],
+    "Syria": [],
+    "Taiwan": ["Republic of China", "Chinese Taipei", "ROC", "Taiwan, Province of China"],
+    "Tajikistan": [],
+    "Tanzania": [],
+    "Thailand": [],
+    "Trinidad and Tobago": [],
+    "Tunisia": [],
+    "Turkey": ["Türkiye", "Turkiye"],
+    "Turkmenistan": [],
+    "Uganda": [],
+    "Ukraine": [],
+    "United Arab Emirates": ["UAE", "U.A.E.", "Emirates"],
+    "United Kingdom": ["UK", "U.K.", "Great Britain", "Britain", "England"],
+    "United States": ["USA", "US", "U.S.", "U.S.A.", "United States of America"],
+    "Uruguay": [],
+    "Uzbekistan": [],
+    "Venezuela": [],
+    "Vietnam": ["Viet Nam"],
+    "Yemen": [],
+    "Zambia": [],
+    "Zimbabwe": [],
+}
+
+COMMODITY_ALIASES = {
+    "Aluminum": ["Aluminium"],
+    "Bauxite": [],
+    "Cobalt": ["Cobalt ore", "Cobalt hydroxide"],
+    "Coffee": ["Coffee beans", "Green coffee"],
+    "Cocoa": ["Cocoa beans", "Cacao"],
+    "Copper": ["Copper ore", "Copper concentrate", "Refined copper"],
+    "Cotton": ["Raw cotton"],
+    "Crude Oil": ["Petroleum", "Crude"],
+    "Gallium": [],
+    "Germanium": [],
+    "Graphite": ["Natural graphite", "Synthetic graphite"],
+    "Helium": [],
+    "Iron Ore": [],
+    "Lithium": ["Lithium carbonate", "Lithium hydroxide", "Lithium ore", "Spodumene"],
+    "Liquefied Natural Gas": ["LNG"],
+    "Manganese": [],
+    "Natural Gas": [],
+    "Natural Rubber": ["Rubber"],
+    "Neon": ["Neon gas"],
+    "Nickel": ["Nickel ore", "Class 1 nickel"],
+    "Palladium": [],
+    "Palm Oil": ["Crude palm oil", "CPO"],
+    "Platinum": [],
+    "Polysilicon": ["Polycrystalline silicon", "Solar-grade polysilicon"],
+    "Rare Earths": ["Rare earth", "Rare earth elements", "Rare earth metals", "Rare earth oxides", "REE", "REEs"],
+    "Semiconductors": ["Semiconductor", "Chips", "Microchips", "Integrated circuits"],
+    "Silicon": ["Silicon metal"],
+    "Soybeans": ["Soy", "Soya beans"],
+    "Steel": [],
+    "Sugar": ["Raw sugar"],
+    "Tantalum": ["Coltan"],
+    "Tin": [],
+    "Titanium": [],
+    "Tungsten": [],
+    "Uranium": [],
+    "Wheat": [],
+    "Zinc": [],
+}
+
+# Fuzzy matches must share this share of trigrams (Dice) and this edit similarity
+# (0.88: one transposition or doubled letter in a 7-letter name, one substitution only from 9 letters)
+MIN_TRIGRAM_DICE = 0.5
+MIN_EDIT_RATIO = 0.88
+# Names this short only match exactly ("UK" must never fuzz into "US")
+MIN_FUZZY_LENGTH = 5
+# Typos rarely change the length by more than one character; "Austria" must not become "Australia"
+MAX_LENGTH_DRIFT = 1
+# Trigrams shared by more names than this carry no signal and are skipped (keeps lookups flat at scale)
+MAX_POSTING = 512
+# Learned spellings kept per index (built-in aliases are never dropped)
+MAX_LEARNED = 20000
+
+_NON_WORD = re.compile(r"[^\w]+")
+_ARTICLES = frozenset(("the", "of", "and"))
+
+
+def _singular(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("sses", "xes", "ches", "shes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def fold(text):
+    """Comparison form: no accents, case, punctuation, articles or plurals"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = text.replace("'", "").replace("’", "")
+    tokens = [_singular(t) for t in _NON_WORD.sub(" ", text).replace("_", " ").split() if t not in _ARTICLES]
+    return " ".join(tokens)
+
+
+def clean(text):
+    """Display form for names with no canonical entry: trimmed, single-spaced"""
+    return " ".join(str(text).split())
+
+
+def _trigrams(folded):
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AliasIndex:
+    """Folded-name lookup plus a trigram inverted index for fuzzy matches"""
+
+    def __init__(self, aliases, max_learned=MAX_LEARNED):
+        self._lock = threading.Lock()
+        self._exact = {}      # folded name -> canonical
+        self._grams = {}      # trigram -> set of folded built-in names
+        self._sizes = {}      # folded built-in name -> trigram count
+        self._learned = OrderedDict()  # folded names added by canonical(), oldest first
+        self.max_learned = max_learned
+        for canonical, variants in aliases.items():
+            self.add(canonical, canonical)
+            for variant in variants:
+                self.add(variant, canonical)
+
+    def add(self, name, canonical, fuzzy=True):
+        """Map a name to its canonical form; fuzzy=False matches it exactly only"""
+        folded = fold(name)
+        if not folded or folded in self._exact:
+            return None
+        self._exact[folded] = canonical
+        if not fuzzy:
+            return folded
+        grams = _trigrams(folded)
+        self._sizes[folded] = len(grams)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(folded)
+        return folded
+
+    def _learn(self, name, canonical):
+        folded = self.add(name, canonical, fuzzy=False)
+        if folded is None:
+            return
+        self._learned[folded] = None
+        while len(self._learned) > self.max_learned:
+            self._exact.pop(self._learned.popitem(last=False)[0], None)
+
+    def fuzzy(self, folded):
+        """Closest built-in folded name, or None"""
+        # Numbered names ("Class 1" / "Class 2", "lot 12" / "lot 13") differ by one character: exact only
+        if len(folded) < MIN_FUZZY_LENGTH or any(c.isdigit() for c in folded):
+            return None
+        grams = _trigrams(folded)
+        shared = Counter()
+        for gram in grams:
+            posting = self._grams.get(gram, ())
+            if len(posting) > MAX_POSTING:
+                continue
+            for candidate in posting:
+                shared[candidate] += 1
+        best, best_ratio = None, 0.0
+        for candidate, count in shared.most_common(8):
+            if 2 * count / (len(grams) + self._sizes[candidate]) < MIN_TRIGRAM_DICE:
+                continue
+            if len(candidate) < MIN_FUZZY_LENGTH or abs(len(candidate) - len(folded)) > MAX_LENGTH_DRIFT:
+                continue
+            # "silicone" extends "silicon": another word, not a typo of it
+            shorter, longer = sorted((folded, candidate), key=len)
+            if shorter != longer and (longer.startswith(shorter) or longer.endswith(shorter)):
+                continue
+            ratio = SequenceMatcher(None, folded, candidate).ratio()
+            if ratio >= MIN_EDIT_RATIO and ratio > best_ratio:
+                best, best_ratio = candidate, ratio
+        return best
+
+    def canonical(self, name):
+        if name is None:
+            return None
+        folded = fold(name)
+        if not folded:
+            return clean(name)
+        found = self._exact.get(folded)
+        if found is not None:
+            return found
+        with self._lock:
+            match = self.fuzzy(folded)
+            if match is not None:
+                found = self._exact[match]
+            else:
+                found = clean(name)
+            # Remember the spelling (and new names) so the next lookup is exact
+            self._learn(name, found)
+        return found
+
+
+class Normalizer:
+    def __init__(self, countries=None, commodities=None):
+        self.locations = AliasIndex(COUNTRY_ALIASES if countries is None else countries)
+        self.materials = AliasIndex(COMMODITY_ALIASES if commodities is None else commodities)
+
+    def location(self, name):
+        return self.locations.canonical(name)
+
+    def material(self, name):
+        return self.materials.canonical(name)
+
+    def key(self, material, location):
+        """(material, location) in canonical form: the identity used for dedup, caching and alerts"""
+        return self.material(material), self.location(location)
+
+    def suppliers(self, suppliers):
+        """
+        Canonical names for a supplier list, with variant duplicates merged
+
+        The first occurrence keeps its position; a duplicate with a higher
+        priority upgrades it.
+        """
+        from token_ledger import PRIORITY_RANK, supplier_priority
+
+        merged = {}
+        for item in suppliers:
+            material, location = self.key(item.get("material"), item.get("location"))
+            key = (material, location)
+            if key in merged:
+                kept = merged[key]
+                if PRIORITY_RANK[supplier_priority(item)] < PRIORITY_RANK[supplier_priority(kept)]:
+                    kept["priority"] = item["priority"]
+                continue
+            merged[key] = {**item, "material": material, "location": location}
+        return list(merged.values())
+
+
+# Process-wide instance shared by the engine, config agents and checkpoints
+normalizer = Normalizer()
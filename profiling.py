@@ -0,0 +1,135 @@
+"""
+SupplySentinel Profiling
+Runs a monitoring cycle under cProfile and tracemalloc and writes the results
+to logs/profiles/
+
+Each profiled cycle produces two artifacts:
+    <label>-<timestamp>.prof   pstats dump (snakeviz, pstats, gprof2dot)
+    <label>-<timestamp>.txt    top-N CPU hotspots and allocation sites
+
+    profiler = CycleProfiler("cycle-1")
+    profiler.start()            # ProfilerBusy if another cycle in the process is being profiled
+    try:
+        ...  # one monitoring cycle
+        prof_path, summary_path = profiler.stop()
+    finally:
+        profiler.cancel()       # no-op after stop(); otherwise turns profiling off without artifacts
+
+cProfile and tracemalloc are process-wide, so one cycle is profiled at a time.
+"""
+
+import io
+import os
+import threading
+import tracemalloc
+from datetime import datetime
+
+from logging_config import LOGS_DIR
+
+PROFILES_DIR = os.path.join(LOGS_DIR, "profiles")
+
+# Frames kept per allocation trace; deeper stacks cost more memory while tracing
+TRACEMALLOC_FRAMES = 5
+
+# Held from start() to stop()/cancel(): a second profiler would clash with the first (3.12+ refuses outright)
+_active = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another cycle in this process is already being profiled"""
+
+
+class CycleProfiler:
+    """
+    Deterministic CPU profile plus allocation tracking for one cycle
+
+    cProfile only sees the thread that called start(); work offloaded to other
+    threads shows up as time spent waiting on them.
+    """
+
+    def __init__(self, label, out_dir=None, top_n=25):
+        self.label = label
+        self.out_dir = out_dir or PROFILES_DIR
+        self.top_n = top_n
+        self.summary = ""
+        self._profile = None
+        self._running = False
+        self._owns_tracemalloc = False
+        self._snapshot_before = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if not _active.acquire(blocking=False):
+            raise ProfilerBusy("Another analysis is being profiled; try again when it finishes")
+        self._running = True
+        try:
+            self._owns_tracemalloc = not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            else:
+                tracemalloc.reset_peak()
+            self._snapshot_before = tracemalloc.take_snapshot()
+            import cProfile  # deferred with pstats: only profiled runs pay for the import
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        except BaseException:
+            self._release()
+            raise
+        return self
+
+    def stop(self):
+        """Stop profiling and write the artifacts; returns (prof_path, summary_path)"""
+        self._profile.disable()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            self._release()
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        prof_path = base + ".prof"
+        summary_path = base + ".txt"
+        self._profile.dump_stats(prof_path)
+
+        self.summary = self._render_summary(snapshot, current, peak)
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(self.summary)
+        return prof_path, summary_path
+
+    def cancel(self):
+        """Turn profiling off without writing anything (no-op unless running)"""
+        if self._running:
+            if self._profile is not None:
+                self._profile.disable()
+            self._release()
+
+    def _release(self):
+        if self._owns_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._owns_tracemalloc = False
+        self._running = False
+        _active.release()
+
+    def _render_summary(self, snapshot, current, peak):
+        import pstats
+        out = io.StringIO()
+        out.write(f"SupplySentinel profile: {self.label} ({datetime.now().isoformat(timespec='seconds')})\n")
+        out.write(f"Traced memory: {current / 1e6:.1f} MB current, {peak / 1e6:.1f} MB peak\n")
+
+        for sort_key, title in (("cumulative", "cumulative time"), ("tottime", "own time")):
+            out.write(f"\n=== Top {self.top_n} functions by {title} ===\n")
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.strip_dirs().sort_stats(sort_key).print_stats(self.top_n)
+
+        # Allocation sites: growth during the cycle, not everything alive at the end
+        out.write(f"\n=== Top {self.top_n} allocation sites (growth during cycle) ===\n")
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        growth = snapshot.filter_traces(filters).compare_to(self._snapshot_before.filter_traces(filters), "lineno")
+        for stat in growth[:self.top_n]:
+            frame = stat.traceback[0]
+            out.write(f"{stat.size_diff / 1024:>10.1f} KiB  {stat.count_diff:>+8d} blocks  {frame.filename}:{frame.lineno}\n")
+        return out.getvalue()
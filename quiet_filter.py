@@ -0,0 +1,107 @@
+"""
+SupplySentinel Quiet-News Pre-filter
+Local classifier in front of the analyst: watchman results that clearly report
+nothing happening are scored 0 without an LLM call
+
+One compiled regex over disruption vocabulary (strikes, port closures,
+typhoons, export bans, shortages, ...) plus one over "all quiet" phrasing.
+A disruption term preceded by a negation in the same clause ("no significant
+disruptions") is not a signal. Text is quiet only when every claim in it (each
+sentence, and each clause after a contrast such as "though") is an all-quiet
+phrase: "No strikes reported. A mine collapse halted output" is not quiet.
+
+    verdict = QuietFilter().classify(search_text)   # quiet | ambiguous | alarming
+
+Only "quiet" short-circuits the analyst; ambiguous and alarming text still goes
+to the model. Measure precision/recall on recorded analyst decisions with
+`python eval_quiet_filter.py cassettes/run.jsonl` before tightening the vocabulary.
+"""
+
+import os
+import re
+
+QUIET = "quiet"
+AMBIGUOUS = "ambiguous"
+ALARMING = "alarming"
+
+# Disruption vocabulary; a single match is enough to send the text to the model
+DISRUPTION_TERMS = (
+    r"strik(?:e|es|ing)", r"walk-?outs?", r"lock-?outs?", r"stoppages?", r"protests?", r"unrest", r"riots?",
+    r"blockades?", r"port closures?", r"closures?", r"closed", r"shut(?:s|ting)?(?: ?down)?", r"halt(?:s|ed|ing)?",
+    r"suspend(?:s|ed|ing)?", r"suspensions?", r"curtail(?:s|ed|ment)?", r"outages?", r"blackouts?",
+    r"typhoons?", r"hurricanes?", r"cyclones?", r"storms?", r"floods?", r"flooding", r"heavy rain(?:fall)?",
+    r"earthquakes?", r"tsunamis?", r"landslides?", r"wildfires?", r"fires?", r"explosions?", r"droughts?",
+    r"export bans?", r"import bans?", r"bans?", r"embargo(?:es)?", r"sanctions?", r"tariffs?", r"quotas?",
+    r"export restrictions?", r"nationali[sz]ation", r"coup", r"war", r"conflict", r"attacks?",
+    r"shortages?", r"force majeure", r"backlogs?", r"congestion", r"delay(?:s|ed)?", r"disrupt(?:ion|ions|ed|s)?",
+    r"slow(?:ed|down)", r"evacuat\w*",
+)
+
+# Terms that alone mark a result as alarming (the rest need two independent hits)
+SEVERE_TERMS = frozenset((
+    "strike", "strikes", "striking", "force majeure", "export ban", "export bans", "embargo", "embargoes",
+    "port closure", "port closures", "shutdown", "shut down", "typhoon", "hurricane", "earthquake", "explosion",
+))
+
+QUIET_PHRASES = (
+    r"no (?:(?:significant|major|notable|serious|further|new|other)\s+)*(?:(?:" + "|".join(DISRUPTION_TERMS) + r")"
+    r"(?:\s*,\s*|\s+(?:or|and|nor)\s+|\s+)?)+[^.;!?\n]{0,60}?\b(?:reported|recorded|observed|expected)",
+    r"no (?:significant |major |notable |new |relevant |reported )*(?:news|reports?|incidents?|issues?|events?|information)",
+    r"nothing (?:notable |significant |of note |new )?(?:reported|to report|found)",
+    r"(?:operations|shipments|exports|production|schedules?|volumes?|supply|logistics) "
+    r"(?:remain(?:ed|s)?|are|is|continue[sd]?)(?: to be)? (?:normal|stable|steady|unaffected|on schedule|in line)",
+    r"in line with (?:seasonal )?norms", r"business as usual", r"no cause for concern",
+)
+
+NEGATIONS = r"\b(?:no|not|without|nor|none|never|free of|zero)\b"
+
+_DISRUPTION_RE = re.compile(r"\b(" + "|".join(DISRUPTION_TERMS) + r")\b", re.IGNORECASE)
+_QUIET_RE = re.compile("|".join(QUIET_PHRASES), re.IGNORECASE)
+_NEGATION_RE = re.compile(NEGATIONS + r"(?=[^.;:!?\n]{0,40}$)", re.IGNORECASE)
+# A contrast between the negation and the term starts a new claim ("no delays, but a strike ...")
+_CONTRAST_RE = re.compile(r"\b(?:but|however|although|though|while|yet|except)\b", re.IGNORECASE)
+# Claims a text makes: sentences, clauses after a semicolon, and what follows a contrast
+_CLAIM_RE = re.compile(r"(?<=[.!?;])\s+|\n+|;|\b(?:but|however|although|though|while|yet|except)\b", re.IGNORECASE)
+_ATTRIBUTION_RE = re.compile(r"^\W*(?:sources?\b|via\b|according to\b)", re.IGNORECASE)
+
+# How far back (characters) a negation can sit in front of the term it negates
+NEGATION_WINDOW = 48
+
+
+class QuietFilter:
+    """Three-way verdict on watchman text; stateless and thread-safe"""
+
+    def signals(self, text):
+        """Disruption terms in the text that are not negated, lower-cased, in order"""
+        found = []
+        for match in _DISRUPTION_RE.finditer(text):
+            window = text[max(0, match.start() - NEGATION_WINDOW):match.start()]
+            negation = None
+            for negation in _NEGATION_RE.finditer(window):
+                pass  # the closest negation decides
+            if negation is None or _CONTRAST_RE.search(window, negation.end()):
+                found.append(match.group(1).lower())
+        return found
+
+    def classify(self, text):
+        if not text or not text.strip():
+            return AMBIGUOUS
+        hits = self.signals(text)
+        if not hits:
+            # Quiet only when every claim says so; unfamiliar wording anywhere goes to the model
+            return QUIET if self.all_quiet(text) else AMBIGUOUS
+        if len(set(hits)) >= 2 or SEVERE_TERMS.intersection(hits):
+            return ALARMING
+        return AMBIGUOUS
+
+    @staticmethod
+    def all_quiet(text):
+        """True when every claim in the text is an "all quiet" phrase (source lines aside)"""
+        claims = [claim.strip() for claim in _CLAIM_RE.split(text) if claim and claim.strip(" \t.,;:!?-")]
+        return bool(claims) and all(_QUIET_RE.search(claim) or _ATTRIBUTION_RE.match(claim) for claim in claims) \
+            and any(_QUIET_RE.search(claim) for claim in claims)
+
+
+def quiet_filter_from_env():
+    """The default pre-filter, or None when SENTINEL_QUIET_FILTER=0"""
+    return None if os.getenv("SENTINEL_QUIET_FILTER", "1") == "0" else QuietFilter()
@@ -0,0 +1,115 @@
+"""
+SupplySentinel Results Catalog
+Filter, sort, paginate and aggregate a scan's results for the monitor page
+
+Large catalogs are shown as one page of grid rows plus a bounded number of
+per-country and per-material group rows, so what the browser receives (and
+the page's render time) stays the same however many suppliers were scanned.
+Small catalogs keep one card per result.
+
+    catalog = ResultsCatalog(outcomes)
+    rows = catalog.query(statuses=["critical"], text="china", sort="score")
+    page_rows, page, pages = paginate(rows, page=2, size=50)
+    catalog.aggregate("location", rows, limit=20)
+"""
+
+import math
+
+STATUSES = ("critical", "safe", "skipped", "deferred")
+
+# At or below this many suppliers the monitor page keeps one card per result
+CARD_LIMIT = 12
+PAGE_SIZES = (25, 50, 100, 250)
+# Group rows shown per aggregate table
+GROUP_LIMIT = 25
+
+SORT_FIELDS = {"score": "Risk score", "material": "Material", "location": "Location", "status": "Status"}
+_STATUS_RANK = {status: rank for rank, status in enumerate(STATUSES)}
+
+
+def _sort_key(field):
+    if field == "score":
+        return lambda row: row["score"] if row["score"] is not None else -1
+    if field == "status":
+        return lambda row: -_STATUS_RANK.get(row["status"], len(STATUSES))  # descending = critical first
+    return lambda row: (row[field] or "").lower()
+
+
+class ResultsCatalog:
+    """
+    One scan's results as plain rows
+
+    Args:
+        results: DispatchOutcome objects or their as_dict() form (session state keeps the latter)
+    """
+
+    def __init__(self, results):
+        self.rows = [result.as_dict() if hasattr(result, "as_dict") else dict(result) for result in results]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def counts(self):
+        """{status: results}"""
+        counts = {}
+        for row in self.rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        return counts
+
+    def query(self, statuses=None, text="", min_score=0, sort="score", descending=True):
+        """
+        Matching rows, sorted
+
+        text matches material or location (case-insensitive); a min_score above 0
+        drops results without a score. Ties keep material/location order.
+        """
+        wanted = set(statuses) if statuses is not None else None
+        needle = text.strip().lower()
+        rows = [row for row in self.rows
+                if (wanted is None or row["status"] in wanted)
+                and (not needle or needle in row["material"].lower() or needle in row["location"].lower())
+                and (not min_score or (row["score"] is not None and row["score"] >= min_score))]
+        rows.sort(key=lambda row: (row["material"].lower(), row["location"].lower()))
+        rows.sort(key=_sort_key(sort), reverse=descending)
+        return rows
+
+    def aggregate(self, field, rows=None, limit=GROUP_LIMIT):
+        """
+        Per-value counts for "location" or "material": suppliers, critical, safe, other, max and mean score
+
+        Most critical groups first, then highest max score, then largest.
+        """
+        groups = {}
+        for row in self.rows if rows is None else rows:
+            group = groups.get(row[field])
+            if group is None:
+                group = groups[row[field]] = {field: row[field], "suppliers": 0, "critical": 0, "safe": 0, "other": 0,
+                                              "max_score": None, "_total": 0, "_scored": 0}
+            group["suppliers"] += 1
+            group[row["status"] if row["status"] in ("critical", "safe") else "other"] += 1
+            if row["score"] is not None:
+                group["_total"] += row["score"]
+                group["_scored"] += 1
+                group["max_score"] = max(group["max_score"] or 0, row["score"])
+        ranked = sorted(groups.values(), key=lambda g: (-g["critical"], -(g["max_score"] or -1), -g["suppliers"], str(g[field])))
+        result = []
+        for group in ranked[:limit]:
+            scored, total = group.pop("_scored"), group.pop("_total")
+            group["avg_score"] = round(total / scored, 1) if scored else None
+            result.append(group)
+        return result
+
+
+def group_counts(items, field, limit=GROUP_LIMIT):
+    """[(value, count)] most common first, for supplier dicts before any result exists"""
+    counts = {}
+    for item in items:
+        counts[item[field]] = counts.get(item[field], 0) + 1
+    return sorted(counts.items(), key=lambda entry: (-entry[1], str(entry[0])))[:limit]
+
+
+def paginate(rows, page, size):
+    """(rows on the page, page clamped to range, page count); pages are 1-based"""
+    pages = max(1, math.ceil(len(rows) / size))
+    page = min(max(1, page), pages)
+    return rows[(page - 1) * size:page * size], page, pages
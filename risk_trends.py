@@ -0,0 +1,324 @@
+"""
+SupplySentinel Risk Trends
+Per-supplier drift analytics over the assessment history (logs/assessments.jsonl):
+EWMA, rolling z-score anomaly flags, volatility and trend slope
+
+Scores are held in one contiguous suppliers × days float matrix (NaN where a
+supplier was not scored that day; the worst score wins when it was scored
+twice). Running sums over that matrix give every rolling-window statistic by
+subtraction, so a summary of thousands of suppliers over months of history is
+a handful of array operations. refresh() reads only what was appended to the
+history since the last call and recomputes only the columns it touched.
+
+    trends = RiskTrends(AssessmentHistory())
+    trends.refresh()
+    trends.rows(limit=20)                   # suppliers with the largest |z| first
+    trends.series("Cobalt", "DRC")          # day-by-day score, EWMA, z-score and flags
+"""
+
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from metrics_tracker import AssessmentHistory
+from normalize import normalizer as default_normalizer
+
+DAY = 86400
+
+# EWMA smoothing factor per observed score (higher follows new scores faster)
+DEFAULT_ALPHA = 0.3
+# Rolling window, in days, for z-score, volatility and trend slope
+DEFAULT_WINDOW = 30
+# |z| of a score against the preceding window that flags it as an anomaly
+Z_THRESHOLD = 2.5
+# Observations a window needs before its z-score or slope is reported
+MIN_POINTS = 5
+# Floor on the window's standard deviation: scores are whole points 0-10, so a
+# flat history followed by a jump would otherwise have no finite z-score
+MIN_STD = 0.5
+
+# Running sums kept per supplier: observations, x, x², t, t², t·x
+_SUMS = 6
+
+
+class RiskTrends:
+    """
+    Incrementally maintained trend statistics; thread-safe
+
+    Args:
+        history: AssessmentHistory to read from (refresh() is a no-op without one; use add())
+        alpha: EWMA smoothing factor
+        window: rolling window in buckets (days by default)
+        z_threshold: |z| at or above which a score is flagged
+        min_points: observations needed in a window for z-score and slope
+        bucket: seconds per column
+    """
+
+    def __init__(self, history=None, alpha=DEFAULT_ALPHA, window=DEFAULT_WINDOW, z_threshold=Z_THRESHOLD,
+                 min_points=MIN_POINTS, bucket=DAY, normalizer=None):
+        self.history = history
+        self.alpha = alpha
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_points = max(2, min_points)
+        self.bucket = bucket
+        self.normalizer = normalizer or default_normalizer
+        self._lock = threading.Lock()
+        self._offset = 0       # history bytes already read
+
+        self.keys = []         # row -> (material, location)
+        self.index = {}        # (material, location) as written -> row
+        self.origin = None     # bucket number of column 0
+        self.columns = 0       # buckets from origin to the newest score
+        self.scores = np.full((0, 0), np.nan)
+        self.ewma = np.full((0, 0), np.nan)
+        self._sums = np.zeros((_SUMS, 0, 1))   # cumulative along time; column j holds buckets < j
+        self._last = np.zeros(0, dtype=np.int64)  # newest scored column per supplier
+        self._dirty = None     # first column whose EWMA and sums are stale
+        self._summary = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ---- loading ---------------------------------------------------------
+
+    def refresh(self):
+        """Read new history lines and bring the statistics up to date; returns the rows read"""
+        if self.history is None:
+            return 0
+        with self._lock:
+            rows, self._offset = self.history.read(self._offset)
+            if rows:
+                self._add(rows)
+            self._compute()
+        return len(rows)
+
+    def add(self, rows):
+        """Add {"ts", "material", "location", "score"} rows directly (backfills, tests)"""
+        with self._lock:
+            self._add(rows)
+            self._compute()
+
+    def _row(self, material, location):
+        key = (material, location)
+        row = self.index.get(key)
+        if row is None:
+            # Older history may hold variant spellings; they share the canonical row
+            canonical = self.normalizer.key(material, location)
+            row = self.index.get(canonical)
+            if row is None:
+                row = len(self.keys)
+                self.keys.append(canonical)
+                self.index[canonical] = row
+            self.index[key] = row
+        return row
+
+    def _add(self, rows):
+        rows = [r for r in rows if r.get("score") is not None]
+        if not rows:
+            return
+        suppliers = np.fromiter((self._row(r["material"], r["location"]) for r in rows), dtype=np.int64, count=len(rows))
+        buckets = np.floor(np.fromiter((r["ts"] for r in rows), dtype=float, count=len(rows)) / self.bucket).astype(np.int64)
+        values = np.fromiter((r["score"] for r in rows), dtype=float, count=len(rows))
+
+        first = int(buckets.min())
+        if self.origin is None:
+            self.origin = first
+        shift = max(0, self.origin - first)  # a backfill older than anything seen moves column 0
+        self.origin -= shift
+        columns = max(self.columns + shift, int(buckets.max()) - self.origin + 1)
+        self._reserve(len(self.keys), columns, shift)
+        self.columns = columns
+
+        cols = buckets - self.origin
+        np.fmax.at(self.scores, (suppliers, cols), values)
+        np.maximum.at(self._last, suppliers, cols)
+        start = 0 if shift else int(cols.min())
+        self._dirty = start if self._dirty is None else min(self._dirty, start)
+
+    def _reserve(self, suppliers, columns, shift):
+        """Grow the matrices geometrically (and move old columns right by shift) so appends stay amortized O(1)"""
+        have_s, have_t = self.scores.shape
+        if suppliers <= have_s and columns <= have_t and not shift:
+            return
+        cap_s = max(suppliers, have_s * 2 if suppliers > have_s else have_s, 16)
+        cap_t = max(columns, have_t * 2 if columns > have_t else have_t, 32)
+        scores = np.full((cap_s, cap_t), np.nan)
+        scores[:have_s, shift:shift + min(have_t, cap_t - shift)] = self.scores[:, :cap_t - shift]
+        self.scores = scores
+        # After a shift the dirty column is 0 and EWMA and sums are rebuilt; otherwise keep them
+        ewma = np.full((cap_s, cap_t), np.nan)
+        sums = np.zeros((_SUMS, cap_s, cap_t + 1))
+        if not shift:
+            ewma[:have_s, :have_t] = self.ewma
+            sums[:, :have_s, :have_t + 1] = self._sums
+        self.ewma, self._sums = ewma, sums
+        last = np.zeros(cap_s, dtype=np.int64)
+        last[:have_s] = self._last[:have_s] + shift
+        self._last = last
+
+    # ---- statistics ------------------------------------------------------
+
+    def _compute(self):
+        if self._dirty is None:
+            return
+        start, n, end = self._dirty, len(self.keys), self.columns
+        x = self.scores[:n, start:end]
+        seen = ~np.isnan(x)
+        x0 = np.where(seen, x, 0.0)
+        t = np.arange(start, end, dtype=float)
+        terms = (seen, x0, x0 * x0, seen * t, seen * t * t, x0 * t)
+        sums = self._sums
+        for k, term in enumerate(terms):
+            np.cumsum(term, axis=1, out=sums[k, :n, start + 1:end + 1])
+            sums[k, :n, start + 1:end + 1] += sums[k, :n, start:start + 1]
+
+        # EWMA over observed scores only: one vector step per day for all suppliers at once
+        prev = self.ewma[:n, start - 1] if start else np.full(n, np.nan)
+        for j in range(start, end):
+            v = self.scores[:n, j]
+            blended = np.where(np.isnan(prev), v, self.alpha * v + (1 - self.alpha) * prev)
+            prev = self.ewma[:n, j] = np.where(np.isnan(v), prev, blended)
+
+        self._dirty = None
+        self._summary = None
+
+    def _window(self, rows, stop, width):
+        """Running-sum differences for buckets [stop - width, stop) per (row, stop) pair"""
+        lo = np.maximum(stop - width, 0)
+        return self._sums[:, rows, stop] - self._sums[:, rows, lo]
+
+    def _stats(self, rows, cols):
+        """z-score of each (row, col) score against its preceding window, and volatility/slope over the window ending there"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n, sx, sxx, _, _, _ = self._window(rows, cols, self.window)
+            mean = sx / n
+            std = np.sqrt(np.maximum(sxx / n - mean * mean, MIN_STD * MIN_STD))
+            z = (self.scores[rows, cols] - mean) / std
+            z[n < self.min_points] = np.nan
+
+            n, sx, sxx, st, stt, stx = self._window(rows, cols + 1, self.window)
+            mean = sx / n
+            volatility = np.sqrt(np.maximum(sxx / n - mean * mean, 0.0))
+            volatility[n < 2] = np.nan
+            denominator = n * stt - st * st
+            slope = (n * stx - st * sx) / denominator
+            slope[(n < self.min_points) | ~(denominator > 0)] = np.nan
+        return z, volatility, slope
+
+    def summary(self):
+        """
+        Column arrays, one entry per supplier, at its newest score
+
+        keys, last_day, score, ewma, z, anomaly, volatility, slope (points per
+        day), observations. Cached until the next refresh brings new scores.
+        """
+        with self._lock:
+            if self._summary is None:
+                n = len(self.keys)
+                rows = np.arange(n)
+                cols = self._last[:n]
+                z, volatility, slope = self._stats(rows, cols) if n else (np.empty(0),) * 3
+                self._summary = {
+                    "keys": list(self.keys),
+                    "last_day": self.origin + cols if n else cols,
+                    "score": self.scores[rows, cols],
+                    "ewma": self.ewma[rows, cols],
+                    "z": z,
+                    "anomaly": np.abs(np.nan_to_num(z)) >= self.z_threshold,
+                    "volatility": volatility,
+                    "slope": slope * (DAY / self.bucket),
+                    "observations": self._sums[0, :n, self.columns].astype(np.int64) if n else np.zeros(0, dtype=np.int64),
+                }
+            return self._summary
+
+    def rows(self, limit=None, anomalies_only=False):
+        """Summary as dicts, anomalies and the largest |z| first, then the steepest rising trend"""
+        summary = self.summary()
+        order = np.lexsort((-np.nan_to_num(summary["slope"], nan=-np.inf),
+                            -np.abs(np.nan_to_num(summary["z"])), ~summary["anomaly"]))
+        if anomalies_only:
+            order = order[summary["anomaly"][order]]
+        result = []
+        for i in order[:limit]:
+            material, location = summary["keys"][i]
+            result.append({
+                "material": material,
+                "location": location,
+                "last_scored": _day(summary["last_day"][i], self.bucket),
+                "score": float(summary["score"][i]),
+                "ewma": round(float(summary["ewma"][i]), 2),
+                "z": _number(summary["z"][i]),
+                "anomaly": bool(summary["anomaly"][i]),
+                "volatility": _number(summary["volatility"][i]),
+                "slope_per_day": _number(summary["slope"][i], 3),
+                "observations": int(summary["observations"][i]),
+            })
+        return result
+
+    def series(self, material, location):
+        """Day-by-day arrays for one supplier: days, score (NaN = not scored), ewma, z, anomaly; None if unknown"""
+        with self._lock:
+            row = self.index.get((material, location))
+            if row is None:
+                row = self.index.get(self.normalizer.key(material, location))
+            if row is None:
+                return None
+            cols = np.arange(self.columns)
+            z, _, _ = self._stats(np.full(self.columns, row), cols)
+            score = self.scores[row, :self.columns].copy()
+            return {
+                "days": [_day(self.origin + c, self.bucket) for c in cols],
+                "score": score,
+                "ewma": self.ewma[row, :self.columns].copy(),
+                "z": z,
+                "anomaly": ~np.isnan(score) & (np.abs(np.nan_to_num(z)) >= self.z_threshold),
+            }
+
+    def stats(self):
+        summary = self.summary()
+        return {"suppliers": len(self.keys), "days": self.columns,
+                "scores": int(summary["observations"].sum()), "anomalies": int(summary["anomaly"].sum())}
+
+
+def _day(bucket_number, bucket):
+    return datetime.fromtimestamp(int(bucket_number) * bucket, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _number(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_trends():
+    """Process-wide trends over the default history, so Streamlit reruns only read new lines"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RiskTrends(AssessmentHistory())
+    _shared.refresh()
+    return _shared
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-supplier risk trends from the assessment history")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="rolling window in days")
+    parser.add_argument("--limit", type=int, default=20, help="suppliers to list")
+    parser.add_argument("--anomalies", action="store_true", help="only suppliers whose newest score is flagged")
+    args = parser.parse_args()
+
+    trends = RiskTrends(AssessmentHistory(), window=args.window)
+    trends.refresh()
+    stats = trends.stats()
+    print(f"Suppliers: {stats['suppliers']:,} | Days: {stats['days']} | Scores: {stats['scores']:,} | "
+          f"Anomalies: {stats['anomalies']}")
+    for row in trends.rows(limit=args.limit, anomalies_only=args.anomalies):
+        flag = "⚠️ " if row["anomaly"] else "   "
+        print(f"{flag}{row['material']} in {row['location']}: score {row['score']:g} (EWMA {row['ewma']}) "
+              f"z={row['z']} vol={row['volatility']} slope={row['slope_per_day']}/day n={row['observations']}")
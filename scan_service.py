@@ -0,0 +1,612 @@
+"""
+SupplySentinel Scan Service
+Headless HTTP API: other systems (an ERP, a scheduler) submit scan jobs, a
+worker pool runs them on the shared monitoring engine, and results are read
+back page by page or streamed as server-sent events
+
+A job is either a supplier list or a business description, which the Config
+Agent maps to suppliers first. Every job step is journaled to logs/jobs.jsonl,
+so a restarted service still answers for finished jobs and resumes unfinished
+ones where they stopped. A pair already scored in the last 24 hours (by any
+job) is answered from that result instead of being scanned again.
+
+    python supply_sentinel.py --serve 8080 --workers 4
+
+    POST   /jobs                      {"suppliers": [{"material": "Cobalt", "location": "DRC"}], "reference": "PO-1"}
+                                      {"business": "I make electric bikes in Texas"}
+                                      {"jobs": [...]}  (several at once)
+    GET    /jobs?status=running&offset=0&limit=100
+    GET    /jobs/<id>                 status, progress and counts
+    GET    /jobs/<id>/results?offset=0&limit=100
+    GET    /jobs/<id>/events          text/event-stream of results and status changes
+    DELETE /jobs/<id>                 cancel (a running job stops after its current supplier)
+    GET    /health
+
+SENTINEL_API_TOKEN, when set, is required as "Authorization: Bearer <token>".
+The API listens on 127.0.0.1 unless given another host, and refuses to listen
+beyond loopback without a token.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from logging_config import LOGS_DIR, log_context, dispatcher_logger
+from metrics_tracker import AssessmentHistory
+from normalize import fold, normalizer as default_normalizer
+from stage_metrics import is_loopback
+from supply_graph import RESULT_TTL, SupplyGraph
+
+JOBS_FILE = os.path.join(LOGS_DIR, "jobs.jsonl")
+
+DEFAULT_WORKERS = 4
+# Suppliers accepted per job (larger lists should be split into several jobs)
+MAX_SUPPLIERS = 1000
+# Finished jobs kept for status and results; older ones are forgotten
+MAX_JOBS = 1000
+PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+# Request bodies larger than this are refused
+MAX_BODY = 4 * 1024 * 1024
+# Seconds between SSE keep-alive comments on an idle stream
+KEEPALIVE = 15
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class ScanJob:
+    """One submitted scan; results fill in as suppliers complete"""
+    __slots__ = ("job_id", "kind", "request", "reference", "status", "suppliers", "results", "error",
+                 "submitted_at", "started_at", "finished_at", "usage", "cancelled")
+
+    def __init__(self, job_id, kind, request, reference=None, submitted_at=None):
+        self.job_id = job_id
+        self.kind = kind              # "suppliers" or "business"
+        self.request = request        # supplier list or business description
+        self.reference = reference    # caller's own id, echoed back
+        self.status = "queued"
+        self.suppliers = None         # canonical suppliers once known
+        self.results = []             # DispatchOutcome dicts, plus "cached"
+        self.error = None
+        self.submitted_at = submitted_at or time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.usage = None             # token totals and estimated cost once finished
+        self.cancelled = False
+
+    def summary(self):
+        counts = {}
+        for result in self.results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "reference": self.reference,
+            "status": self.status,
+            "total": len(self.suppliers) if self.suppliers is not None else None,
+            "completed": len(self.results),
+            "counts": counts,
+            "cached": sum(1 for result in self.results if result.get("cached")),
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "usage": self.usage,
+        }
+
+
+def parse_job(payload):
+    """(kind, request, reference) from a submitted JSON object; raises ValueError with a client-facing message"""
+    if not isinstance(payload, dict):
+        raise ValueError("a job must be a JSON object")
+    reference = payload.get("reference")
+    if reference is not None and not isinstance(reference, (str, int)):
+        raise ValueError("reference must be a string")
+    suppliers, business = payload.get("suppliers"), payload.get("business")
+    if (suppliers is None) == (business is None):
+        raise ValueError('a job needs exactly one of "suppliers" or "business"')
+    if business is not None:
+        if not isinstance(business, str) or not business.strip():
+            raise ValueError("business must be a non-empty description")
+        return "business", business.strip(), reference
+    if not isinstance(suppliers, list) or not suppliers:
+        raise ValueError("suppliers must be a non-empty list")
+    if len(suppliers) > MAX_SUPPLIERS:
+        raise ValueError(f"at most {MAX_SUPPLIERS} suppliers per job")
+    for item in suppliers:
+        if not isinstance(item, dict) or not item.get("material") or not item.get("location"):
+            raise ValueError('each supplier needs "material" and "location"')
+    return "suppliers", suppliers, reference
+
+
+class JobQueue:
+    """
+    Durable job queue with a pool of worker threads
+
+    Args:
+        engine: MonitoringEngine; each job runs on engine.fork(), so it gets its own
+            token ledger (and budget) while alert memory and the rate limit are shared
+        workers: jobs run at once
+        journal_path: JSON-lines journal (None keeps jobs in memory only)
+        configure: callable(description) -> suppliers for business jobs; the Config
+            Agent (with the bulk-mode cache) by default, created on first use
+        graph: SupplyGraph holding each job's pairs; its recent results are reused
+        history: AssessmentHistory receiving scored results (None uses the default file, False skips it)
+    """
+
+    def __init__(self, engine, workers=DEFAULT_WORKERS, journal_path=JOBS_FILE, configure=None, graph=None,
+                 history=None, max_jobs=MAX_JOBS, result_ttl=RESULT_TTL, normalizer=None):
+        self.engine = engine
+        self.workers = workers
+        self.journal_path = journal_path
+        self.configure = configure
+        self.normalizer = normalizer or default_normalizer
+        self.graph = graph if graph is not None else SupplyGraph(normalizer=self.normalizer)
+        self.history = AssessmentHistory() if history is None else history or None
+        self.max_jobs = max_jobs
+        self.result_ttl = result_ttl
+        self.jobs = {}                        # job_id -> ScanJob, in submission order
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._journal = None
+        self._pruned = 0
+        self._threads = []
+        self._closed = False
+        self._config_lock = threading.Lock()
+
+    # ---- lifecycle -------------------------------------------------------
+
+    def start(self):
+        """Recover journaled jobs, then start the workers; returns self"""
+        if self.journal_path:
+            self._recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"scan-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self, timeout=None):
+        """Stop taking jobs; running ones finish their current supplier and stay resumable"""
+        with self._changed:
+            self._closed = True
+            for job in self.jobs.values():
+                if job.status == "running":
+                    job.cancelled = True
+            self._changed.notify_all()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # ---- API -------------------------------------------------------------
+
+    def submit(self, payload):
+        """Queue one job from a request payload; raises ValueError if it is malformed"""
+        kind, request, reference = parse_job(payload)
+        job = ScanJob(uuid.uuid4().hex[:16], kind, request, reference)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("service is shutting down")
+            self.jobs[job.job_id] = job
+            self._append({"op": "submit", "job_id": job.job_id, "kind": kind, "request": request,
+                          "reference": reference, "at": job.submitted_at})
+        self._queue.put(job)
+        dispatcher_logger.info("Job %s queued — %s%s", job.job_id, kind,
+                               f" ({len(request)} suppliers)" if kind == "suppliers" else "")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self, status=None, offset=0, limit=PAGE_LIMIT):
+        """([job summary], total), newest first"""
+        with self._lock:
+            jobs = [job for job in reversed(self.jobs.values()) if status is None or job.status == status]
+            return [job.summary() for job in jobs[offset:offset + limit]], len(jobs)
+
+    def results(self, job, offset=0, limit=PAGE_LIMIT):
+        """([result], total) for a page of a job's results, in completion order"""
+        with self._lock:
+            return job.results[offset:offset + limit], len(job.results)
+
+    def cancel(self, job):
+        """Cancel a queued or running job; returns False if it had already finished"""
+        with self._changed:
+            if job.status in FINISHED:
+                return False
+            job.cancelled = True
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+            return True
+
+    def wait(self, job, seen, status, timeout=KEEPALIVE):
+        """Block until the job has more than `seen` results or leaves `status`; returns (new results, status)"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(job.results) > seen or job.status != status or self._closed, timeout)
+            return job.results[seen:], job.status
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "backlog": self._queue.qsize(), "jobs": counts}
+
+    # ---- workers ---------------------------------------------------------
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.status != "queued" or job.cancelled:
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                dispatcher_logger.error("Job %s failed: %s", job.job_id, e, exc_info=True)
+                with self._changed:
+                    job.error = str(e) or type(e).__name__
+                    self._finish(job, "failed")
+
+    def _run(self, job):
+        with self._changed:
+            job.status = "running"
+            job.started_at = job.started_at or time.time()
+            self._changed.notify_all()
+
+        if job.suppliers is None:
+            raw = job.request if job.kind == "suppliers" else self._configure(job.request)
+            suppliers = self.normalizer.suppliers(raw)
+            with self._lock:
+                job.suppliers = suppliers
+                self._append({"op": "start", "job_id": job.job_id, "suppliers": suppliers, "at": job.started_at})
+        self.graph.add_business(job.job_id, job.suppliers)
+
+        # Resumed jobs skip what they already finished; fresh graph results are served without a scan
+        done = {self.normalizer.key(r["material"], r["location"]) for r in job.results}
+        todo = []
+        for item in job.suppliers:
+            if (item["material"], item["location"]) in done:
+                continue
+            shared = self.graph.result(item["material"], item["location"], self.result_ttl)
+            if shared is not None:
+                self._add_result(job, shared, cached=True)
+            else:
+                todo.append(item)
+
+        engine = self.engine.fork()
+        scan = engine.scan(todo)
+        for outcome in self.history.track(scan) if self.history is not None else scan:
+            cached = False
+            if outcome.status == "skipped":
+                # Another job scored this pair moments ago and it went critical: reuse its result
+                shared = self.graph.result(outcome.material, outcome.location, self.result_ttl)
+                if shared is not None:
+                    outcome, cached = shared, True
+            else:
+                self.graph.record(outcome)
+            self._add_result(job, outcome, cached)
+            if job.cancelled:
+                break
+
+        with self._changed:
+            job.usage = {key: value for key, value in engine.ledger.summary().items()
+                         if key in ("total", "calls", "estimated_cost_usd")}
+            if job.cancelled and self._closed and len(job.results) < len(job.suppliers):
+                job.status = "queued"  # shutting down: resume after restart
+                self._changed.notify_all()
+                return
+            self._finish(job, "cancelled" if job.cancelled and len(job.results) < len(job.suppliers) else "done")
+
+    def _configure(self, description):
+        if self.configure is None:
+            with self._config_lock:
+                if self.configure is None:
+                    from config_agent import ConfigCache, ConfigurationAgent
+                    agent, cache = ConfigurationAgent(), ConfigCache()
+
+                    def configure(text):
+                        key = fold(text)
+                        suppliers = cache.get(key)
+                        if suppliers is None:
+                            suppliers = agent.configure(text)
+                            cache.set(key, suppliers)
+                        return suppliers
+                    self.configure = configure
+        return self.configure(description)
+
+    def _add_result(self, job, outcome, cached=False):
+        result = dict(outcome.as_dict(), cached=cached)
+        with self._changed:
+            job.results.append(result)
+            self._append({"op": "result", "job_id": job.job_id, "result": result})
+            self._changed.notify_all()
+
+    def _finish(self, job, status):
+        """Mark a job finished; caller holds the lock"""
+        job.status = status
+        job.finished_at = time.time()
+        self._append({"op": "finish", "job_id": job.job_id, "status": status, "error": job.error,
+                      "usage": job.usage, "at": job.finished_at})
+        self._changed.notify_all()
+        dispatcher_logger.info("Job %s %s — %d/%d suppliers", job.job_id, status, len(job.results),
+                               len(job.suppliers or ()), extra=log_context("dispatcher"))
+        self._prune()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job_id]
+            self.graph.remove_business(job_id)
+            self._pruned += 1
+        if self._pruned >= self.max_jobs:
+            self._compact()
+
+    # ---- journal ---------------------------------------------------------
+
+    def _append(self, record):
+        """Caller holds the lock"""
+        if not self.journal_path:
+            return
+        if self._journal is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._journal.flush()
+
+    def _compact(self):
+        """Rewrite the journal with only the jobs still held; caller holds the lock"""
+        if not self.journal_path:
+            return
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for job in self.jobs.values():
+                records = [{"op": "submit", "job_id": job.job_id, "kind": job.kind, "request": job.request,
+                            "reference": job.reference, "at": job.submitted_at}]
+                if job.suppliers is not None:
+                    records.append({"op": "start", "job_id": job.job_id, "suppliers": job.suppliers, "at": job.started_at})
+                records.extend({"op": "result", "job_id": job.job_id, "result": result} for result in job.results)
+                if job.status in FINISHED:
+                    records.append({"op": "finish", "job_id": job.job_id, "status": job.status, "error": job.error,
+                                    "usage": job.usage, "at": job.finished_at})
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.journal_path)
+        self._pruned = 0
+
+    def _recover(self):
+        """Rebuild jobs from the journal; unfinished ones are queued again and resume where they stopped"""
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final line
+                    job = self.jobs.get(record["job_id"])
+                    if record["op"] == "submit":
+                        self.jobs[record["job_id"]] = ScanJob(record["job_id"], record["kind"], record["request"],
+                                                              record.get("reference"), record["at"])
+                    elif job is None:
+                        continue
+                    elif record["op"] == "start":
+                        job.suppliers, job.started_at = record["suppliers"], record["at"]
+                    elif record["op"] == "result":
+                        job.results.append(record["result"])
+                    elif record["op"] == "finish":
+                        job.status, job.error = record["status"], record.get("error")
+                        job.usage, job.finished_at = record.get("usage"), record["at"]
+        except OSError:
+            return
+        with self._lock:
+            self._prune()
+            self._compact()
+        resumed = [job for job in self.jobs.values() if job.status not in FINISHED]
+        for job in resumed:
+            self._queue.put(job)
+        if self.jobs:
+            dispatcher_logger.info("Recovered %d jobs from %s (%d resumed)", len(self.jobs), self.journal_path, len(resumed))
+
+
+def _page(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < 0:
+        raise ValueError(f"{name} must not be negative")
+    return min(value, maximum) if maximum else value
+
+
+def _header_count(value, name):
+    """A non-negative integer request header (Content-Length, Last-Event-ID); missing is None"""
+    if value is None or not value.strip():
+        return None
+    try:
+        count = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if count < 0:
+        raise ValueError(f"{name} must not be negative")
+    return count
+
+
+def start_api_server(jobs, port, host="127.0.0.1", token=None):
+    """Serve the job API on a daemon thread; returns the server so callers can shut it down
+
+    Binding beyond loopback (e.g. 0.0.0.0) requires a token: ValueError otherwise.
+    """
+    # http.server is only imported when the service is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlencode, urlsplit
+
+    token = token if token is not None else os.getenv("SENTINEL_API_TOKEN")
+    if not token and not is_loopback(host):
+        raise ValueError(f"refusing to serve the scan API on {host} without SENTINEL_API_TOKEN")
+
+    class ApiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            """(path parts, query) after the auth check; None once an error was sent"""
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self._send(401, {"error": "missing or invalid bearer token"})
+                return None
+            url = urlsplit(self.path)
+            return [part for part in url.path.split("/") if part], parse_qs(url.query)
+
+        def _job(self, job_id):
+            job = jobs.get(job_id)
+            if job is None:
+                self._send(404, {"error": f"no job {job_id}"})
+            return job
+
+        def _paged(self, items, total, offset, limit, query):
+            following = None
+            if offset + len(items) < total:
+                following = self.path.split("?")[0] + "?" + urlencode(
+                    {**{k: v[0] for k, v in query.items()}, "offset": offset + len(items), "limit": limit})
+            self._send(200, {"items": items, "offset": offset, "limit": limit, "total": total, "next": following})
+
+        def do_POST(self):
+            route = self._route()
+            if route is None:
+                return
+            if route[0] != ["jobs"]:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = _header_count(self.headers.get("Content-Length"), "Content-Length") or 0
+            except ValueError as e:
+                self.close_connection = True  # the body, if any, can't be skipped reliably
+                self._send(400, {"error": str(e)})
+                return
+            if length > MAX_BODY:
+                self._send(413, {"error": f"body larger than {MAX_BODY} bytes"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b"null")
+                batch = isinstance(payload, dict) and "jobs" in payload
+                entries = payload["jobs"] if batch else [payload]
+                if not isinstance(entries, list) or not entries:
+                    raise ValueError("jobs must be a non-empty list")
+                for entry in entries:
+                    parse_job(entry)  # validate the whole batch before queueing any of it
+                submitted = [jobs.submit(entry).summary() for entry in entries]
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            except RuntimeError as e:
+                self._send(503, {"error": str(e)})
+                return
+            self._send(202, {"jobs": submitted} if batch else submitted[0])
+
+        def do_GET(self):
+            route = self._route()
+            if route is None:
+                return
+            parts, query = route
+            try:
+                offset = _page(query, "offset", 0)
+                limit = _page(query, "limit", PAGE_LIMIT, MAX_PAGE_LIMIT)
+                resume = _header_count(self.headers.get("Last-Event-ID"), "Last-Event-ID")
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            if parts == ["health"]:
+                self._send(200, {"status": "ok", **jobs.stats()})
+            elif parts == ["jobs"]:
+                items, total = jobs.list(query.get("status", [None])[0], offset, limit)
+                self._paged(items, total, offset, limit, query)
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = self._job(parts[1])
+                if job is not None:
+                    self._send(200, job.summary())
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "results":
+                job = self._job(parts[1])
+                if job is not None:
+                    items, total = jobs.results(job, offset, limit)
+                    self._paged(items, total, offset, limit, query)
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+                job = self._job(parts[1])
+                if job is not None:
+                    self._stream(job, offset if resume is None else resume)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_DELETE(self):
+            route = self._route()
+            if route is None:
+                return
+            parts, _ = route
+            if len(parts) != 2 or parts[0] != "jobs":
+                self._send(404, {"error": "not found"})
+                return
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if not jobs.cancel(job):
+                self._send(409, {"error": f"job already {job.status}"})
+                return
+            self._send(200, job.summary())
+
+        def _stream(self, job, seen):
+            """Server-sent events: "result" per finished supplier (id = result index), "status" on changes, then "end" """
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            status = None
+            try:
+                while True:
+                    results, current = jobs.wait(job, seen, status)
+                    chunks = []
+                    for result in results:
+                        seen += 1
+                        chunks.append(f"id: {seen}\nevent: result\ndata: {json.dumps(result, ensure_ascii=False)}\n\n")
+                    if current != status:
+                        status = current
+                        chunks.append(f"event: status\ndata: {json.dumps(job.summary(), ensure_ascii=False)}\n\n")
+                    if not chunks:
+                        chunks.append(": keep-alive\n\n")
+                    if status in FINISHED and seen >= len(job.results):
+                        chunks.append("event: end\ndata: {}\n\n")
+                    self.wfile.write("".join(chunks).encode("utf-8"))
+                    self.wfile.flush()
+                    if status in FINISHED and seen >= len(job.results):
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                return  # client went away
+
+        def log_message(self, format, *args):
+            pass  # keep API polling out of the agent logs
+
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="scan-api", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,516 @@
+"""
+SupplySentinel Monitoring Engine
+UI-agnostic Watchman → Analyst → Dispatcher pipeline shared by the CLI
+(supply_sentinel.py) and the Streamlit app (app.py)
+
+Front ends only render: progress is reported through EngineCallbacks, and the
+cache, rate limiter and alert-history store are pluggable.
+
+    engine = MonitoringEngine(make_client(api_key), callbacks=MyCallbacks())
+    for result in engine.scan(suppliers):
+        ...
+    results = asyncio.run(engine.scan_async(suppliers, concurrency=4))
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from logging_config import log_context, watchman_logger, analyst_logger, dispatcher_logger
+from stage_metrics import registry as stage_registry, time_stage, record_retry
+from normalize import normalizer as default_normalizer
+from event_store import events_from_env
+from quiet_filter import QUIET, quiet_filter_from_env
+from token_ledger import TokenLedger, prioritize, supplier_priority
+from tracing import span, start_trace
+
+MODEL_ID = "gemini-2.5-flash"
+
+# Risk score at or above which the dispatcher raises an alert
+CRITICAL_SCORE = 7
+
+SEARCH_PROMPT = """
+Find recent logistics, weather, or political news that could affect the supply of {material} from {location}.
+Focus on strikes, shortages, or natural disasters in the last 7 days.
+"""
+
+BROAD_SEARCH_PROMPT = """
+Find recent logistics, weather, or political news affecting {material} supply globally.
+Focus on strikes, shortages, or natural disasters in the last 7 days.
+"""
+
+ANALYST_PROMPT = """
+CONTEXT: You are a Supply Chain Risk Officer.
+INPUT DATA: {search_data}
+
+TASK: Analyze the risk for {material} from {location}.
+
+OUTPUT: JSON with:
+- risk_score (0-10, where 10 is factory shutdown, 0 means no relevant information found)
+- reason (1 sentence)
+- action_needed (boolean)
+- retry_search (boolean - true if score is 0 and a broader search might help)
+"""
+
+
+class EngineCallbacks:
+    """Progress hooks; front ends override what they display (all no-ops by default)"""
+
+    def on_stage(self, stage, material, location):
+        """A stage is starting: watchman, watchman_retry, analyst or dispatcher"""
+
+    def on_alert(self, result):
+        """A critical alert was raised (called once per alert, before on_result)"""
+
+    def on_result(self, result):
+        """A supplier finished (any status)"""
+
+
+class JsonAlertHistory:
+    """AGENTIC CONCEPT 2: STATE/MEMORY (Persistence) - alert IDs already dispatched"""
+
+    def __init__(self, path="alert_history.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return set(json.load(f))
+            except (OSError, ValueError):
+                return set()
+        return set()
+
+    def __contains__(self, alert_id):
+        return alert_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, alert_id):
+        with self._lock:
+            self._ids.add(alert_id)
+            with span("_save_history"), open(self.path, 'w') as f:
+                json.dump(list(self._ids), f)
+
+
+class TTLCache:
+    """In-memory search cache; entries expire after ttl seconds"""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+
+class RateLimiter:
+    """Token bucket shared by all threads: at most `per_minute` model calls per minute"""
+
+    def __init__(self, per_minute, burst=None):
+        self.interval = 60.0 / per_minute
+        self.capacity = burst or 1
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
+
+
+def limiter_from_env():
+    """RateLimiter for SENTINEL_RATE_LIMIT model calls per minute; None when unset or 0"""
+    per_minute = int(os.getenv("SENTINEL_RATE_LIMIT", "0") or 0)
+    return RateLimiter(per_minute) if per_minute > 0 else None
+
+
+class SearchResult:
+    """Watchman output; status is ok, cached or error (text is empty on error)"""
+    __slots__ = ("status", "text", "broad", "latency_ms")
+
+    def __init__(self, status, text="", broad=False, latency_ms=None):
+        self.status = status
+        self.text = text
+        self.broad = broad
+        self.latency_ms = latency_ms
+
+    @property
+    def ok(self):
+        return self.status != "error" and bool(self.text)
+
+    def __repr__(self):
+        return f"SearchResult({self.status!r}, {len(self.text)} chars, broad={self.broad})"
+
+
+class Assessment:
+    """Analyst output; status is scored, no_data (nothing to analyse) or error"""
+    __slots__ = ("status", "score", "reason", "action_needed", "retry_search")
+
+    def __init__(self, status, score=None, reason=None, action_needed=False, retry_search=False):
+        self.status = status
+        self.score = score
+        self.reason = reason
+        self.action_needed = action_needed
+        self.retry_search = retry_search
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls("scored", payload.get('risk_score', 0), payload.get('reason', 'Unknown'),
+                   bool(payload.get('action_needed', False)), bool(payload.get('retry_search', False)))
+
+    @property
+    def ok(self):
+        return self.status == "scored"
+
+    @property
+    def wants_retry(self):
+        """Nothing relevant found and the analyst thinks a broader search might help"""
+        return self.ok and self.score == 0 and self.retry_search
+
+    def __repr__(self):
+        return f"Assessment({self.status!r}, score={self.score!r})"
+
+
+class DispatchOutcome:
+    """Final per-supplier result; status is critical, safe, skipped or deferred"""
+    __slots__ = ("material", "location", "status", "score", "reason", "message")
+
+    def __init__(self, material, location, status, score=None, reason=None, message=None):
+        self.material = material
+        self.location = location
+        self.status = status
+        self.score = score
+        self.reason = reason
+        self.message = message
+
+    def as_dict(self):
+        """JSON-ready form for storage and export"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"DispatchOutcome({self.material!r}, {self.location!r}, {self.status!r}, score={self.score!r})"
+
+
+class MonitoringEngine:
+    """
+    One supplier pass: search, score, optional broader retry, dispatch
+
+    Args:
+        client: genai client (or cassette / simulated stand-in)
+        history: alert-history store with `in` and add(); JsonAlertHistory by default
+        cache: optional search cache with get(key) / set(key, value)
+        limiter: optional object whose acquire() blocks before each model call
+        ledger: TokenLedger for token accounting and the cycle budget
+        callbacks: EngineCallbacks receiving progress events
+        retry_on_zero: re-search material-only when the analyst finds nothing
+        prefilter: local classifier with classify(text); "quiet" results skip the analyst call.
+            None uses the SENTINEL_QUIET_FILTER default, False disables it
+        outbox: alert_dispatch.AlertDispatcher (or anything with submit(outcome, alert_id))
+            that delivers critical alerts off the scanning path
+        events: event_store.EventStore; when a supplier's search reports only events already
+            assessed today, the analyst is not called again (every supplier is still searched).
+            None uses the SENTINEL_EVENT_CLUSTERING default (off), False disables it
+        normalizer: maps material/location variants to canonical names before any
+            search, cache or alert-history key is built (normalize.normalizer by default)
+    """
+
+    def __init__(self, client, model_id=MODEL_ID, history=None, cache=None, limiter=None,
+                 ledger=None, callbacks=None, retry_on_zero=True, prefilter=None, normalizer=None, outbox=None,
+                 events=None):
+        # google.genai takes most of a second to import; pay for it only when monitoring starts
+        from google.genai import types
+
+        self.client = client
+        self.model_id = model_id
+        self.history = history if history is not None else JsonAlertHistory()
+        self.cache = cache
+        self.limiter = limiter
+        self.ledger = ledger or TokenLedger()
+        self.callbacks = callbacks or EngineCallbacks()
+        self.retry_on_zero = retry_on_zero
+        self.prefilter = quiet_filter_from_env() if prefilter is None else prefilter or None
+        self.normalizer = normalizer or default_normalizer
+        self.outbox = outbox
+        # An empty EventStore is falsy (len 0), so test for False explicitly
+        self.events = events_from_env() if events is None else None if events is False else events
+
+        # AGENTIC CONCEPT 1: TOOLS (Native Google Search Grounding)
+        search_tool = types.Tool(google_search=types.GoogleSearch())
+        # Built once: constructing the pydantic config per call is measurable at scale
+        self.search_config = types.GenerateContentConfig(tools=[search_tool], response_mime_type="text/plain")
+        self.analyst_config = types.GenerateContentConfig(response_mime_type="application/json")
+
+    def fork(self, ledger=None, callbacks=None):
+        """
+        Engine sharing this one's client, stores, limiter and outbox, with its own ledger and callbacks
+
+        For independent runs side by side (scan_service jobs): each gets its own
+        token accounting and budget while alert memory and the rate limit stay shared.
+        """
+        engine = copy.copy(self)
+        engine.ledger = ledger or TokenLedger(self.ledger.budget)
+        engine.callbacks = callbacks or EngineCallbacks()
+        return engine
+
+    @staticmethod
+    def alert_id(material, location):
+        return f"{material}-{location}-{datetime.now().strftime('%Y-%m-%d')}"
+
+    def _generate(self, prompt, config):
+        if self.limiter is not None:
+            with span("rate_limit_wait"):
+                self.limiter.acquire()
+        with span("generate_content", model=self.model_id):
+            return self.client.models.generate_content(model=self.model_id, contents=prompt, config=config)
+
+    def watchman(self, material, location, broad=False):
+        """Role: The Hunter. Finds raw signals. Always returns a SearchResult."""
+        stage = "watchman_retry" if broad else "watchman"
+        self.callbacks.on_stage(stage, material, location)
+        if broad:
+            prompt = BROAD_SEARCH_PROMPT.format(material=material)
+            watchman_logger.info("Retrying search with broader query (material-only): %s", material,
+                                 extra=log_context(stage, material, location))
+        else:
+            prompt = SEARCH_PROMPT.format(material=material, location=location)
+            watchman_logger.debug("Initiating search for %s in %s", material, location,
+                                  extra=log_context(stage, material, location))
+
+        cache_key = (material, None if broad else location, datetime.now().strftime('%Y-%m-%d'))
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                stage_registry.observe(stage, "cached", 0.0)
+                watchman_logger.debug("Search served from cache for %s in %s", material, location,
+                                      extra=log_context(stage, material, location))
+                return SearchResult("cached", cached, broad)
+
+        with time_stage(stage) as timer:
+            try:
+                started = time.perf_counter()
+                response = self._generate(prompt, self.search_config)
+                latency_ms = (time.perf_counter() - started) * 1000
+                result = response.text or ""
+                article_count = sum(1 for line in result.split('\n') if line.strip())
+
+                if broad:
+                    watchman_logger.info("Retry search returned %d data points for %s", article_count, material,
+                                         extra=log_context(stage, material, location, latency_ms=latency_ms))
+                else:
+                    watchman_logger.info("Search returned %d data points for %s in %s", article_count, material, location,
+                                         extra=log_context(stage, material, location, latency_ms=latency_ms))
+
+                self.ledger.record(stage, response, material, location)
+                if self.cache is not None and result:
+                    self.cache.set(cache_key, result)
+                return SearchResult("ok", result, broad, latency_ms)
+            except Exception as e:
+                timer.outcome = "error"
+                watchman_logger.error("Search failed for %s in %s: %s", material, location, str(e), exc_info=True,
+                                      extra=log_context(stage, material, location))
+                return SearchResult("error", broad=broad)
+
+    def analyst(self, material, location, search):
+        """Role: The Brain. Scores the risk of a SearchResult. Always returns an Assessment."""
+        self.callbacks.on_stage("analyst", material, location)
+        with time_stage("analyst") as timer:
+            if not search.ok:
+                analyst_logger.warning("Insufficient data for analysis: %s in %s", material, location,
+                                       extra=log_context("analyst", material, location))
+                timer.outcome = "skipped"
+                return Assessment("no_data")
+
+            # Clearly quiet news scores 0 locally; the broader retry still runs as if the analyst asked for it
+            if self.prefilter is not None and self.prefilter.classify(search.text) == QUIET:
+                timer.outcome = "prefiltered"
+                analyst_logger.info("Pre-filter: no disruption signals for %s in %s — analyst call skipped", material, location,
+                                    extra=log_context("analyst", material, location, score=0))
+                return Assessment("scored", 0, "No disruption signals in search results (local pre-filter)",
+                                  retry_search=not search.broad)
+
+            # The same typhoon or strike reported for another supplier: reuse that verdict
+            events = self.events.observe(search.text, material, location) if self.events is not None and not search.broad else []
+            shared = self.events.known_assessment(events) if events else None
+            if shared is not None:
+                timer.outcome = "clustered"
+                analyst_logger.info("Shared event: %s already assessed for %s — analyst call skipped for %s in %s",
+                                    shared.describe(), shared.assessed_for[0], material, location,
+                                    extra=log_context("analyst", material, location, score=shared.assessment.score))
+                return self._shared_assessment(shared)
+
+            # AGENTIC CONCEPT 3: HANDSHAKE & CONTEXT ENGINEERING
+            prompt = ANALYST_PROMPT.format(search_data=search.text, material=material, location=location)
+
+            try:
+                analyst_logger.debug("Risk analysis initiated for %s in %s", material, location,
+                                     extra=log_context("analyst", material, location))
+                started = time.perf_counter()
+                response = self._generate(prompt, self.analyst_config)
+                latency_ms = (time.perf_counter() - started) * 1000
+                self.ledger.record(timer.stage, response, material, location)
+                with span("json_parse"):
+                    assessment = Assessment.from_payload(json.loads(response.text))
+                if events:
+                    self.events.assess(events, assessment, material, location)
+                score = assessment.score
+                context = log_context("analyst", material, location, score=score, latency_ms=latency_ms)
+
+                # Log based on severity
+                if score == 0:
+                    analyst_logger.warning("No relevant data found for %s in %s — Agent recommends retry", material, location, extra=context)
+                elif score >= CRITICAL_SCORE:
+                    analyst_logger.critical("Risk score computed: %s/10 — CRITICAL threat level for %s in %s", score, material, location, extra=context)
+                elif score >= 5:
+                    analyst_logger.warning("Risk score computed: %s/10 — ELEVATED threat level for %s in %s", score, material, location, extra=context)
+                else:
+                    analyst_logger.info("Risk score computed: %s/10 — NORMAL threat level for %s in %s", score, material, location, extra=context)
+
+                return assessment
+            except Exception as e:
+                timer.outcome = "error"
+                analyst_logger.error("Analysis failed for %s in %s: %s", material, location, str(e), exc_info=True,
+                                     extra=log_context("analyst", material, location))
+                return Assessment("error")
+
+    @staticmethod
+    def _shared_assessment(event):
+        assessment = event.assessment
+        return Assessment("scored", assessment.score, f"{assessment.reason} (shared {event.describe()})",
+                          assessment.action_needed, assessment.retry_search)
+
+    def dispatcher(self, material, location, assessment, alert_id=None):
+        """Role: The Action. Filters noise and raises alerts. Returns a DispatchOutcome."""
+        self.callbacks.on_stage("dispatcher", material, location)
+        with time_stage("dispatcher") as timer:
+            if not assessment.ok:
+                dispatcher_logger.info("No data to assess for %s in %s", material, location,
+                                       extra=log_context("dispatcher", material, location))
+                timer.outcome = "skipped"
+                return DispatchOutcome(material, location, "skipped", message="No data — search or analysis failed")
+
+            score = assessment.score
+            reason = assessment.reason
+
+            # CHECK THRESHOLD (Logic)
+            if score >= CRITICAL_SCORE:
+                result = DispatchOutcome(material, location, "critical", score, reason)
+                alert_id = alert_id or self.alert_id(material, location)
+                # Delivery (email/webhook/file) happens on the outbox thread; this only enqueues
+                if self.outbox is not None:
+                    self.outbox.submit(result, alert_id)
+                dispatcher_logger.critical("Critical alert sent — %s-%s — Score: %s/10 — Reason: %s", material, location, score, reason,
+                                           extra=log_context("dispatcher", material, location, score=score))
+                # UPDATE MEMORY
+                self.history.add(alert_id)
+                self.callbacks.on_alert(result)
+                return result
+
+            dispatcher_logger.info("Risk monitored (non-critical) — %s-%s — Score: %s/10", material, location, score,
+                                   extra=log_context("dispatcher", material, location, score=score))
+            return DispatchOutcome(material, location, "safe", score, reason)
+
+    def check_item(self, material, location):
+        """Full pipeline for one supplier, as its own trace"""
+        material, location = self.normalizer.key(material, location)
+        with start_trace("supplier", material=material, location=location):
+            return self._check_item(material, location)
+
+    def _check_item(self, material, location):
+        alert_id = self.alert_id(material, location)
+
+        # CHECK MEMORY (Deduplication) before spending any model calls
+        if alert_id in self.history:
+            dispatcher_logger.debug("Duplicate alert suppressed: %s", alert_id,
+                                    extra=log_context("dispatcher", material, location))
+            # Served from alert memory; zero-duration sample keeps the outcome visible
+            stage_registry.observe("dispatcher", "cached", 0.0)
+            return DispatchOutcome(material, location, "skipped", message="Already assessed today")
+
+        # PHASE 1 + 2: search with location, then score
+        search = self.watchman(material, location)
+        assessment = self.analyst(material, location, search)
+
+        # PHASE 3: Agentic retry logic - if no relevant data found
+        if self.retry_on_zero and assessment.wants_retry:
+            dispatcher_logger.info("Agent decision: Retry with broader search for %s", material,
+                                   extra=log_context("dispatcher", material, location))
+            record_retry("watchman")
+            with time_stage("retry") as retry_timer:
+                search = self.watchman(material, location, broad=True)
+                assessment = self.analyst(material, location, search)
+                if not assessment.ok:
+                    retry_timer.outcome = "error" if search.status == "error" else "skipped"
+
+        return self.dispatcher(material, location, assessment, alert_id)
+
+    def _defer(self, item):
+        material, location = item.get('material'), item.get('location')
+        self.ledger.defer(item)
+        dispatcher_logger.warning("Token budget reached (%d/%d) — deferring %s supplier %s in %s",
+                                  self.ledger.total, self.ledger.budget, supplier_priority(item), material, location,
+                                  extra=log_context("dispatcher", material, location))
+        return DispatchOutcome(material, location, "deferred", message="Deferred — token budget reached")
+
+    def scan(self, suppliers, deferred=(), spacing=0.0):
+        """
+        AGENTIC CONCEPT 4: LONG-RUNNING OPERATION - one cycle, sequentially
+
+        Yields one DispatchOutcome per supplier in priority order. Once the ledger's
+        budget is reached, normal/low priority suppliers come back "deferred".
+        """
+        for item in prioritize(suppliers, deferred):
+            if self.ledger.should_defer(item):
+                result = self._defer(item)
+            else:
+                result = self.check_item(item.get('material'), item.get('location'))
+                if spacing:
+                    with span("item_spacing"):
+                        time.sleep(spacing)  # Graceful spacing between agents
+            self.callbacks.on_result(result)
+            yield result
+
+    async def check_item_async(self, material, location):
+        import asyncio  # ~30 ms; only async callers pay for it
+        # Model calls are blocking HTTP; run them on the default executor (contextvars carry over)
+        return await asyncio.to_thread(self.check_item, material, location)
+
+    async def scan_async(self, suppliers, deferred=(), concurrency=4):
+        """Scan up to `concurrency` suppliers at once; results keep priority order"""
+        import asyncio
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(item):
+            async with semaphore:
+                if self.ledger.should_defer(item):
+                    result = self._defer(item)
+                else:
+                    result = await self.check_item_async(item.get('material'), item.get('location'))
+                self.callbacks.on_result(result)
+                return result
+
+        return await asyncio.gather(*(one(item) for item in prioritize(suppliers, deferred)))
@@ -0,0 +1,276 @@
+"""
+SupplySentinel Stage Metrics
+Fixed-bucket latency histograms and counters for every pipeline stage,
+exported in the Prometheus text format
+
+Stages: watchman, watchman_retry, analyst, retry, dispatcher, alert_send, alert_delivery, http_connect
+Outcomes: ok, error, skipped, cached, prefiltered, clustered
+"""
+
+import bisect
+import ipaddress
+import os
+import threading
+import time
+
+from tracing import span
+
+# Upper bounds in seconds; model calls with search grounding routinely take 2-20s
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+METRIC_PREFIX = "sentinel"
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket (cumulated only on export)"""
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def copy(self):
+        other = Histogram(self.bounds)
+        other.counts = list(self.counts)
+        other.total = self.total
+        other.count = self.count
+        return other
+
+    def since(self, earlier):
+        """Observations made after `earlier` (a copy of this histogram); None if there are none"""
+        if earlier is None:
+            return self.copy()
+        if self.count == earlier.count:
+            return None
+        delta = Histogram(self.bounds)
+        delta.counts = [now - then for now, then in zip(self.counts, earlier.counts)]
+        delta.total = self.total - earlier.total
+        delta.count = self.count - earlier.count
+        return delta
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[idx - 1] if idx > 0 else 0.0
+                if idx == len(self.bounds):
+                    return lower  # +Inf bucket: report its lower bound
+                upper = self.bounds[idx]
+                return lower + (upper - lower) * ((rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.bounds[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage histograms and labeled counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # (stage, outcome) -> Histogram
+        self.counters = {}    # (name, (("label", "value"), ...)) -> float
+        self.started_at = time.time()
+
+    def observe(self, stage, outcome, seconds):
+        with self._lock:
+            histogram = self.histograms.get((stage, outcome))
+            if histogram is None:
+                histogram = self.histograms[(stage, outcome)] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Point-in-time copy to pass as `since`, so one viewer can start from zero without resetting everyone"""
+        with self._lock:
+            return {"histograms": {key: h.copy() for key, h in self.histograms.items()},
+                    "counters": dict(self.counters)}
+
+    def stage_summary(self, since=None):
+        """Rows of per-stage/outcome statistics for dashboards, slowest p95 first (after a snapshot, if given)"""
+        with self._lock:
+            histograms = {key: h.since(since["histograms"].get(key)) if since else h
+                          for key, h in self.histograms.items()}
+            rows = [{
+                "stage": stage,
+                "outcome": outcome,
+                "count": h.count,
+                "mean_s": h.total / h.count if h.count else 0.0,
+                "p50_s": h.quantile(0.50),
+                "p95_s": h.quantile(0.95),
+                "total_s": h.total,
+            } for (stage, outcome), h in histograms.items() if h is not None]
+        return sorted(rows, key=lambda row: row["p95_s"], reverse=True)
+
+    def counter_values(self, since=None):
+        with self._lock:
+            counters = sorted(self.counters.items())
+        if since:
+            counters = [(key, value - since["counters"].get(key, 0)) for key, value in counters]
+        return [(name, dict(labels), value) for (name, labels), value in counters if value or not since]
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        name = f"{METRIC_PREFIX}_stage_latency_seconds"
+        lines.append(f"# HELP {name} Latency of SupplySentinel pipeline stages")
+        lines.append(f"# TYPE {name} histogram")
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        for (stage, outcome), h in histograms:
+            labels = f'stage="{stage}",outcome="{outcome}"'
+            cumulative = 0
+            for bound, bucket_count in zip(h.bounds, h.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"{name}_sum{{{labels}}} {h.total:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        declared = set()
+        for (counter, labels), value in counters:
+            full_name = f"{METRIC_PREFIX}_{counter}_total"
+            if full_name not in declared:
+                lines.append(f"# TYPE {full_name} counter")
+                declared.add(full_name)
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+            lines.append(f"{full_name}{{{label_text}}} {value:g}" if label_text else f"{full_name} {value:g}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the CLI, the Streamlit app and benchmarks
+registry = MetricsRegistry()
+
+
+class StageTimer:
+    """
+    Context manager that records a stage's latency under its outcome
+
+    The outcome defaults to "ok", becomes "error" if an exception escapes, and
+    can be set explicitly (e.g. "skipped") by the code inside the block.
+    Each stage is also a trace span, tagged with its outcome.
+    """
+    __slots__ = ("stage", "outcome", "registry", "_start", "_span")
+
+    def __init__(self, stage, registry):
+        self.stage = stage
+        self.outcome = "ok"
+        self.registry = registry
+
+    def __enter__(self):
+        self._span = span(self.stage).__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "error"
+        self.registry.observe(self.stage, self.outcome, time.perf_counter() - self._start)
+        self._span.set(outcome=self.outcome)
+        self._span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def time_stage(stage):
+    """Time a pipeline stage: `with time_stage("watchman") as timer: ...`"""
+    return StageTimer(stage, registry)
+
+
+def record_model_call(stage, response):
+    """Count a model call and the tokens reported in its usage metadata"""
+    registry.inc("model_calls", stage=stage)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("input", "prompt_token_count"),
+                       ("output", "candidates_token_count"),
+                       ("tool", "tool_use_prompt_token_count")):
+        tokens = getattr(usage, attr, None)
+        if tokens:
+            registry.inc("tokens", tokens, stage=stage, kind=kind)
+
+
+def record_retry(stage):
+    registry.inc("retries", stage=stage)
+
+
+def write_textfile(path):
+    """Atomically write the Prometheus dump (node_exporter textfile-collector style)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def start_metrics_server(port, host="127.0.0.1", token=None):
+    """Serve /metrics on a daemon thread; returns the server so callers can shut it down
+
+    Like the scan API: SENTINEL_API_TOKEN, when set, is required as a bearer token
+    (Prometheus `authorization` scrape config), and binding beyond loopback without
+    one is a ValueError.
+    """
+    # http.server (and ssl via http.client) is only imported when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    token = token if token is not None else os.getenv("SENTINEL_API_TOKEN")
+    if not token and not is_loopback(host):
+        raise ValueError(f"refusing to serve /metrics on {host} without SENTINEL_API_TOKEN")
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self.send_error(401)
+                return
+            if self.path.rstrip("/") not in ("/metrics", ""):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep scrapes out of the agent logs
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
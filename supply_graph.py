@@ -0,0 +1,253 @@
+"""
+SupplySentinel Supply Graph
+Businesses → materials → source countries for many client businesses, with
+an inverted index from each (material, location) pair to the businesses that
+depend on it
+
+Every distinct pair is scanned once per cycle, however many businesses share
+it, and its result is pushed to all of them. Pairs are interned: a business
+holds only the ids of its own few dependencies and the latest result is kept
+once per pair, so memory and lookups stay flat as businesses are added.
+
+    graph = SupplyGraph.load("supply_graph.json")
+    graph.add_business("acme-bikes", suppliers, context="I make electric bikes in Texas")
+    for result in engine.scan(graph.suppliers()):   # one row per distinct pair
+        businesses = graph.record(result)         # who depends on it
+    graph.results_for("acme-bikes")                # latest outcome per dependency
+
+    python supply_graph.py add acme-bikes "I make electric bikes in Texas"
+    python supply_graph.py stats
+"""
+
+import json
+import os
+import threading
+import time
+
+from normalize import normalizer as default_normalizer
+from token_ledger import PRIORITY_RANK, supplier_priority
+
+GRAPH_FILE = "supply_graph.json"
+
+# A recorded result is reused instead of rescanning for this long (one monitoring cycle)
+RESULT_TTL = 24 * 3600
+
+
+class SupplyGraph:
+    """
+    Shared dependency graph; thread-safe
+
+    Args:
+        path: JSON file for save()/load() (None keeps the graph in memory only)
+        normalizer: canonical names, so "DRC" and "Democratic Republic of Congo" are one pair
+    """
+
+    def __init__(self, path=None, normalizer=None):
+        self.path = path
+        self.normalizer = normalizer or default_normalizer
+        self._lock = threading.Lock()
+        self.pairs = []         # pair_id -> (material, location)
+        self.pair_ids = {}      # (material, location) -> pair_id
+        self.dependents = []    # pair_id -> {business_id}; the inverted index
+        self.businesses = {}    # business_id -> {pair_id: priority or None}
+        self.contexts = {}      # business_id -> business description
+        self.results = {}       # pair_id -> (DispatchOutcome, recorded_at)
+
+    def __len__(self):
+        return len(self.businesses)
+
+    # ---- building --------------------------------------------------------
+
+    def _intern(self, key):
+        pair_id = self.pair_ids.get(key)
+        if pair_id is None:
+            pair_id = self.pair_ids[key] = len(self.pairs)
+            self.pairs.append(key)
+            self.dependents.append(set())
+        return pair_id
+
+    def add_business(self, business_id, suppliers, context=None):
+        """Register (or replace) a business's dependencies; returns the number of distinct pairs"""
+        edges = {}
+        for item in self.normalizer.suppliers(suppliers):
+            key = (item["material"], item["location"])
+            edges[key] = supplier_priority(item) if "priority" in item else None
+        with self._lock:
+            self._unlink(business_id)
+            self.businesses[business_id] = {self._intern(key): priority for key, priority in edges.items()}
+            for pair_id in self.businesses[business_id]:
+                self.dependents[pair_id].add(business_id)
+            if context is not None:
+                self.contexts[business_id] = context
+        return len(edges)
+
+    def remove_business(self, business_id):
+        with self._lock:
+            self._unlink(business_id)
+            self.contexts.pop(business_id, None)
+
+    def _unlink(self, business_id):
+        # Interned pairs are kept (ids stay stable); a pair with no dependents is simply not scanned
+        for pair_id in self.businesses.pop(business_id, ()):
+            self.dependents[pair_id].discard(business_id)
+
+    # ---- queries ---------------------------------------------------------
+
+    def dependents_of(self, material, location):
+        """Businesses that depend on a (material, location) pair"""
+        pair_id = self.pair_ids.get(self.normalizer.key(material, location))
+        if pair_id is None:
+            return set()
+        with self._lock:
+            return set(self.dependents[pair_id])
+
+    def suppliers(self):
+        """
+        One supplier row per pair with at least one dependent, most shared first
+
+        A pair's priority is the highest any dependent business gave it, so
+        prioritize() and the token budget treat it as that business would.
+        """
+        rows = []
+        with self._lock:
+            for pair_id, businesses in enumerate(self.dependents):
+                if not businesses:
+                    continue
+                material, location = self.pairs[pair_id]
+                row = {"material": material, "location": location}
+                priorities = [self.businesses[b][pair_id] for b in businesses if self.businesses[b][pair_id]]
+                if priorities:
+                    row["priority"] = min(priorities, key=PRIORITY_RANK.__getitem__)
+                rows.append((len(businesses), pair_id, row))
+        rows.sort(key=lambda entry: (-entry[0], entry[1]))
+        return [row for _, _, row in rows]
+
+    def record(self, outcome):
+        """
+        Store the latest result for a pair; returns the businesses it is pushed to
+
+        Only scored results (critical, safe) are kept for reuse: a skipped
+        "already assessed today" must not replace the alert it refers to, and
+        failed scans should be retried rather than shared.
+        """
+        if outcome.status == "deferred":
+            return set()
+        pair_id = self.pair_ids.get(self.normalizer.key(outcome.material, outcome.location))
+        if pair_id is None:
+            return set()
+        with self._lock:
+            if outcome.status in ("critical", "safe"):
+                self.results[pair_id] = (outcome, time.time())
+            return set(self.dependents[pair_id])
+
+    def track(self, outcomes):
+        """Pass outcomes through, recording each one as it is produced"""
+        for outcome in outcomes:
+            self.record(outcome)
+            yield outcome
+
+    def result(self, material, location, max_age=RESULT_TTL):
+        """The recorded outcome for a pair if it is younger than max_age seconds, else None"""
+        pair_id = self.pair_ids.get(self.normalizer.key(material, location))
+        with self._lock:
+            entry = self.results.get(pair_id)
+        if entry is None or time.time() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+    def results_for(self, business_id):
+        """[(material, location, outcome or None)] for a business's dependencies"""
+        with self._lock:
+            pair_ids = list(self.businesses.get(business_id, ()))
+            return [(*self.pairs[p], self.results.get(p, (None,))[0]) for p in pair_ids]
+
+    def stats(self):
+        with self._lock:
+            edges = sum(len(pairs) for pairs in self.businesses.values())
+            active = sum(1 for businesses in self.dependents if businesses)
+        return {"businesses": len(self.businesses), "pairs": active, "edges": edges,
+                "scans_saved": edges - active, "sharing": edges / active if active else 0.0}
+
+    # ---- persistence -----------------------------------------------------
+
+    def save(self, path=None):
+        """Atomically write businesses and their dependencies (results are per process)"""
+        path = path or self.path
+        with self._lock:
+            data = {"businesses": {
+                business_id: {"context": self.contexts.get(business_id), "suppliers": [
+                    {"material": self.pairs[p][0], "location": self.pairs[p][1], **({"priority": priority} if priority else {})}
+                    for p, priority in pairs.items()]}
+                for business_id, pairs in self.businesses.items()}}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=GRAPH_FILE, normalizer=None):
+        """The graph stored at path, or an empty one bound to it"""
+        graph = cls(path, normalizer)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return graph
+        for business_id, entry in data.get("businesses", {}).items():
+            graph.add_business(business_id, entry.get("suppliers", []), entry.get("context"))
+        return graph
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_graph():
+    """Process-wide graph for long-lived hosts (the Streamlit server); SENTINEL_SUPPLY_GRAPH names its file"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SupplyGraph.load(os.getenv("SENTINEL_SUPPLY_GRAPH", GRAPH_FILE))
+        return _shared
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the shared supply graph of client businesses")
+    parser.add_argument("--graph", default=os.getenv("SENTINEL_SUPPLY_GRAPH", GRAPH_FILE), help="graph file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="map a business's dependencies with the configuration agent and add it")
+    add.add_argument("business_id")
+    add.add_argument("description")
+    remove = commands.add_parser("remove", help="remove a business")
+    remove.add_argument("business_id")
+    commands.add_parser("stats", help="businesses, distinct pairs and scans saved per cycle")
+    dependents = commands.add_parser("dependents", help="businesses depending on a material/location pair")
+    dependents.add_argument("material")
+    dependents.add_argument("location")
+    args = parser.parse_args()
+
+    graph = SupplyGraph.load(args.graph)
+    if args.command == "add":
+        from dotenv import load_dotenv
+        load_dotenv()
+        from config_agent import ConfigurationAgent
+        suppliers = ConfigurationAgent().generate_suppliers(args.description)
+        if not suppliers:
+            raise SystemExit(1)
+        graph.add_business(args.business_id, suppliers, context=args.description)
+        graph.save()
+        print(f"✅ {args.business_id}: {len(suppliers)} dependencies added to {args.graph}")
+    elif args.command == "remove":
+        graph.remove_business(args.business_id)
+        graph.save()
+        print(f"✅ {args.business_id} removed")
+    elif args.command == "dependents":
+        for business_id in sorted(graph.dependents_of(args.material, args.location)):
+            print(business_id)
+    else:
+        stats = graph.stats()
+        print(f"Businesses: {stats['businesses']:,} | Distinct pairs: {stats['pairs']:,} | "
+              f"Dependencies: {stats['edges']:,} | Scans saved per cycle: {stats['scans_saved']:,} "
+              f"({stats['sharing']:.1f} businesses per pair)")
@@ -2,169 +2,113 @@ import os
 import time
 import json
 import logging
+import argparse
 from datetime import datetime
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+from itertools import chain
 
 # Import logging configuration
-from logging_config import setup_logging, config_logger, watchman_logger, analyst_logger, dispatcher_logger
+from logging_config import LOGS_DIR, setup_logging, log_context, config_logger, dispatcher_logger
 
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
+# Import stage metrics (latency histograms, call/token/retry counters)
+from stage_metrics import write_textfile, start_metrics_server
 
-# Configure logging for CLI with file output
-setup_logging(environment="cli")
+# Watchman → Analyst → Dispatcher pipeline shared with the Streamlit app
+from sentinel_engine import EngineCallbacks, MonitoringEngine, limiter_from_env
+
+# Token accounting per supplier/stage and the per-cycle token budget
+from token_ledger import TokenLedger, budget_from_env, load_deferred, save_deferred
+from metrics_tracker import AssessmentHistory, MetricsTracker
+
+# Record/replay of model calls (SENTINEL_CASSETTE / SENTINEL_CASSETTE_MODE)
+from cassette import MODES as CASSETTE_MODES, make_client
+
+# Per-supplier trace spans (Chrome trace-event export)
+from tracing import tracer, start_trace, export_chrome_trace
+
+# cProfile + tracemalloc per cycle (--profile)
+from profiling import CycleProfiler, PROFILES_DIR
+
+# Canonical material/location names
+from normalize import normalizer
+
+# Durable outbound alert queue with a background sender (file/webhook/SMTP sinks)
+from alert_dispatch import dispatcher_from_env
+
+# Process-wide keep-alive connection pool behind every live model client
+from http_pool import pool_stats
+
+# Model calls spread over several API keys (GEMINI_API_KEY=key1,key2,...)
+from key_pool import key_pool_stats
+
+# Shared businesses → materials → countries graph (one scan per distinct pair)
+from supply_graph import GRAPH_FILE, SupplyGraph
+
+# Append-only cycle progress, so a restarted CLI resumes its unfinished cycle
+from checkpoint import CHECKPOINTS_DIR, CycleCheckpoint
+
+def init_cli():
+    """
+    Explicit CLI start-up: load .env and configure logging.
+    
+    Kept out of import time so tests, benchmarks and short-lived tools can
+    import this module without touching the environment or the logs directory.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    # Configure logging for CLI with file output; handlers run on a background
+    # listener thread so agent calls never block on console or file I/O.
+    # SENTINEL_JSON_LOGS=1 adds structured JSON lines (logs/supplysentinel.jsonl)
+    setup_logging(environment="cli", use_queue=True, json_logs=os.getenv("SENTINEL_JSON_LOGS") == "1")
+
+# Prometheus text dump rewritten after every cycle
+METRICS_FILE = os.path.join(LOGS_DIR, "metrics.prom")
+
+# Chrome trace-event files, one per cycle (written when tracing is enabled)
+TRACES_DIR = os.path.join(LOGS_DIR, "traces")
+
+# Progress of the current cycle; resumed on start-up unless --fresh
+CHECKPOINT_FILE = os.path.join(CHECKPOINTS_DIR, "cli.jsonl")
+
+class CliCallbacks(EngineCallbacks):
+    """Console rendering for the shared monitoring engine"""
+
+    def on_alert(self, result):
+        print(f"\n🚨 🚨 CRITICAL ALERT: {result.material} Supply Chain Risk!")
+        print(f"   -> Location: {result.location}")
+        print(f"   -> Score: {result.score}/10")
+        print(f"   -> Reason: {result.reason}")
+        print(f"   -> [Queued for delivery to Procurement Team]\n")
 
 class SupplySentinel:
     def __init__(self):
-        self.client = genai.Client(api_key=API_KEY)
-        self.history_file = "alert_history.json"
-        self.alert_history = self._load_history()
+        # Watchman → Analyst → Dispatcher live in sentinel_engine, shared with the Streamlit app.
+        # SENTINEL_TOKEN_BUDGET caps tokens per cycle; SENTINEL_RATE_LIMIT caps model calls per minute
+        self.engine = MonitoringEngine(make_client(os.getenv("GEMINI_API_KEY")),
+                                       ledger=TokenLedger(budget_from_env()),
+                                       callbacks=CliCallbacks(),
+                                       limiter=limiter_from_env(),
+                                       outbox=dispatcher_from_env())
         
-        # Configuration for Gemini 2.5 Flash
-        self.model_id = "gemini-2.5-flash"
+        # Seconds between suppliers (graceful spacing; benchmarks set 0)
+        self.item_spacing = 2
         
-        # AGENTIC CONCEPT 1: TOOLS (Native Google Search Grounding)
-        self.search_tool = types.Tool(
-            google_search=types.GoogleSearch() 
-        )
-
-    def _load_history(self):
-        """AGENTIC CONCEPT 2: STATE/MEMORY (Persistence)"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                return set()
-        return set()
-
-    def _save_history(self):
-        with open(self.history_file, 'w') as f:
-            json.dump(list(self.alert_history), f)
-
-    def watchman_agent(self, material, location, retry_without_location=False):
-        """
-        Role: The Hunter. Finds raw signals.
-        """
-        if retry_without_location:
-            prompt = f"""
-            Find recent logistics, weather, or political news affecting {material} supply globally.
-            Focus on strikes, shortages, or natural disasters in the last 7 days.
-            """
-            watchman_logger.info(f"Retrying search with broader query (material-only): {material}")
-        else:
-            prompt = f"""
-            Find recent logistics, weather, or political news that could affect the supply of {material} from {location}.
-            Focus on strikes, shortages, or natural disasters in the last 7 days.
-            """
-            watchman_logger.debug(f"Initiating search for {material} in {location}")
+        # Directory for per-cycle Chrome traces (None = don't export)
+        self.trace_dir = None
         
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    tools=[self.search_tool],
-                    response_mime_type="text/plain" 
-                )
-            )
-            result = response.text
-            article_count = len([line for line in result.split('\n') if line.strip()])
-            
-            if retry_without_location:
-                watchman_logger.info(f"Retry search returned {article_count} data points for {material}")
-            else:
-                watchman_logger.info(f"Search returned {article_count} data points for {material} in {location}")
-            
-            return result
-        except Exception as e:
-            watchman_logger.error(f"Search failed for {material} in {location}: {str(e)}", exc_info=True)
-            return None
-
-    def analyst_agent(self, material, location, search_data):
-        """
-        Role: The Brain. Scores the risk.
-        """
-        if not search_data:
-            analyst_logger.warning(f"Insufficient data for analysis: {material} in {location}")
-            return None
-
-        # AGENTIC CONCEPT 3: HANDSHAKE & CONTEXT ENGINEERING
-        prompt = f"""
-        CONTEXT: You are a Supply Chain Risk Officer.
-        INPUT DATA: {search_data}
+        # Run each cycle under cProfile + tracemalloc (artifacts in logs/profiles)
+        self.profile = False
         
-        TASK: Analyze the risk for {material} from {location}.
+        # Resume an unfinished cycle for the same suppliers.json on start-up (False = always start over)
+        self.resume = True
         
-        OUTPUT: JSON with:
-        - risk_score (0-10, where 10 is factory shutdown, 0 means no relevant information found)
-        - reason (1 sentence)
-        - action_needed (boolean)
-        - retry_search (boolean - true if score is 0 and a broader search might help)
-        """
-
-        try:
-            analyst_logger.debug(f"Risk analysis initiated for {material} in {location}")
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            risk_data = json.loads(response.text)
-            score = risk_data.get('risk_score', 0)
-            
-            # Log based on severity
-            if score == 0:
-                analyst_logger.warning(f"No relevant data found for {material} in {location} — Agent recommends retry")
-            elif score >= 7:
-                analyst_logger.critical(f"Risk score computed: {score}/10 — CRITICAL threat level for {material} in {location}")
-            elif score >= 5:
-                analyst_logger.warning(f"Risk score computed: {score}/10 — ELEVATED threat level for {material} in {location}")
-            else:
-                analyst_logger.info(f"Risk score computed: {score}/10 — NORMAL threat level for {material} in {location}")
-            
-            return risk_data
-        except Exception as e:
-            analyst_logger.error(f"Analysis failed for {material} in {location}: {str(e)}", exc_info=True)
-            return None
-
-    def dispatcher_agent(self, material, location, risk_data):
-        """
-        Role: The Action. Filters noise and alerts user.
-        """
-        if not risk_data:
-            dispatcher_logger.info(f"No significant risks detected for {material} in {location}")
-            return
-
-        score = risk_data.get('risk_score', 0)
-        reason = risk_data.get('reason', 'Unknown')
-        alert_id = f"{material}-{location}-{datetime.now().strftime('%Y-%m-%d')}"
-
-        # CHECK MEMORY (Deduplication)
-        if alert_id in self.alert_history:
-            dispatcher_logger.debug(f"Duplicate alert suppressed: {alert_id}")
-            return
-
-        # CHECK THRESHOLD (Logic)
-        if score >= 7:
-            print(f"\n🚨 🚨 CRITICAL ALERT: {material} Supply Chain Risk!")
-            print(f"   -> Location: {location}")
-            print(f"   -> Score: {score}/10")
-            print(f"   -> Reason: {reason}")
-            print(f"   -> [Sent Email to Procurement Team]\n")
-            
-            dispatcher_logger.critical(f"Critical alert sent — {material}-{location} — Score: {score}/10 — Reason: {reason}")
-            
-            # UPDATE MEMORY
-            self.alert_history.add(alert_id)
-            self._save_history()
-        else:
-            dispatcher_logger.info(f"Risk monitored (non-critical) — {material}-{location} — Score: {score}/10")
+        self.deferred = load_deferred()  # suppliers skipped for budget, scanned first next cycle (or run)
+        
+        # Supply graph of many client businesses; when set it replaces suppliers.json
+        self.graph = None
+        
+        # Every scored result, per supplier, for risk_trends (EWMA, anomalies, slope)
+        self.assessments = AssessmentHistory()
 
     def run_loop(self, debug_mode=False):
         """AGENTIC CONCEPT 4: LONG-RUNNING OPERATION"""
@@ -172,50 +116,132 @@ class SupplySentinel:
         dispatcher_logger.info("Monitoring loop started")
         
         # Load configuration
-        try:
-            with open("suppliers.json", "r") as f:
-                suppliers = json.load(f)
-                config_logger.info(f"Loaded {len(suppliers)} suppliers from configuration")
-        except FileNotFoundError:
-            config_logger.error("suppliers.json not found. Run config_agent.py first.")
-            print("❌ Error: suppliers.json not found. Run config_agent.py first.")
-            return
-
-        cycle_number = 0
+        if self.graph is not None:
+            # Each distinct material/location pair is scanned once for all businesses that depend on it
+            suppliers = self.graph.suppliers()
+            stats = self.graph.stats()
+            config_logger.info("Loaded supply graph — %d businesses, %d distinct pairs (%d dependencies)",
+                               stats["businesses"], stats["pairs"], stats["edges"])
+        else:
+            try:
+                with open("suppliers.json", "r") as f:
+                    raw_suppliers = json.load(f)
+                # Older configs may hold variant spellings of one supplier; scan it once
+                suppliers = normalizer.suppliers(raw_suppliers)
+                config_logger.info("Loaded %d suppliers from configuration", len(suppliers))
+                if len(suppliers) < len(raw_suppliers):
+                    config_logger.info("Merged %d duplicate supplier spellings", len(raw_suppliers) - len(suppliers))
+            except FileNotFoundError:
+                config_logger.error("suppliers.json not found. Run config_agent.py first.")
+                print("❌ Error: suppliers.json not found. Run config_agent.py first.")
+                return
+
+        checkpoint = CycleCheckpoint(CHECKPOINT_FILE)
+        unfinished = checkpoint.load(suppliers) if self.resume else None
+        cycle_number = unfinished.cycle_id - 1 if unfinished else 0
         while True:
             cycle_number += 1
-            dispatcher_logger.info(f"Starting monitoring cycle #{cycle_number}")
+            if unfinished:
+                # Crash or redeploy mid-cycle: keep the recorded results, scan only what is left
+                checkpoint.reopen(unfinished)
+                restored, todo = unfinished.results, unfinished.remaining()
+                dispatcher_logger.info("Resuming monitoring cycle #%d — %d/%d suppliers already done",
+                                       cycle_number, len(restored), len(suppliers))
+                unfinished = None
+            else:
+                checkpoint.begin(cycle_number, suppliers)
+                restored, todo = [], suppliers
+                dispatcher_logger.info("Starting monitoring cycle #%d", cycle_number)
+            tracer.clear()
+            ledger = self.engine.ledger = TokenLedger(self.engine.ledger.budget)
+            profiler = CycleProfiler(f"cycle-{cycle_number}").start() if self.profile else None
             
             safe_count = 0
             critical_count = 0
             skipped_count = 0
+            risk_scores = []
+            notified = 0  # business notifications from the supply graph fan-out
             
-            for item in suppliers:
-                # 1. Watchman scans
-                news = self.watchman_agent(item['material'], item['location'])
-                
-                # 2. Analyst scores
-                risk_analysis = self.analyst_agent(item['material'], item['location'], news)
-                
-                # 3. Dispatcher acts
-                self.dispatcher_agent(item['material'], item['location'], risk_analysis)
-                
-                # Track statistics
-                if risk_analysis:
-                    score = risk_analysis.get('risk_score', 0)
-                    if score >= 7:
+            with start_trace("cycle", cycle=cycle_number, suppliers=len(suppliers)):
+                scan = self.engine.scan(todo, self.deferred, spacing=self.item_spacing)
+                for result in chain(restored, checkpoint.track(self.assessments.track(scan))):
+                    if self.graph is not None:
+                        businesses = self.graph.record(result)
+                        notified += len(businesses)
+                        if result.status == 'critical':
+                            dispatcher_logger.info("Critical result for %s in %s pushed to %d dependent businesses",
+                                                   result.material, result.location, len(businesses),
+                                                   extra=log_context("dispatcher", result.material, result.location))
+                    
+                    # Track statistics
+                    if result.score is not None:
+                        risk_scores.append(result.score)
+                    if result.status == 'critical':
                         critical_count += 1
-                    else:
+                    elif result.status == 'safe':
                         safe_count += 1
-                else:
-                    skipped_count += 1
-                
-                time.sleep(2) # Graceful spacing between agents
+                    elif result.status == 'skipped':
+                        skipped_count += 1
+            
+            checkpoint.finish()
             
             # Log cycle completion statistics
-            dispatcher_logger.info(f"Cycle #{cycle_number} complete — Scanned: {len(suppliers)} | Safe: {safe_count} | Critical: {critical_count} | Skipped: {skipped_count}")
+            usage = ledger.summary()
+            self.deferred = list(ledger.deferred)
+            save_deferred(self.deferred)
+            scanned = len(suppliers) - usage["deferred"]
+            dispatcher_logger.info("Cycle #%d complete — Scanned: %d | Safe: %d | Critical: %d | Skipped: %d | Deferred: %d",
+                                   cycle_number, scanned, safe_count, critical_count, skipped_count, usage["deferred"])
+            dispatcher_logger.info("Cycle #%d tokens — Input: %d | Output: %d | Tool: %d | Total: %d%s | Est. cost: $%.4f",
+                                   cycle_number, usage["input"], usage["output"], usage["tool"], usage["total"],
+                                   f"/{usage['budget']}" if usage["budget"] else "", usage["estimated_cost_usd"])
+            for row in ledger.supplier_rows(limit=3):
+                dispatcher_logger.debug("Top token consumer — %s in %s: %d tokens", row["material"], row["location"], row["total"],
+                                        extra=log_context("dispatcher", row["material"], row["location"]))
+            
+            MetricsTracker().record_scan(scanned, critical_count, risk_scores, token_usage=usage)
+            
+            # Prometheus text dump for scrapers / node_exporter textfile collector
+            write_textfile(METRICS_FILE)
+            
+            if profiler:
+                prof_path, summary_path = profiler.stop()
+                dispatcher_logger.info("Cycle #%d profile written to %s (summary: %s)", cycle_number, prof_path, summary_path)
+            
+            if self.trace_dir:
+                trace_file = os.path.join(self.trace_dir, f"cycle-{cycle_number}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+                span_count = export_chrome_trace(trace_file)
+                dispatcher_logger.info("Cycle #%d trace written to %s (%d spans)", cycle_number, trace_file, span_count)
+
+            if self.graph is not None:
+                dispatcher_logger.info("Cycle #%d fan-out — %d pairs scanned for %d businesses (%d results pushed)",
+                                       cycle_number, scanned, len(self.graph), notified)
+
+            if self.engine.events is not None:
+                events = self.engine.events
+                dispatcher_logger.info("Cycle #%d events — Tracked: %d | Sightings: %d | Assessments reused: %d",
+                                       cycle_number, len(events), events.counts["sightings"], events.counts["reused"])
 
+            outbox = self.engine.outbox.stats()
+            dispatcher_logger.info("Cycle #%d alerts — Queued: %d | Delivered: %d in %d digests | Pending: %d | Failed attempts: %d | Dropped: %d",
+                                   cycle_number, outbox["queued"], outbox["delivered"], outbox["digests"],
+                                   outbox["pending"], outbox["failed_attempts"], outbox["dead"])
+            
+            http = pool_stats()
+            if http:
+                dispatcher_logger.info("Cycle #%d HTTP — Requests: %d | New connections: %d | Reused: %d (%.0f%%) | Connect time: %.2fs",
+                                       cycle_number, http["requests"], http["connections"], http["reused"],
+                                       100 * (http["reuse_ratio"] or 0), http["connect_s"])
+            
+            for key in key_pool_stats() or []:
+                dispatcher_logger.info("Cycle #%d API key %s — %s | Calls: %d | Last minute: %d/%s | 429s: %d | Rejected: %d",
+                                       cycle_number, key["key"], key["state"], key["calls"], key["used"],
+                                       key["rpm"] or "?", key["throttled"], key["rejected"])
+            
             if debug_mode:
+                # One-shot run: send what is queued now instead of waiting out the digest window
+                if not self.engine.outbox.close(timeout=30):
+                    dispatcher_logger.warning("Alert outbox not drained; undelivered alerts will be retried on next start")
                 print("🟡 Debug Mode: Stopping after one cycle.")
                 break
             
@@ -223,6 +249,78 @@ class SupplySentinel:
             time.sleep(86400)
 
 if __name__ == "__main__":
-    sentinel = SupplySentinel()
-    # Set debug_mode=True for the video demo!
-    sentinel.run_loop(debug_mode=True)
+    parser = argparse.ArgumentParser(description="SupplySentinel continuous monitoring loop")
+    parser.add_argument("--continuous", action="store_true",
+                        help="keep monitoring every 24 hours instead of stopping after one cycle")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port at /metrics")
+    parser.add_argument("--cassette", metavar="PATH",
+                        help="cassette file for recording or replaying model calls")
+    parser.add_argument("--cassette-mode", choices=CASSETTE_MODES, default="replay",
+                        help="record live calls, replay with recorded latency, or replay-fast with none")
+    parser.add_argument("--token-budget", type=int,
+                        help="max model tokens per cycle; low-priority suppliers beyond it are deferred (default: SENTINEL_TOKEN_BUDGET)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"profile each cycle (cProfile + tracemalloc); artifacts go to {PROFILES_DIR}/")
+    parser.add_argument("--fresh", action="store_true",
+                        help=f"start a new cycle even if {CHECKPOINT_FILE} holds an unfinished one")
+    parser.add_argument("--graph", metavar="PATH", nargs="?", const=GRAPH_FILE,
+                        help=f"monitor every business in a supply graph (default {GRAPH_FILE}) instead of suppliers.json")
+    parser.add_argument("--trace", action="store_true",
+                        help=f"write a Chrome trace of every cycle to {TRACES_DIR}/")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="run the headless scan API on this port instead of the monitoring loop")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address the scan API and metrics endpoint listen on; anything beyond loopback needs SENTINEL_API_TOKEN")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="scan jobs run at once in --serve mode")
+    args = parser.parse_args()
+    init_cli()
+    
+    if args.cassette:
+        os.environ["SENTINEL_CASSETTE"] = args.cassette
+        os.environ["SENTINEL_CASSETTE_MODE"] = args.cassette_mode
+    
+    if args.metrics_port:
+        try:
+            start_metrics_server(args.metrics_port, host=args.host)
+        except ValueError as e:
+            parser.error(str(e))
+        dispatcher_logger.info("Metrics endpoint listening on %s:%d/metrics", args.host, args.metrics_port)
+    
+    try:
+        sentinel = SupplySentinel()
+    except ValueError as e:
+        # Malformed environment (SENTINEL_TOKEN_BUDGET, SENTINEL_KEY_RPM, ...): say which, not a traceback
+        parser.error(str(e))
+    if args.trace:
+        sentinel.trace_dir = TRACES_DIR
+        tracer.recording = True
+    sentinel.profile = args.profile
+    sentinel.resume = not args.fresh
+    if args.graph:
+        sentinel.graph = SupplyGraph.load(args.graph)
+    if args.token_budget is not None:
+        sentinel.engine.ledger.budget = args.token_budget or None
+    
+    if args.serve:
+        # Jobs arrive over HTTP; each runs on its own fork of the engine (token budget applies per job)
+        from scan_service import JobQueue, start_api_server
+        jobs = JobQueue(sentinel.engine, workers=args.workers).start()
+        try:
+            server = start_api_server(jobs, args.serve, host=args.host)
+        except ValueError as e:
+            jobs.close(timeout=30)
+            parser.error(str(e))
+        dispatcher_logger.info("Scan API listening on %s:%d with %d workers", args.host, args.serve, args.workers)
+        print(f"🟢 SupplySentinel scan API on http://{args.host}:{args.serve}/jobs")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+            jobs.close(timeout=30)
+            sentinel.engine.outbox.close(timeout=30)
+    else:
+        # Debug mode (single cycle) stays the default for the video demo!
+        sentinel.run_loop(debug_mode=not args.continuous)
@@ -0,0 +1,145 @@
+"""
+Test asynchronous alert dispatch
+Run this to verify digest batching, retries and journal recovery
+"""
+
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from alert_dispatch import AlertDispatcher, MemorySink, WebhookSink
+from fake_genai import FakeGenaiClient
+from normalize import Normalizer
+from sentinel_engine import DispatchOutcome, JsonAlertHistory, MonitoringEngine
+from stage_metrics import MetricsRegistry
+
+
+def _outcome(i):
+    return DispatchOutcome(f"Cobalt {i}", "Zambia", "critical", 8, "Mine flooding")
+
+
+def test_batching_and_retry():
+    """A burst becomes one digest per recipient; a failed send is retried"""
+    print("🧪 Testing alert dispatch")
+    workdir = tempfile.mkdtemp(prefix="sentinel-outbox-")
+    email = MemorySink("email", fail_times=1)
+    registry = MetricsRegistry()
+    dispatcher = AlertDispatcher([(email, ["ops@example.com", "buyer@example.com"])],
+                                 journal_path=os.path.join(workdir, "outbox.jsonl"),
+                                 window=60, retry_base=0.01, registry=registry)
+    for i in range(5):
+        dispatcher.submit(_outcome(i), f"alert-{i}")
+    assert dispatcher.stats()["pending"] == 10  # still inside the window
+    assert dispatcher.close(timeout=5)
+
+    stats = dispatcher.stats()
+    assert len(email.digests) == 2 and all(len(alerts) == 5 for _, alerts in email.digests)
+    assert stats["delivered"] == 10 and stats["digests"] == 2 and stats["failed_attempts"] == 1
+    assert registry.histograms[("alert_send", "error")].count == 1
+    print(f"✅ 10 deliveries sent as {stats['digests']} digests after 1 retry")
+
+
+def test_dead_letter_and_recovery():
+    """Pending alerts survive a restart; hopeless ones are dropped after max_attempts"""
+    workdir = tempfile.mkdtemp(prefix="sentinel-outbox-")
+    journal = os.path.join(workdir, "outbox.jsonl")
+
+    # First process: dies (never closed) while both alerts wait out the digest window
+    crashed = AlertDispatcher([(MemorySink("webhook", fail_times=99), ["hook"])], journal_path=journal, window=600)
+    crashed.submit(_outcome(1), "alert-1")
+    crashed.submit(_outcome(2), "alert-2")
+    crashed._lock_file.close()  # the OS drops a dead process's lock
+
+    # Second process: both alerts are re-queued and delivered
+    webhook = MemorySink("webhook")
+    dispatcher = AlertDispatcher([(webhook, ["hook"])], journal_path=journal, window=60)
+    assert dispatcher.stats()["pending"] == 2
+    assert dispatcher.close(timeout=5)
+    assert [a["alert_id"] for a in webhook.digests[0][1]] == ["alert-1", "alert-2"]
+    print("✅ Undelivered alerts re-queued from the journal")
+
+    # Third process: nothing left to send
+    broken = MemorySink("webhook", fail_times=99)
+    dispatcher = AlertDispatcher([(broken, ["hook"])], journal_path=journal, window=0,
+                                 max_attempts=3, retry_base=0.01, registry=MetricsRegistry())
+    assert dispatcher.stats()["pending"] == 0
+    dispatcher.submit(_outcome(3), "alert-3")
+    assert dispatcher.close(timeout=5)
+    assert dispatcher.stats()["dead"] == 1 and broken.fail_times == 96
+    with open(journal, "r", encoding="utf-8") as f:
+        ops = [json.loads(line)["op"] for line in f]
+    assert ops[-1] == "dead"
+    print("✅ Delivery abandoned after 3 attempts")
+
+
+def test_processes_share_outbox():
+    """A second live process gets its own journal instead of re-sending the first one's pending alerts"""
+    print("🧪 Testing concurrent outbox owners")
+    workdir = tempfile.mkdtemp(prefix="sentinel-outbox-")
+    journal = os.path.join(workdir, "outbox.jsonl")
+    first = AlertDispatcher([(MemorySink("webhook"), ["hook"])], journal_path=journal, window=600)
+    first.submit(_outcome(1), "alert-1")
+
+    second = AlertDispatcher([(MemorySink("webhook"), ["hook"])], journal_path=journal, window=600)
+    assert second.journal_path != journal and second.stats()["pending"] == 0
+    second.submit(_outcome(2), "alert-2")
+    second._lock_file.close()  # second process dies with alert-2 undelivered
+    print(f"✅ Second process journaled to {os.path.basename(second.journal_path)}, nothing re-queued")
+
+    webhook = MemorySink("webhook")
+    first._lock_file.close()  # and so does the first, alert-1 still waiting out its window
+    third = AlertDispatcher([(webhook, ["hook"])], journal_path=journal, window=60)
+    assert third.journal_path == journal and third.stats()["pending"] == 2
+    assert third.close(timeout=5)
+    assert sorted(a["alert_id"] for _, alerts in webhook.digests for a in alerts) == ["alert-1", "alert-2"]
+    assert sorted(os.listdir(workdir)) == ["outbox.jsonl", "outbox.jsonl.lock"]
+    print("✅ Next owner sent both alerts once and adopted the abandoned journal")
+
+
+def test_webhook_sink():
+    """WebhookSink posts the digest as JSON"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        WebhookSink(f"http://127.0.0.1:{server.server_port}/alerts").send("hook", [_outcome(1).as_dict()])
+    finally:
+        server.shutdown()
+    assert received[0]["recipient"] == "hook" and "Cobalt 1" in received[0]["subject"]
+    print("✅ Webhook received the digest")
+
+
+def test_engine_enqueues_critical_alerts():
+    """The dispatcher stage queues alerts instead of sending them"""
+    workdir = tempfile.mkdtemp(prefix="sentinel-outbox-")
+    sink = MemorySink("email", delay=0.2)
+    outbox = AlertDispatcher([(sink, ["ops@example.com"])], journal_path=None, window=60, registry=MetricsRegistry())
+    engine = MonitoringEngine(FakeGenaiClient(seed=3, latency_scale=0, critical_rate=1.0, zero_rate=0.0),
+                              history=JsonAlertHistory(os.path.join(workdir, "h.json")),
+                              normalizer=Normalizer(), outbox=outbox)
+    results = list(engine.scan([{"material": f"Nickel {i}", "location": "Indonesia"} for i in range(3)]))
+    assert all(r.status == "critical" for r in results)
+    assert not sink.digests and outbox.stats()["queued"] == 3  # slow sink never blocked the scan
+    assert outbox.close(timeout=5)
+    assert len(sink.digests) == 1 and len(sink.digests[0][1]) == 3
+    print("✅ Engine queued 3 alerts, delivered as one digest")
+
+
+if __name__ == "__main__":
+    test_batching_and_retry()
+    test_dead_letter_and_recovery()
+    test_processes_share_outbox()
+    test_webhook_sink()
+    test_engine_enqueues_critical_alerts()
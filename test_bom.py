@@ -0,0 +1,80 @@
+"""
+Test bill-of-materials expansion
+Run this to verify multi-tier dependencies, memoized subtrees and the per-tier call bound
+"""
+
+import json
+import os
+import re
+import tempfile
+
+from bom import BomExpander
+from config_agent import ConfigCache, ConfigurationAgent
+from fake_genai import FakeResponse, FakeUsage
+from normalize import Normalizer
+
+INPUTS = {
+    "Lithium-ion cells": [("Lithium", "Chile"), ("Cobalt", "DRC"), ("Cathode material", "China")],
+    "Cathode material": [("Nickel", "Indonesia"), ("Manganese", "South Africa")],
+    "Aluminum": [("Bauxite", "Australia")],
+    "Widget": [("Gadget", "Japan")],
+    "Gadget": [("Widget", "Germany"), ("Copper", "Peru")],
+}
+
+
+class BomClient:
+    """Config calls map every business to cells + aluminum; expansion calls answer from INPUTS"""
+
+    def __init__(self):
+        self.models = self
+        self.asked = []
+
+    def generate_content(self, model, contents, config=None):
+        match = re.search(r'Which critical input MATERIALS is "([^"]+)"', contents)
+        if match is None:
+            payload = [{"material": "Lithium-ion cells", "location": "China"}, {"material": "Aluminium", "location": "Canada"},
+                       {"material": "Widget", "location": "USA"}]
+        else:
+            self.asked.append(match.group(1))
+            payload = [{"material": m, "location": l} for m, l in INPUTS.get(match.group(1), [])]
+        return FakeResponse(json.dumps(payload), FakeUsage(50, 20))
+
+
+def test_multi_tier_expansion():
+    """Tiers reach raw materials; cycles are cut; shared subtrees cost one call"""
+    print("🧪 Testing BOM expansion")
+    workdir = tempfile.mkdtemp(prefix="sentinel-bom-")
+    os.environ.setdefault("GEMINI_API_KEY", "test-key")
+    agent = ConfigurationAgent()
+    agent.client = BomClient()
+    cache = ConfigCache(os.path.join(workdir, "bom.jsonl"))
+    agent.expander = BomExpander(agent, depth=3, cache=cache, normalizer=Normalizer())
+
+    suppliers = agent.configure("I make e-bikes in Texas")
+    tiers = {(r["material"], r["location"]): r.get("tier", 1) for r in suppliers}
+    assert tiers[("Lithium", "Chile")] == 2 and tiers[("Nickel", "Indonesia")] == 3
+    assert tiers[("Bauxite", "Australia")] == 2 and tiers[("Copper", "Peru")] == 3
+    assert ("Widget", "Germany") not in tiers  # Gadget -> Widget would close a cycle
+    upstream = [r for r in suppliers if r.get("tier", 1) > 1]
+    assert all(r["priority"] == "low" and r["via"] for r in upstream)
+    # Raw commodities (Lithium, Cobalt, Nickel, ...) are never sent to the model
+    assert sorted(agent.client.asked) == ["Aluminum", "Cathode material", "Gadget", "Lithium-ion cells", "Widget"]
+    print(f"✅ {len(suppliers)} pairs over {max(tiers.values())} tiers from {len(agent.client.asked)} expansion calls")
+
+    # Another business, and another run, reuse every subtree
+    agent.configure("We assemble scooters")
+    assert len(agent.client.asked) == 5
+    agent.expander = BomExpander(agent, depth=3, cache=ConfigCache(cache.path), normalizer=Normalizer())
+    assert agent.configure("Battery packs for drones") == suppliers and len(agent.client.asked) == 5
+    print("✅ Shared subtrees served from memo and the persistent cache")
+
+    # At most one uncached material expanded per tier
+    agent.client = BomClient()
+    bounded = BomExpander(agent, depth=3, max_calls=1, normalizer=Normalizer())
+    dag = bounded.expand(agent.map_dependencies("I make e-bikes in Texas"))
+    assert dag.truncated == ["Aluminum", "Widget"] and bounded.calls == 2
+    print(f"✅ Call bound respected: {bounded.calls} calls, truncated {dag.truncated}")
+
+
+if __name__ == "__main__":
+    test_multi_tier_expansion()
@@ -0,0 +1,68 @@
+"""
+Test record/replay cassettes
+Run this to verify that replayed model responses match the recorded ones
+"""
+
+import os
+import tempfile
+
+from google.genai import types
+
+from cassette import Cassette, CassetteMiss, RecordingClient, ReplayClient
+from fake_genai import FakeAPIError, FakeGenaiClient
+
+MODEL_ID = "gemini-2.5-flash"
+
+
+def _requests():
+    search = types.GenerateContentConfig(tools=[types.Tool(google_search=types.GoogleSearch())])
+    analyst = types.GenerateContentConfig(response_mime_type="application/json")
+    requests = []
+    for i in range(20):
+        requests.append((f"Search news for Cobalt lot {i} in Chile", search))
+        requests.append((f"Analyze this news: strike at port {i}", analyst))
+    # The same prompt twice: replay serves the recorded answers in order
+    requests.append(("Search news for Cobalt lot 0 in Chile", search))
+    return requests
+
+
+def _call(client, contents, config):
+    try:
+        return client.models.generate_content(model=MODEL_ID, contents=contents, config=config).text
+    except FakeAPIError as e:
+        return f"error {e.code}"
+
+
+def test_record_and_replay():
+    """Replay returns the recorded responses and errors without calling the model"""
+    print("🧪 Testing cassette record/replay")
+    path = os.path.join(tempfile.mkdtemp(prefix="sentinel-cassette-"), "run.jsonl")
+
+    recorder = RecordingClient(FakeGenaiClient(seed=3, latency_scale=0, rate_429=0.2), Cassette(path))
+    recorded = [_call(recorder, contents, config) for contents, config in _requests()]
+    recorder.cassette.close()
+    assert "error 429" in recorded
+    assert len(Cassette(path)) == len(recorded)
+    print(f"✅ Recorded {len(recorded)} interactions")
+
+    replayer = ReplayClient(Cassette(path), latency_scale=0)
+    replayed = [_call(replayer, contents, config) for contents, config in _requests()]
+    assert replayed == recorded
+    assert replayer.hits == len(recorded)
+    print("✅ Replay matches recording (including errors)")
+
+    # Index is rebuilt when missing
+    os.remove(path + ".idx")
+    replayer = ReplayClient(Cassette(path), latency_scale=0)
+    assert [_call(replayer, contents, config) for contents, config in _requests()] == recorded
+    print("✅ Index rebuilt from the cassette")
+
+    try:
+        replayer.models.generate_content(model=MODEL_ID, contents="never recorded")
+        assert False, "expected CassetteMiss"
+    except CassetteMiss:
+        print("✅ Unrecorded requests raise CassetteMiss")
+
+
+if __name__ == "__main__":
+    test_record_and_replay()
@@ -0,0 +1,80 @@
+"""
+Test cycle checkpoints
+Run this to verify that an interrupted cycle resumes where it stopped
+"""
+
+import os
+import tempfile
+import time
+from itertools import chain
+
+from checkpoint import CycleCheckpoint, prune_checkpoints
+from fake_genai import FakeGenaiClient
+from sentinel_engine import JsonAlertHistory, MonitoringEngine
+
+
+def test_resume_after_crash():
+    """Recorded suppliers are not rescanned; a torn last line is dropped"""
+    print("🧪 Testing cycle checkpoints")
+    workdir = tempfile.mkdtemp(prefix="sentinel-checkpoint-")
+    path = os.path.join(workdir, "cli.jsonl")
+    suppliers = [{"material": f"Graphite {i}", "location": "China"} for i in range(10)]
+    engine = MonitoringEngine(FakeGenaiClient(seed=5, latency_scale=0),
+                              history=JsonAlertHistory(os.path.join(workdir, "alert_history.json")))
+
+    # First process: scans 4 suppliers, then dies halfway through writing the 5th
+    checkpoint = CycleCheckpoint(path)
+    checkpoint.begin(7, suppliers)
+    for idx, _ in enumerate(checkpoint.track(engine.scan(suppliers))):
+        if idx == 3:
+            break
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type":"result","material":"Graph')
+
+    # Second process: resumes cycle 7 with the remaining 6 suppliers
+    checkpoint = CycleCheckpoint(path)
+    assert checkpoint.load(suppliers[:5]) is None  # different supplier list
+    state = checkpoint.load(suppliers)
+    assert state.cycle_id == 7 and len(state.results) == 4
+    todo = state.remaining()
+    assert [item["material"] for item in todo] == [f"Graphite {i}" for i in range(4, 10)]
+    print(f"✅ Resumed cycle #{state.cycle_id} with {len(state.results)} done, {len(todo)} left")
+
+    checkpoint.reopen(state)
+    statuses = [r.status for r in chain(state.results, checkpoint.track(engine.scan(todo)))]
+    checkpoint.finish()
+    assert len(statuses) == 10 and "deferred" not in statuses
+    assert checkpoint.load(suppliers) is None
+    with open(path, "r", encoding="utf-8") as f:
+        assert sum(1 for line in f if '"type":"result"' in line) == 10
+    print("✅ Completed cycle is not resumed again; torn line replaced")
+
+
+def test_session_checkpoints():
+    """Each session has its own file; finished ones are deleted and abandoned ones pruned"""
+    print("🧪 Testing per-session checkpoints")
+    workdir = tempfile.mkdtemp(prefix="sentinel-checkpoint-")
+    mine = CycleCheckpoint(os.path.join(workdir, "streamlit-aaaa.jsonl"))
+    theirs = CycleCheckpoint(os.path.join(workdir, "streamlit-bbbb.jsonl"))
+    mine.begin(1, [{"material": "Tin", "location": "Peru"}], context="my business")
+    theirs.begin(1, [{"material": "Zinc", "location": "Peru"}], context="their business")
+    mine.close()
+    theirs.close()
+    assert mine.load().context == "my business" and theirs.load().context == "their business"
+
+    mine.discard()
+    assert not os.path.exists(mine.path) and mine.load() is None
+    old = time.time() - 7200
+    os.utime(theirs.path, (old, old))
+    cli = CycleCheckpoint(os.path.join(workdir, "cli.jsonl"))
+    cli.begin(1, [])
+    cli.close()
+    assert prune_checkpoints("streamlit-", 3600, directory=workdir) == 1
+    assert os.listdir(workdir) == ["cli.jsonl"]
+    print("✅ Sessions kept apart; finished and stale session files removed, CLI file untouched")
+
+
+if __name__ == "__main__":
+    test_resume_after_crash()
+    test_session_checkpoints()
@@ -0,0 +1,66 @@
+"""
+Test bulk configuration
+Run this to verify concurrent onboarding, description caching and per-row failures
+"""
+
+import json
+import os
+import tempfile
+
+from config_agent import ConfigCache, ConfigurationAgent, read_businesses
+from fake_genai import FakeGenaiClient
+
+
+class FlakyClient(FakeGenaiClient):
+    """Config calls for "bankrupt" businesses always fail"""
+
+    def _generate(self, model, contents, config):
+        if "bankrupt" in str(contents):
+            with self._lock:
+                self.calls["config"] += 1
+            raise RuntimeError("500 INTERNAL")
+        return super()._generate(model, contents, config)
+
+
+def test_bulk_configuration():
+    """Duplicates and cached descriptions cost no model call; failures are reported per row"""
+    print("🧪 Testing bulk configuration")
+    workdir = tempfile.mkdtemp(prefix="sentinel-bulk-")
+    path = os.path.join(workdir, "clients.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,description\n")
+        for i in range(40):
+            f.write(f"c{i},I make electric bikes in plant {i % 10}\n")
+        f.write("dup,\"  I MAKE electric bike in plant 3 \"\n")
+        f.write("bad,A bankrupt shipyard\n")
+        f.write("blank,\n")
+
+    os.environ.setdefault("GEMINI_API_KEY", "test-key")
+    agent = ConfigurationAgent()
+    agent.client = FlakyClient(seed=1, latency_scale=0)
+    cache = ConfigCache(os.path.join(workdir, "cache.jsonl"))
+    records = list(agent.generate_bulk(read_businesses(path), workers=4, cache=cache, retries=0))
+
+    assert sorted(r["row"] for r in records) == list(range(1, 44))
+    errors = {r["id"]: r["error"] for r in records if r["error"]}
+    assert set(errors) == {"bad", "blank"} and "500" in errors["bad"]
+    assert agent.client.calls["config"] == 11  # 10 distinct plants + the failing row
+    assert all(r["suppliers"][0]["location"] == "Chile" for r in records if not r["error"])
+    print(f"✅ {len(records)} rows, {agent.client.calls['config']} model calls, errors: {sorted(errors)}")
+
+    # A second run is served from the cache; only the failed row is retried
+    agent.client = FlakyClient(seed=1, latency_scale=0)
+    rerun = list(agent.generate_bulk(read_businesses(path), workers=4, cache=ConfigCache(cache.path), retries=0))
+    assert agent.client.calls["config"] == 1 and sum(r["cached"] for r in rerun) == 41
+    print("✅ Rerun served 41 rows from the description cache")
+
+    jsonl = os.path.join(workdir, "clients.jsonl")
+    with open(jsonl, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "x", "description": "Coffee roaster in Oslo"}) + "\n{broken\n")
+    rows = list(read_businesses(jsonl))
+    assert rows[0]["id"] == "x" and rows[1]["error"].startswith("invalid JSON")
+    print("✅ JSONL input read, malformed line reported")
+
+
+if __name__ == "__main__":
+    test_bulk_configuration()
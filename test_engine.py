@@ -0,0 +1,108 @@
+"""
+Test the shared monitoring engine
+Run this to verify the retry-on-zero path, alert dedup and async scanning
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+from fake_genai import FakeResponse, FakeUsage
+from sentinel_engine import EngineCallbacks, JsonAlertHistory, MonitoringEngine, TTLCache
+
+
+class ScriptedClient:
+    """Lithium finds nothing until the broader search; Cobalt is always critical"""
+
+    def __init__(self):
+        self.models = self
+        self.prompts = []
+
+    def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents)
+        if "CONTEXT:" not in contents:
+            news = "" if "from Chile" in contents else "Port strike halts shipments"
+            return FakeResponse(news or "Nothing reported", FakeUsage(10, 5))
+        if "Cobalt" in contents:
+            payload = {"risk_score": 8, "reason": "Mine closures", "action_needed": True, "retry_search": False}
+        elif "Port strike" in contents:
+            payload = {"risk_score": 4, "reason": "Strike at export port", "action_needed": False, "retry_search": False}
+        else:
+            payload = {"risk_score": 0, "reason": "No data", "action_needed": False, "retry_search": True}
+        return FakeResponse(json.dumps(payload), FakeUsage(20, 5))
+
+
+class Recorder(EngineCallbacks):
+    def __init__(self):
+        self.stages, self.alerts = [], []
+
+    def on_stage(self, stage, material, location):
+        self.stages.append(stage)
+
+    def on_alert(self, result):
+        self.alerts.append(result.material)
+
+
+def test_engine_retry_and_dedup():
+    """Score 0 triggers one broader search; critical alerts are remembered for the day"""
+    print("🧪 Testing monitoring engine")
+    history = JsonAlertHistory(os.path.join(tempfile.mkdtemp(), "alert_history.json"))
+    callbacks = Recorder()
+    engine = MonitoringEngine(ScriptedClient(), history=history, callbacks=callbacks)
+
+    result = engine.check_item("Lithium", "Chile")
+    assert callbacks.stages == ["watchman", "analyst", "watchman_retry", "analyst", "dispatcher"]
+    assert result.status == "safe" and result.score == 4
+    print("✅ Zero score retried with material-only search")
+
+    results = list(engine.scan([{"material": "Cobalt", "location": "DRC"}] * 2))
+    assert [r.status for r in results] == ["critical", "skipped"]
+    assert callbacks.alerts == ["Cobalt"] and len(JsonAlertHistory(history.path)) == 1
+    print("✅ Critical alert dispatched once and persisted")
+
+
+def test_engine_typed_results():
+    """News mentioning "error" is still analysed; a failed search is reported, not scored"""
+    class Client(ScriptedClient):
+        def generate_content(self, model, contents, config=None):
+            if "Tin" in contents and "CONTEXT:" not in contents:
+                raise RuntimeError("503 UNAVAILABLE")
+            if "CONTEXT:" not in contents:
+                return FakeResponse("Customs system error delays Copper exports", FakeUsage(10, 5))
+            return super().generate_content(model, contents, config)
+
+    engine = MonitoringEngine(Client(), history=JsonAlertHistory(os.path.join(tempfile.mkdtemp(), "h.json")))
+    search = engine.watchman("Copper", "Peru")
+    assert search.ok and search.status == "ok" and "error" in search.text
+    assessment = engine.analyst("Copper", "Peru", search)
+    assert assessment.ok and assessment.wants_retry
+    print(f"✅ {search!r} analysed: {assessment!r}")
+
+    outcome = engine.check_item("Tin", "Myanmar")
+    assert outcome.status == "skipped" and outcome.score is None
+    assert outcome.as_dict()["message"].startswith("No data")
+    print(f"✅ Failed search surfaced as {outcome!r}")
+
+
+def test_engine_async_scan_and_cache():
+    """scan_async keeps priority order; the cache serves repeated searches"""
+    client = ScriptedClient()
+    engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(tempfile.mkdtemp(), "h.json")),
+                              cache=TTLCache(ttl=60), events=False)
+    suppliers = [{"material": f"Nickel {i}", "location": "Indonesia", "priority": "high" if i == 3 else "normal"}
+                 for i in range(5)]
+    results = asyncio.run(engine.scan_async(suppliers, concurrency=3))
+    assert [r.material for r in results] == ["Nickel 3", "Nickel 0", "Nickel 1", "Nickel 2", "Nickel 4"]
+    assert all(r.status == "safe" for r in results)
+    calls = len(client.prompts)
+
+    engine.check_item("Nickel 0", "Indonesia")
+    assert len(client.prompts) == calls + 1  # analyst only; search served from cache
+    print(f"✅ Async scan of {len(results)} suppliers, cached search reused")
+
+
+if __name__ == "__main__":
+    test_engine_retry_and_dedup()
+    test_engine_typed_results()
+    test_engine_async_scan_and_cache()
@@ -0,0 +1,121 @@
+"""
+Test event clustering
+Run this to verify that one disruption is analyzed once across suppliers
+"""
+
+import os
+import tempfile
+
+from event_store import EventStore, extract_events
+from fake_genai import FakeGenaiClient, FakeResponse, FakeUsage
+from normalize import Normalizer
+from sentinel_engine import JsonAlertHistory, MonitoringEngine
+
+
+def test_extract_and_index():
+    """Events get a type, place, date and source; repeats merge; the index respects scope"""
+    print("🧪 Testing event extraction")
+    text = ("Typhoon Koinu made landfall in Taiwan on Oct 5, closing ports (Reuters).\n"
+            "Authorities announced an export ban on gallium.\n"
+            "No strikes were reported at the smelters.")
+    events = {e.type: e for e in extract_events(text, "Gallium", "China")}
+    assert set(events) == {"weather", "trade"}  # the negated strike is not an event
+    weather = events["weather"]
+    assert (weather.place, weather.commodity, weather.date, weather.sources) == ("Taiwan", None, "Oct 5", {"Reuters"})
+    assert (events["trade"].place, events["trade"].commodity) == ("China", "Gallium")
+    assert [e.type for e in extract_events("Shortages pushed prices up.", "Neon", "Ukraine")] == ["supply"]
+    assert extract_events("Dockworkers went on strike, causing backlogs.", "Tin", "Peru")[0].type == "labor"
+    print(f"✅ Extracted {sorted(events)} with place, date and source")
+
+    store = EventStore(normalizer=Normalizer())
+    store.observe("The port workers' strike at Antofagasta entered its third day.", "Copper", "Chile")
+    store.observe("Port workers' strike at Antofagasta entered a third day. Source: bloomberg.com", "Lithium", "Chile")
+    store.observe("Copper export ban announced.", "Copper", "Chile")
+    assert len(store) == 2
+    labor = store.events["labor:Chile:*:?"]
+    assert labor.suppliers == {("Copper", "Chile"), ("Lithium", "Chile")} and labor.sources == {"bloomberg.com"}
+    assert {e.type for e in store.affecting("Lithium", "Chile")} == {"labor"}
+    assert {e.type for e in store.affecting("Copper", "Chile")} == {"labor", "trade"}
+    assert store.affecting("Copper", "Peru") == []
+    print("✅ Repeated strike merged; the export ban only affects Copper")
+
+
+def test_engine_reuses_event_assessments():
+    """Suppliers whose searches report the same disruption cost one analyst call"""
+    suppliers = [{"material": f"Nickel {i}", "location": "Indonesia"} for i in range(20)]
+
+    def run(events):
+        workdir = tempfile.mkdtemp(prefix="sentinel-events-")
+        client = FakeGenaiClient(seed=4, latency_scale=0, critical_rate=1.0, zero_rate=0.0)
+        engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "h.json")),
+                                  normalizer=Normalizer(), events=events)
+        return [r.status for r in engine.scan(suppliers)], client.calls
+
+    baseline, baseline_calls = run(False)
+    statuses, calls = run(EventStore(normalizer=Normalizer()))
+    assert statuses.count("critical") == len(suppliers)  # every search reported the same strike
+    assert calls["analyst"] <= 2 and calls["watchman"] == baseline_calls["watchman"]
+    print(f"✅ {len(suppliers)} suppliers: {calls['watchman'] + calls['analyst']} model calls "
+          f"instead of {baseline_calls['watchman'] + baseline_calls['analyst']} "
+          f"({baseline.count('critical')} critical without clustering)")
+
+
+MINE_STRIKE = "Workers at the Escondida copper mine went on strike on Oct 3, halting output. (Reuters)"
+MINOR_STRIKE = "A brief strike by port truckers in Antofagasta ended on Oct 1 with minimal delays."
+
+
+class ScriptedClient:
+    """Watchman text and analyst score per material"""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = {"watchman": 0, "analyst": 0}
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        kind = "watchman" if getattr(config, "tools", None) else "analyst"
+        self.calls[kind] += 1
+        material = next(m for m in self.script if m in contents)
+        text, score = self.script[material]
+        if kind == "analyst":
+            text = f'{{"risk_score": {score}, "reason": "Scripted.", "action_needed": {str(score >= 7).lower()}}}'
+        return FakeResponse(text, FakeUsage(100, 20))
+
+
+def test_distinct_strikes_keep_their_own_verdicts():
+    """A strike elsewhere in the country neither raises nor masks another supplier's alert"""
+    print("🧪 Testing distinct events in one country")
+    for order in (("Copper", "Lithium", "Iodine"), ("Lithium", "Copper", "Iodine")):
+        client = ScriptedClient({"Copper": (MINE_STRIKE, 9), "Lithium": (MINOR_STRIKE, 1), "Iodine": (MINOR_STRIKE, 1)})
+        workdir = tempfile.mkdtemp(prefix="sentinel-events-")
+        engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "h.json")),
+                                  normalizer=Normalizer(), events=EventStore(normalizer=Normalizer()),
+                                  prefilter=False, retry_on_zero=False)
+        statuses = {r.material: r.status for r in engine.scan([{"material": m, "location": "Chile"} for m in order])}
+        assert statuses == {"Copper": "critical", "Lithium": "safe", "Iodine": "safe"}, (order, statuses)
+        assert client.calls["watchman"] == 3 and client.calls["analyst"] == 2  # Iodine reuses the minor strike
+    print("✅ Mine strike critical and trucker strike safe, in either order; only the same story is reused")
+
+
+def test_mixed_text_verdict_not_shared():
+    """A verdict for a text with several events is not reused by a supplier that saw only one of them"""
+    print("🧪 Testing verdicts of mixed-event texts")
+    mixed = MINOR_STRIKE + " The government announced an export ban on copper concentrate."
+    for order in (("Copper", "Lithium"), ("Lithium", "Copper")):
+        client = ScriptedClient({"Copper": (mixed, 9), "Lithium": (MINOR_STRIKE, 1)})
+        workdir = tempfile.mkdtemp(prefix="sentinel-events-")
+        store = EventStore(normalizer=Normalizer())
+        engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "h.json")),
+                                  normalizer=Normalizer(), events=store, prefilter=False, retry_on_zero=False)
+        results = {r.material: r for r in engine.scan([{"material": m, "location": "Chile"} for m in order])}
+        assert results["Copper"].status == "critical" and results["Lithium"].status == "safe", order
+        assert results["Lithium"].score == 1 and client.calls["analyst"] == 2
+        assert all(event.assessment is None or event.assessment.score == 1 for event in store.events.values())
+    print("✅ Copper's export ban scored 9, Lithium's strike scored on its own")
+
+
+if __name__ == "__main__":
+    test_extract_and_index()
+    test_engine_reuses_event_assessments()
+    test_distinct_strikes_keep_their_own_verdicts()
+    test_mixed_text_verdict_not_shared()
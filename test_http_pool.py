@@ -0,0 +1,90 @@
+"""
+Test the shared HTTP connection pool
+Run this to verify connections are kept alive and reused, and that agents share one model client
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import http_pool
+from http_pool import HttpPool, genai_client, pool_stats
+
+REPLY = {"candidates": [{"content": {"role": "model", "parts": [{"text": "RISK_SCORE: 3"}]}, "finishReason": "STOP"}],
+         "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(REPLY).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def _server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_connection_reuse():
+    """Concurrent requests stay within the pool and reuse its connections"""
+    print("🧪 Testing connection reuse")
+    server, url = _server()
+    pool = HttpPool(max_connections=4, keepalive=60, http2=False)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(lambda i: pool.client.post(url, json={"i": i}).status_code, range(40)))
+        assert statuses == [200] * 40
+        stats = pool.stats()
+        assert stats["requests"] == 40 and 1 <= stats["connections"] <= 4
+        assert stats["reused"] == 40 - stats["connections"] and stats["reuse_ratio"] >= 0.9
+        print(f"✅ 40 requests over {stats['connections']} connections ({stats['reuse_ratio']:.0%} reused)")
+    finally:
+        pool.close()
+        server.shutdown()
+
+
+def test_shared_client():
+    """Every agent gets the same client per key, and its calls go through the shared pool"""
+    print("🧪 Testing shared model client")
+    server, url = _server()
+    saved = http_pool._pool, dict(http_pool._clients), os.environ.get("GOOGLE_GEMINI_BASE_URL")
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = url
+    http_pool._pool, http_pool._clients = HttpPool(max_connections=2, http2=False), {}
+    try:
+        client = genai_client("test-key")
+        assert genai_client("test-key") is client and genai_client("other-key") is not client
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            replies = list(executor.map(lambda i: genai_client("test-key").models.generate_content(
+                model="gemini-2.5-flash", contents=f"call {i}").text, range(12)))
+        assert replies == ["RISK_SCORE: 3"] * 12
+        stats = pool_stats()
+        assert stats["requests"] == 12 and stats["connections"] <= 2
+        print(f"✅ One client per key; 12 model calls over {stats['connections']} connections")
+    finally:
+        http_pool._pool.close()
+        http_pool._pool, http_pool._clients = saved[0], saved[1]
+        if saved[2] is None:
+            os.environ.pop("GOOGLE_GEMINI_BASE_URL", None)
+        else:
+            os.environ["GOOGLE_GEMINI_BASE_URL"] = saved[2]
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_connection_reuse()
+    test_shared_client()
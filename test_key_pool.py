@@ -0,0 +1,94 @@
+"""
+Test the API key pool
+Run this to verify calls follow each key's remaining quota and bad keys are taken out of rotation
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_genai import FakeAPIError, FakeGenaiClient
+from key_pool import KeyPool, NoUsableKey, split_keys
+from normalize import Normalizer
+from sentinel_engine import JsonAlertHistory, MonitoringEngine
+
+
+class RejectedClient(FakeGenaiClient):
+    """A key the API refuses"""
+
+    def _generate(self, model, contents, config):
+        with self._lock:
+            self.calls["analyst"] += 1
+        raise FakeAPIError(400, "INVALID_ARGUMENT", "API key not valid. Please pass a valid API key. [API_KEY_INVALID]")
+
+
+def _call(pool, i=0):
+    return pool.models.generate_content(model="gemini-2.5-flash", contents=f"score {i}").text
+
+
+def test_split_keys():
+    print("🧪 Testing key parsing")
+    assert split_keys(" key-a, key-b,,key-a ") == ["key-a", "key-b"]
+    assert split_keys(None) == [] and split_keys("single") == ["single"]
+    print("✅ Blanks and repeated keys dropped")
+
+
+def test_schedules_by_remaining_quota():
+    """A key with three times the quota takes three times the calls, and none exceeds its quota"""
+    print("🧪 Testing quota-aware scheduling")
+    small, large = FakeGenaiClient(seed=1, latency_scale=0), FakeGenaiClient(seed=2, latency_scale=0)
+    pool = KeyPool([("small", small), ("large", large)], rpm=[5, 15])
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: _call(pool, i), range(20)))
+    assert small.calls["analyst"] == 5 and large.calls["analyst"] == 15
+    stats = {row["key"]: row for row in pool.stats()}
+    assert stats["small"]["utilization"] == 1.0 and stats["large"]["state"] == "saturated"
+    print("✅ 20 calls split 5/15 across quotas of 5 and 15 per minute")
+
+
+def test_drains_throttled_and_rejected_keys():
+    print("🧪 Testing key draining")
+    throttled = FakeGenaiClient(seed=3, latency_scale=0, rate_429=1.0)
+    rejected = RejectedClient(seed=4, latency_scale=0)
+    healthy = FakeGenaiClient(seed=5, latency_scale=0)
+    pool = KeyPool([("throttled", throttled), ("rejected", rejected), ("healthy", healthy)], cooldown=60)
+    replies = [_call(pool, i) for i in range(9)]
+    assert len(replies) == 9 and all(replies)
+    assert throttled.throttled == 1 and rejected.calls["analyst"] == 1 and healthy.calls["analyst"] >= 7
+    stats = {row["key"]: row for row in pool.stats()}
+    assert stats["throttled"]["state"] == "throttled" and stats["throttled"]["back_in_s"] > 50
+    assert stats["rejected"]["state"] == "rejected" and stats["healthy"]["state"] == "active"
+    print(f"✅ Throttled and rejected keys each tried once; healthy key served {healthy.calls['analyst']} calls")
+
+    pool = KeyPool([("a", RejectedClient()), ("b", RejectedClient())])
+    try:
+        _call(pool)
+        _call(pool)
+        raise AssertionError("expected the pool to give up")
+    except (FakeAPIError, NoUsableKey):
+        pass
+    assert all(row["state"] == "rejected" for row in pool.stats())
+    print("✅ A pool whose keys are all rejected fails instead of waiting")
+
+
+def test_engine_spreads_scan():
+    """A whole scan through the engine is spread evenly over keys of equal quota"""
+    print("🧪 Testing scan across keys")
+    clients = [FakeGenaiClient(seed=seed, latency_scale=0) for seed in range(3)]
+    pool = KeyPool([(f"key{i}", client) for i, client in enumerate(clients)])
+    workdir = tempfile.mkdtemp(prefix="sentinel-keys-")
+    engine = MonitoringEngine(pool, history=JsonAlertHistory(os.path.join(workdir, "history.json")),
+                              normalizer=Normalizer(), events=False, prefilter=False)
+    suppliers = [{"material": f"Material {i}", "location": f"Country {i}"} for i in range(30)]
+    results = list(engine.scan(suppliers))
+    calls = [sum(client.calls.values()) for client in clients]
+    assert len(results) == 30 and all(result.status in ("critical", "safe") for result in results)
+    assert max(calls) - min(calls) <= 1
+    print(f"✅ 30 suppliers scanned with calls split {calls}")
+
+
+if __name__ == "__main__":
+    test_split_keys()
+    test_schedules_by_remaining_quota()
+    test_drains_throttled_and_rejected_keys()
+    test_engine_spreads_scan()
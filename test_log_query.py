@@ -0,0 +1,90 @@
+"""
+Test the time-indexed log query tool
+Run this to verify index building, incremental updates and filtering
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import log_query
+from log_query import query_logs, refresh_indexes
+
+AGENTS = ["Config", "Watchman", "Analyst", "Dispatcher"]
+LEVELS = ["DEBUG", "INFO", "WARNING", "CRITICAL"]
+MATERIALS = ["Cobalt", "Lithium", "Steel", "Rare Earths"]
+
+
+def _write_records(path, start, count, step_seconds=7):
+    """Write `count` synthetic records and return them as (timestamp, level, agent, message)"""
+    records = []
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(count):
+            ts = (start + timedelta(seconds=i * step_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+            level, agent, material = LEVELS[i % 4], AGENTS[i % 3], MATERIALS[i % 4]
+            message = f"Risk score computed: {i % 10}/10 for {material} in Chile"
+            f.write(f"{ts} [{level}] [Agent.{agent}] — {message}\n")
+            if i % 50 == 0:
+                f.write("Traceback (most recent call last):\n  ValueError: synthetic\n")
+            records.append((ts, level, agent, message))
+    return records
+
+
+def _brute_force(records, since, until, agent=None, contains=None):
+    return [r for r in records
+            if since <= r[0] <= until
+            and (agent is None or r[2] == agent)
+            and (contains is None or contains.lower() in r[3].lower())]
+
+
+def test_query_rotated_logs():
+    """Index-backed queries match a full scan across rotated files"""
+    print("🧪 Testing log query tool")
+    logs_dir = tempfile.mkdtemp(prefix="sentinel-logs-")
+    original_stride = log_query.INDEX_STRIDE
+    log_query.INDEX_STRIDE = 2048  # many index entries on small files
+    try:
+        base = os.path.join(logs_dir, "supplysentinel.log")
+        start = datetime(2025, 11, 18, 8, 0, 0)
+        records = []
+        # .2 is oldest, then .1, then the active file
+        for suffix, offset_hours in ((".2", 0), (".1", 6), ("", 12)):
+            records += _write_records(base + suffix, start + timedelta(hours=offset_hours), 2000)
+
+        since, until = "2025-11-18 15:00:00", "2025-11-18 17:30:00"
+        found = list(query_logs(since, until, agent="Analyst", contains="cobalt", logs_dir=logs_dir))
+        expected = _brute_force(records, since, until, agent="Analyst", contains="cobalt")
+        assert [(r["timestamp"], r["message"]) for r in found] == [(e[0], e[3]) for e in expected]
+        assert len(expected) > 0
+        print(f"✅ Range + agent + substring query returned {len(found)} records")
+
+        warnings = list(query_logs(level="WARNING", logs_dir=logs_dir))
+        assert all(r["level"] in ("WARNING", "CRITICAL") for r in warnings)
+        assert len(warnings) == len([r for r in records if r[1] in ("WARNING", "CRITICAL")])
+        assert any("ValueError: synthetic" in r["text"] for r in list(query_logs(logs_dir=logs_dir, limit=1)))
+        print("✅ Level filter and traceback continuation lines")
+
+        # Appending to the active file extends its index instead of rebuilding it
+        index_before = refresh_indexes(logs_dir)[-1]
+        entries_before = len(index_before.offsets)
+        records += _write_records(base, datetime(2025, 11, 19, 9, 0, 0), 500)
+        index_after = refresh_indexes(logs_dir)[-1]
+        assert index_after.offsets[:entries_before] == index_before.offsets
+        assert index_after.last_ts == records[-1][0]
+        late = list(query_logs(since="2025-11-19 09:00:00", logs_dir=logs_dir))
+        assert len(late) == 500
+        print("✅ Incremental index update after append")
+
+        # Rotation renames files; indexes follow the file identity, not the name
+        os.rename(base + ".2", base + ".3")
+        os.rename(base + ".1", base + ".2")
+        os.rename(base, base + ".1")
+        found_after_rotation = list(query_logs(since, until, agent="Analyst", contains="cobalt", logs_dir=logs_dir))
+        assert [r["timestamp"] for r in found_after_rotation] == [r["timestamp"] for r in found]
+        print("✅ Indexes survive rotation")
+    finally:
+        log_query.INDEX_STRIDE = original_stride
+
+
+if __name__ == "__main__":
+    test_query_rotated_logs()
@@ -3,8 +3,12 @@ Test logging configuration for SupplySentinel
 Run this to verify logging setup works correctly
 """
 
-from logging_config import setup_logging, config_logger, watchman_logger, analyst_logger, dispatcher_logger
+from logging_config import setup_logging, shutdown_logging, log_context, get_recent_logs, clear_log_buffer, config_logger, watchman_logger, analyst_logger, dispatcher_logger
+import logging_config
+import json
+import logging
 import os
+import tempfile
 
 def test_logging_setup():
     """Test basic logging configuration"""
@@ -61,5 +65,58 @@ def test_logging_setup():
     print("🎉 All logging tests completed!")
     print("=" * 60)
 
+def test_queue_logging_flush():
+    """Records queued for the background listener must reach the file on shutdown"""
+    print("=" * 60)
+    print("TEST 3: Queue Mode (background listener)")
+    print("=" * 60)
+    original_logs_dir = logging_config.LOGS_DIR
+    logging_config.LOGS_DIR = tempfile.mkdtemp(prefix="sentinel-test-")
+    try:
+        setup_logging(environment="cli", use_queue=True)
+        for i in range(200):
+            watchman_logger.debug("Initiating search for %s in %s", f"Material{i}", "Chile")
+        shutdown_logging()
+        
+        log_file = os.path.join(logging_config.LOGS_DIR, "supplysentinel.log")
+        with open(log_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        assert len(lines) == 200, f"expected 200 queued records, found {len(lines)}"
+        assert "Initiating search for Material199 in Chile" in lines[-1]
+        print(f"✅ Queue mode flushed {len(lines)} records on shutdown")
+    finally:
+        shutdown_logging()
+        logging_config.LOGS_DIR = original_logs_dir
+
+def test_structured_records():
+    """Structured fields reach the in-memory buffer and the JSON-lines file"""
+    print("=" * 60)
+    print("TEST 4: Structured Records (LogEntry + JSON lines)")
+    print("=" * 60)
+    original_logs_dir = logging_config.LOGS_DIR
+    logging_config.LOGS_DIR = tempfile.mkdtemp(prefix="sentinel-test-")
+    try:
+        setup_logging(environment="streamlit", json_logs=True)
+        clear_log_buffer()
+        analyst_logger.critical("Risk score computed: %s/10 — CRITICAL threat level for %s in %s", 9, "Cobalt", "DRC",
+                                extra=log_context("analyst", "Cobalt", "DRC", score=9, latency_ms=812.34))
+        
+        entry = get_recent_logs(limit=1)[0]
+        assert entry._message is None, "message should not be rendered until read"
+        assert entry.message == "Risk score computed: 9/10 — CRITICAL threat level for Cobalt in DRC"
+        assert (entry.agent, entry.material, entry.location, entry.score, entry.stage) == ("Analyst", "Cobalt", "DRC", 9, "analyst")
+        assert not hasattr(entry, "__dict__")
+        
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        with open(os.path.join(logging_config.LOGS_DIR, "supplysentinel.jsonl"), encoding="utf-8") as f:
+            record = json.loads(f.readlines()[-1])
+        assert record["agent"] == "Analyst" and record["score"] == 9 and record["latency_ms"] == 812.3
+        print("✅ Structured fields captured in buffer and JSON lines")
+    finally:
+        logging_config.LOGS_DIR = original_logs_dir
+
 if __name__ == "__main__":
     test_logging_setup()
+    test_queue_logging_flush()
+    test_structured_records()
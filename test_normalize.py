@@ -0,0 +1,97 @@
+"""
+Test material/location normalization
+Run this to verify that spelling variants share one supplier key
+"""
+
+import os
+import tempfile
+
+from fake_genai import FakeGenaiClient
+from normalize import Normalizer, fold
+from sentinel_engine import JsonAlertHistory, MonitoringEngine, TTLCache
+
+
+def test_aliases_and_fuzzy_matching():
+    """Aliases, accents, plurals and typos collapse; near-miss countries do not"""
+    print("🧪 Testing name normalization")
+    normalizer = Normalizer()
+    for variant in ("DRC", "Democratic Republic of Congo", "Congo (Kinshasa)", "congo-kinshasa"):
+        assert normalizer.location(variant) == "Democratic Republic of the Congo", variant
+    assert normalizer.location("Cote d’Ivoire") == normalizer.location("Ivory Coast") == "Côte d'Ivoire"
+    assert normalizer.material("rare earth elements") == normalizer.material("Rare-Earths") == "Rare Earths"
+    assert fold("  Rare-EARTHS ") == "rare earth"
+    print("✅ Aliases, accents and plurals folded")
+
+    assert normalizer.location("Indonseia") == "Indonesia" and normalizer.material("Coppper") == "Copper"
+    assert normalizer.location("Austria") == "Austria" and normalizer.location("Niger") == "Niger"
+    assert normalizer.material("Lithium lot 12") != normalizer.material("Lithium lot 13")
+    print("✅ Typos matched; Austria/Australia, Niger/Nigeria and numbered lots kept apart")
+
+    # Unknown names are learned: a later variant maps onto the first spelling
+    assert normalizer.material("Solar Glass") == "Solar Glass"
+    assert normalizer.material("solar  glasses") == "Solar Glass"
+    suppliers = normalizer.suppliers([
+        {"material": "Cobalt", "location": "DRC"},
+        {"material": "cobalt", "location": "Democratic Republic of Congo", "priority": "high"},
+        {"material": "Lithium", "location": "Chile"},
+    ])
+    assert suppliers == [{"material": "Cobalt", "location": "Democratic Republic of the Congo", "priority": "high"},
+                         {"material": "Lithium", "location": "Chile"}]
+    print(f"✅ Supplier list merged to {len(suppliers)} entries")
+
+    # Bare words that name more than one thing stay as given
+    assert normalizer.location("Korea") == "Korea" and normalizer.material("Gas") == "Gas"
+    assert normalizer.material("Oil") == "Oil" and normalizer.material("Iron") == "Iron"
+    print("✅ Korea, Oil, Gas and Iron left ambiguous")
+
+
+def test_near_misses_stay_apart():
+    """Distinct real names never fuzz into each other, whichever is seen first"""
+    print("🧪 Testing near-miss names")
+    pairs = (("location", "Iceland", "Ireland"), ("location", "Gambia", "Zambia"), ("location", "Slovakia", "Slovenia"),
+             ("location", "Malawi", "Mali"), ("material", "Silicon", "Silicone"), ("material", "Polysilicon", "Polysilicone"))
+    for kind, first, second in pairs:
+        for order in ((first, second), (second, first)):
+            lookup = getattr(Normalizer(), kind)
+            assert [lookup(name) for name in order] == list(order), order
+    print("✅ Ireland/Iceland, Silicone/Silicon and neighbours kept apart in either order")
+
+    # Learned names are matched exactly, never fuzzily
+    normalizer = Normalizer()
+    assert normalizer.material("Widget Housing") == "Widget Housing"
+    assert normalizer.material("Widget Housings") == "Widget Housing"  # plural folds, not fuzz
+    assert normalizer.material("Widget Housinj") == "Widget Housinj"
+    assert normalizer.location("Congo (Brazzaville)") == "Republic of the Congo" != normalizer.location("DRC")
+    print("✅ Learned names matched exactly; both Congos distinct")
+
+
+def test_learned_names_are_bounded():
+    print("🧪 Testing learned-name cap")
+    normalizer = Normalizer()
+    normalizer.materials.max_learned = 100
+    for i in range(1000):
+        normalizer.material(f"Custom Part {i}")
+    assert len(normalizer.materials._learned) == 100
+    assert normalizer.material("Cobalt ore") == "Cobalt" and normalizer.material("Coppper") == "Copper"
+    assert normalizer.material("Custom Part 999") == "Custom Part 999"
+    print("✅ 1000 new names learned, 100 kept; built-in aliases untouched")
+
+
+def test_engine_keys_are_canonical():
+    """Variants share the search cache and the alert id"""
+    workdir = tempfile.mkdtemp(prefix="sentinel-normalize-")
+    client = FakeGenaiClient(seed=1, latency_scale=0, critical_rate=1.0, zero_rate=0.0)
+    engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "h.json")),
+                              cache=TTLCache(ttl=60), normalizer=Normalizer())
+    first = engine.check_item("Cobalt", "DRC")
+    second = engine.check_item("cobalt", "Congo (Kinshasa)")
+    assert first.status == "critical" and first.location == "Democratic Republic of the Congo"
+    assert second.status == "skipped" and client.calls["watchman"] == 1
+    print("✅ Second spelling deduplicated against the first alert")
+
+
+if __name__ == "__main__":
+    test_aliases_and_fuzzy_matching()
+    test_learned_names_are_bounded()
+    test_near_misses_stay_apart()
+    test_engine_keys_are_canonical()
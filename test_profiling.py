@@ -0,0 +1,44 @@
+"""
+Test cycle profiling
+Run this to verify one profiled cycle at a time and that an aborted run turns profiling off
+"""
+
+import os
+import tempfile
+import tracemalloc
+
+from profiling import CycleProfiler, ProfilerBusy
+
+
+def test_one_profiler_at_a_time():
+    print("🧪 Testing profiler guard")
+    out_dir = tempfile.mkdtemp(prefix="sentinel-profile-")
+    first = CycleProfiler("first", out_dir=out_dir).start()
+    try:
+        CycleProfiler("second", out_dir=out_dir).start()
+        raise AssertionError("a second profiler started while the first was running")
+    except ProfilerBusy:
+        pass
+
+    # An aborted run (rerun, stop, error) cancels instead of stopping: nothing written, everything off
+    try:
+        try:
+            sum(range(1000))
+            raise RuntimeError("scan interrupted")
+        finally:
+            first.cancel()
+    except RuntimeError:
+        pass
+    assert not first.running and not tracemalloc.is_tracing() and os.listdir(out_dir) == []
+    print("✅ Second profiler refused; cancelled run left nothing running")
+
+    profiler = CycleProfiler("again", out_dir=out_dir).start()
+    prof_path, summary_path = profiler.stop()
+    profiler.cancel()  # no-op after stop()
+    assert os.path.exists(prof_path) and "Top" in open(summary_path, encoding="utf-8").read()
+    assert not tracemalloc.is_tracing()
+    print("✅ Next run profiled normally")
+
+
+if __name__ == "__main__":
+    test_one_profiler_at_a_time()
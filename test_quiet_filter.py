@@ -0,0 +1,68 @@
+"""
+Test the quiet-news pre-filter
+Run this to verify verdicts, analyst short-circuiting and the cassette evaluation
+"""
+
+import os
+import tempfile
+
+from cassette import Cassette, RecordingClient, ReplayClient
+from eval_quiet_filter import analyst_decisions, evaluate
+from fake_genai import FakeGenaiClient
+from quiet_filter import ALARMING, AMBIGUOUS, QUIET, QuietFilter
+from sentinel_engine import JsonAlertHistory, MonitoringEngine
+
+
+def test_verdicts():
+    """Quiet only when every claim is; a contrast, severe term or unexplained claim is not"""
+    print("🧪 Testing quiet filter verdicts")
+    quiet_filter = QuietFilter()
+    cases = {
+        "No significant disruptions were reported. Exports remain normal.": QUIET,
+        "No strikes, closures or shortages were reported this week.": QUIET,
+        "No delays reported, but a strike began at the main port.": ALARMING,
+        "A typhoon forced the terminal to close.": ALARMING,
+        "Customs system error delays some shipments.": AMBIGUOUS,
+        "Copper prices rose on strong demand.": AMBIGUOUS,
+        "No strikes reported. A mine collapse at Escondida has stopped production indefinitely.": AMBIGUOUS,
+        "no export ban yet, though the government announced output will be cut by 40%": AMBIGUOUS,
+        "No significant disruptions were reported; the smelter is operating at half capacity.": AMBIGUOUS,
+        "No significant disruptions were reported in the last 7 days.\nSource: Reuters": QUIET,
+    }
+    for text, expected in cases.items():
+        assert quiet_filter.classify(text) == expected, (text, quiet_filter.classify(text))
+    print(f"✅ {len(cases)} verdicts as expected")
+
+
+def test_engine_and_evaluation():
+    """Quiet news skips the analyst; recorded decisions score the filter"""
+    workdir = tempfile.mkdtemp(prefix="sentinel-quiet-")
+    cassette = Cassette(os.path.join(workdir, "run.jsonl"))
+    suppliers = [{"material": f"Nickel {i}", "location": "Indonesia"} for i in range(40)]
+
+    # Record a cycle with the filter off: every search result gets an analyst decision
+    client = RecordingClient(FakeGenaiClient(seed=3, latency_scale=0), cassette)
+    engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "a.json")), prefilter=False,
+                              events=False)
+    baseline = [r.status for r in engine.scan(suppliers)]
+    cassette.close()
+
+    report = evaluate(analyst_decisions([cassette.path]))
+    assert report["precision"] == 1.0 and report["recall"] == 1.0 and report["missed_alerts"] == 0
+    print(f"✅ Precision/recall 100% on {report['decisions']} recorded decisions, "
+          f"{report['calls_saved_pct']:.0f}% of analyst calls avoidable")
+
+    # Replay the same cycle with the filter on: same outcomes, fewer model calls
+    replay = ReplayClient(Cassette(cassette.path), latency_scale=0)
+    engine = MonitoringEngine(replay, history=JsonAlertHistory(os.path.join(workdir, "b.json")), prefilter=QuietFilter(),
+                              events=False)
+    filtered = [r.status for r in engine.scan(suppliers)]
+    recorded = sum(client._client.calls.values())
+    assert filtered == baseline and replay.misses == 0
+    assert replay.hits < recorded
+    print(f"✅ Same outcomes with {replay.hits} model calls instead of {recorded}")
+
+
+if __name__ == "__main__":
+    test_verdicts()
+    test_engine_and_evaluation()
@@ -0,0 +1,61 @@
+"""
+Test the large-catalog results view
+Run this to verify filtering, sorting, pagination and per-country/material aggregation
+"""
+
+from results_catalog import ResultsCatalog, group_counts, paginate
+from sentinel_engine import DispatchOutcome
+
+
+def _outcomes(n):
+    statuses = ["critical", "safe", "safe", "skipped"]
+    outcomes = []
+    for i in range(n):
+        status = statuses[i % 4]
+        score = None if status == "skipped" else (7 + i // 4 % 4 if status == "critical" else i % 7)
+        outcomes.append(DispatchOutcome(f"Material {i % 30}", f"Country {i % 12}", status, score,
+                                        reason="reason" if score is not None else None))
+    return outcomes
+
+
+def test_query_and_paginate():
+    """Filters combine, sorting is stable, pages cover every row once"""
+    print("🧪 Testing results catalog queries")
+    catalog = ResultsCatalog(_outcomes(2000))
+    assert catalog.counts() == {"critical": 500, "safe": 1000, "skipped": 500}
+
+    rows = catalog.query(statuses=["critical"], text="country 4", min_score=8, sort="score")
+    assert rows and all(r["status"] == "critical" and r["score"] >= 8 and r["location"] == "Country 4" for r in rows)
+    assert [r["score"] for r in rows] == sorted((r["score"] for r in rows), reverse=True)
+
+    by_status = catalog.query(sort="status")
+    assert by_status[0]["status"] == "critical" and by_status[-1]["status"] == "skipped"
+    ascending = catalog.query(sort="score", descending=False)
+    assert ascending[-1]["score"] == 10 and ascending[0]["score"] is None
+
+    seen = []
+    page, pages = 1, None
+    while pages is None or page <= pages:
+        items, page, pages = paginate(rows, page, 25)
+        seen += items
+        page += 1
+    assert seen == rows and paginate(rows, 999, 25)[1] == pages and paginate([], 3, 25) == ([], 1, 1)
+    print(f"✅ {len(rows)} matching rows across {pages} pages; out-of-range pages clamp")
+
+
+def test_aggregate():
+    """Group rows are bounded and ranked most critical first"""
+    print("🧪 Testing results catalog aggregation")
+    catalog = ResultsCatalog(o.as_dict() for o in _outcomes(2000))
+    groups = catalog.aggregate("location", limit=5)
+    assert len(groups) == 5 and sum(g["suppliers"] for g in catalog.aggregate("location", limit=None)) == 2000
+    assert [g["critical"] for g in groups] == sorted((g["critical"] for g in groups), reverse=True)
+    assert all(g["critical"] + g["safe"] + g["other"] == g["suppliers"] and g["max_score"] <= 10 for g in groups)
+    assert len(catalog.aggregate("material")) == 25
+    assert group_counts([{"location": "Chile"}, {"location": "Peru"}, {"location": "Chile"}], "location") == [("Chile", 2), ("Peru", 1)]
+    print("✅ Groups bounded, ranked and consistent with the per-row counts")
+
+
+if __name__ == "__main__":
+    test_query_and_paginate()
+    test_aggregate()
@@ -0,0 +1,160 @@
+"""
+Test the headless scan API
+Run this to verify job submission, paginated results, SSE progress and journal recovery
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import time
+
+from fake_genai import FakeGenaiClient
+from normalize import Normalizer
+from scan_service import JobQueue, start_api_server
+from sentinel_engine import JsonAlertHistory, MonitoringEngine
+
+SUPPLIERS = [{"material": "Lithium", "location": "Chile"}, {"material": "Cobalt", "location": "DRC"},
+             {"material": "Copper", "location": "Peru"}, {"material": "Nickel", "location": "Indonesia"},
+             {"material": "Graphite", "location": "China"}]
+
+
+def _engine(workdir, client):
+    return MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "history.json")),
+                            normalizer=Normalizer(), events=False)
+
+
+def _request(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    conn.close()
+    return response.status, payload
+
+
+def _wait(jobs, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while jobs.get(job_id).status not in ("done", "failed", "cancelled"):
+        assert time.time() < deadline, jobs.get(job_id).summary()
+        time.sleep(0.02)
+    return jobs.get(job_id)
+
+
+def test_api_end_to_end():
+    """Submit over HTTP, page through results, stream progress, reuse recent results"""
+    print("🧪 Testing scan API")
+    workdir = tempfile.mkdtemp(prefix="sentinel-api-")
+    client = FakeGenaiClient(seed=4, latency_scale=0)
+    jobs = JobQueue(_engine(workdir, client), workers=2, journal_path=os.path.join(workdir, "jobs.jsonl"),
+                    configure=lambda description: SUPPLIERS[:3], history=False, normalizer=Normalizer()).start()
+    server = start_api_server(jobs, 0, host="127.0.0.1", token="secret")
+    port = server.server_address[1]
+    try:
+        assert _request(port, "GET", "/jobs")[0] == 401
+        assert _request(port, "POST", "/jobs", {"suppliers": []}, token="secret")[0] == 400
+        assert _request(port, "POST", "/jobs", {"jobs": [{"business": "bikes"}, {"nope": 1}]}, token="secret")[0] == 400
+        assert len(jobs.jobs) == 0
+        for length in ("-1", "ten"):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.putrequest("POST", "/jobs")
+            conn.putheader("Authorization", "Bearer secret")
+            conn.putheader("Content-Length", length)
+            conn.endheaders()
+            assert conn.getresponse().status == 400, length
+            conn.close()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", "/jobs/x/events", headers={"Authorization": "Bearer secret", "Last-Event-ID": "abc"})
+        assert conn.getresponse().status == 400
+        conn.close()
+        try:
+            start_api_server(jobs, 0, host="0.0.0.0", token="")
+            raise AssertionError("served beyond loopback without a token")
+        except ValueError:
+            pass
+        print("✅ Auth enforced; malformed jobs (and batches containing one) and headers rejected")
+
+        status, job = _request(port, "POST", "/jobs", {"suppliers": SUPPLIERS, "reference": "PO-7"}, token="secret")
+        assert status == 202 and job["status"] in ("queued", "running", "done") and job["reference"] == "PO-7"
+        _wait(jobs, job["job_id"])
+
+        status, page = _request(port, "GET", f"/jobs/{job['job_id']}/results?limit=2", token="secret")
+        items = page["items"]
+        while page["next"]:
+            status, page = _request(port, "GET", page["next"], token="secret")
+            items += page["items"]
+        assert page["total"] == len(SUPPLIERS) and len(items) == len(SUPPLIERS)
+        assert {item["material"] for item in items} == {s["material"] for s in SUPPLIERS}
+        summary = _request(port, "GET", f"/jobs/{job['job_id']}", token="secret")[1]
+        assert summary["status"] == "done" and summary["completed"] == 5 and summary["usage"]["calls"] > 0
+        print(f"✅ Job done, {len(items)} results read in pages of 2 ({summary['usage']['calls']} model calls)")
+
+        # A business job maps to suppliers scored moments ago: served without new searches
+        searches = client.calls["watchman"]
+        status, batch = _request(port, "POST", "/jobs", {"jobs": [{"business": "I make e-bikes"}]}, token="secret")
+        assert status == 202 and len(batch["jobs"]) == 1
+        business = _wait(jobs, batch["jobs"][0]["job_id"])
+        assert business.status == "done" and client.calls["watchman"] == searches
+        assert all(result["cached"] for result in business.results)
+        print("✅ Business job mapped and answered from recent results")
+
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", f"/jobs/{job['job_id']}/events", headers={"Authorization": "Bearer secret", "Last-Event-ID": "2"})
+        response = conn.getresponse()
+        assert response.getheader("Content-Type") == "text/event-stream"
+        stream = response.read().decode("utf-8")
+        conn.close()
+        events = [block for block in stream.split("\n\n") if block.strip()]
+        assert [e.split("\n")[1] for e in events if e.startswith("id:")] == ["event: result"] * 3
+        assert events[-1].startswith("event: end") and "event: status" in stream
+        print("✅ SSE stream resumed after event 2 and closed at the end")
+
+        status, listing = _request(port, "GET", "/jobs?status=done&limit=1", token="secret")
+        assert listing["total"] == 2 and listing["items"][0]["job_id"] == business.job_id and listing["next"]
+        assert _request(port, "DELETE", f"/jobs/{job['job_id']}", token="secret")[0] == 409
+        assert _request(port, "GET", "/health", token="secret")[1]["jobs"] == {"done": 2}
+    finally:
+        server.shutdown()
+        jobs.close(timeout=5)
+
+
+def test_recovery():
+    """Finished jobs survive a restart; an unfinished one resumes without rescanning what it finished"""
+    print("🧪 Testing job recovery")
+    workdir = tempfile.mkdtemp(prefix="sentinel-api-")
+    journal = os.path.join(workdir, "jobs.jsonl")
+    client = FakeGenaiClient(seed=5, latency_scale=0)
+    jobs = JobQueue(_engine(workdir, client), workers=1, journal_path=journal, history=False,
+                    normalizer=Normalizer()).start()
+    done = _wait(jobs, jobs.submit({"suppliers": SUPPLIERS[:2]}).job_id)
+    jobs.close(timeout=5)
+
+    # Simulate a crash two suppliers into a second job: journal its submit, start and first results only
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "submit", "job_id": "crashed", "kind": "suppliers", "request": SUPPLIERS,
+                            "reference": None, "at": time.time()}) + "\n")
+        f.write(json.dumps({"op": "start", "job_id": "crashed", "suppliers": Normalizer().suppliers(SUPPLIERS),
+                            "at": time.time()}) + "\n")
+        for result in done.results:
+            f.write(json.dumps({"op": "result", "job_id": "crashed", "result": result}) + "\n")
+        f.write('{"op": "res')  # torn line
+
+    client = FakeGenaiClient(seed=5, latency_scale=0)
+    restarted = JobQueue(_engine(workdir, client), workers=1, journal_path=journal, history=False,
+                         normalizer=Normalizer()).start()
+    try:
+        assert restarted.get(done.job_id).status == "done" and len(restarted.get(done.job_id).results) == 2
+        resumed = _wait(restarted, "crashed")
+        assert resumed.status == "done" and len(resumed.results) == len(SUPPLIERS)
+        assert client.calls["watchman"] <= 2 * (len(SUPPLIERS) - 2)
+        print(f"✅ Finished job restored; crashed job resumed with {len(SUPPLIERS) - 2} suppliers left")
+    finally:
+        restarted.close(timeout=5)
+
+
+if __name__ == "__main__":
+    test_api_end_to_end()
+    test_recovery()
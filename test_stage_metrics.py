@@ -0,0 +1,112 @@
+"""
+Test stage metrics
+Run this to verify histogram quantiles and the Prometheus text export
+"""
+
+import http.client
+
+from stage_metrics import Histogram, MetricsRegistry, start_metrics_server
+
+
+def test_histogram_quantile():
+    print("🧪 Testing histogram quantiles")
+    assert Histogram().quantile(0.5) == 0.0
+
+    histogram = Histogram()
+    for _ in range(4):
+        histogram.observe(0.3)  # all in the (0.25, 0.5] bucket
+    assert abs(histogram.quantile(0.5) - 0.375) < 1e-9
+    assert abs(histogram.quantile(1.0) - 0.5) < 1e-9
+
+    histogram = Histogram(bounds=(1.0, 2.0))
+    for value in (0.5, 0.5, 1.5, 100.0):
+        histogram.observe(value)
+    assert abs(histogram.quantile(0.25) - 0.5) < 1e-9  # halfway through the first bucket
+    assert abs(histogram.quantile(0.75) - 2.0) < 1e-9
+    assert histogram.quantile(0.99) == 2.0  # +Inf bucket reports its lower bound
+    assert histogram.count == 4 and histogram.total == 102.5
+    print("✅ Quantiles interpolated inside their bucket")
+
+
+def test_render_prometheus():
+    print("🧪 Testing Prometheus export")
+    registry = MetricsRegistry()
+    registry.observe("watchman", "ok", 0.3)
+    registry.observe("watchman", "ok", 7.0)
+    registry.observe("analyst", "error", 120.0)
+    registry.inc("model_calls", stage="watchman")
+    registry.inc("model_calls", stage="watchman")
+    registry.inc("tokens", 150, stage="analyst", kind="input")
+    registry.inc("retries")
+    lines = registry.render_prometheus().splitlines()
+
+    assert "# TYPE sentinel_stage_latency_seconds histogram" in lines
+    labels = 'stage="watchman",outcome="ok"'
+    assert f'sentinel_stage_latency_seconds_bucket{{{labels},le="0.25"}} 0' in lines
+    assert f'sentinel_stage_latency_seconds_bucket{{{labels},le="0.5"}} 1' in lines
+    assert f'sentinel_stage_latency_seconds_bucket{{{labels},le="10"}} 2' in lines
+    assert f'sentinel_stage_latency_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f"sentinel_stage_latency_seconds_sum{{{labels}}} 7.300000" in lines
+    assert f"sentinel_stage_latency_seconds_count{{{labels}}} 2" in lines
+    errors = 'stage="analyst",outcome="error"'
+    assert f'sentinel_stage_latency_seconds_bucket{{{errors},le="60"}} 0' in lines
+    assert f'sentinel_stage_latency_seconds_bucket{{{errors},le="+Inf"}} 1' in lines
+    print("✅ Histogram buckets cumulative, with sum and count")
+
+    assert lines.count("# TYPE sentinel_model_calls_total counter") == 1
+    assert 'sentinel_model_calls_total{stage="watchman"} 2' in lines
+    assert 'sentinel_tokens_total{kind="input",stage="analyst"} 150' in lines
+    assert "sentinel_retries_total 1" in lines
+    assert lines[-1].startswith("sentinel_uptime_seconds ")
+    print("✅ Counters typed once, labels sorted, uptime last")
+
+
+def test_view_since_snapshot():
+    print("🧪 Testing per-viewer baseline")
+    registry = MetricsRegistry()
+    registry.observe("watchman", "ok", 0.3)
+    registry.observe("analyst", "ok", 1.0)
+    registry.inc("model_calls", stage="watchman")
+    baseline = registry.snapshot()
+    registry.observe("watchman", "ok", 7.0)
+    registry.observe("watchman", "error", 2.0)
+    registry.inc("model_calls", stage="watchman")
+    registry.inc("retries")
+
+    rows = {(row["stage"], row["outcome"]): row for row in registry.stage_summary(since=baseline)}
+    assert set(rows) == {("watchman", "ok"), ("watchman", "error")}  # analyst had nothing new
+    assert rows[("watchman", "ok")]["count"] == 1 and rows[("watchman", "ok")]["total_s"] == 7.0
+    assert registry.counter_values(since=baseline) == [("model_calls", {"stage": "watchman"}, 1), ("retries", {}, 1)]
+    assert len(registry.stage_summary()) == 3 and "sentinel_model_calls_total{stage=\"watchman\"} 2" in registry.render_prometheus()
+    print("✅ View counts from the snapshot; totals and export untouched")
+
+
+def test_metrics_server_access():
+    print("🧪 Testing /metrics access")
+    try:
+        start_metrics_server(0, host="0.0.0.0", token="")
+        raise AssertionError("served /metrics beyond loopback without a token")
+    except ValueError:
+        pass
+    server = start_metrics_server(0, token="secret")
+    host, port = server.server_address[:2]
+    try:
+        assert host == "127.0.0.1"
+        for headers, expected in (({}, 401), ({"Authorization": "Bearer secret"}, 200)):
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            conn.request("GET", "/metrics", headers=headers)
+            response = conn.getresponse()
+            body = response.read().decode("utf-8")
+            conn.close()
+            assert response.status == expected, headers
+        assert "sentinel_uptime_seconds" in body
+    finally:
+        server.shutdown()
+    print("✅ Loopback by default, bearer token enforced, open binds refused without one")
+
+
+if __name__ == "__main__":
+    test_histogram_quantile()
+    test_render_prometheus()
+    test_view_since_snapshot()
+    test_metrics_server_access()
@@ -0,0 +1,30 @@
+"""
+Test cold-start behaviour of the CLI modules
+Run this to verify that importing them has no side effects and stays light
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_import_is_side_effect_free():
+    """Importing the CLI modules loads no heavy dependencies and creates no files"""
+    print("🧪 Testing lazy imports")
+    workdir = tempfile.mkdtemp(prefix="sentinel-startup-")
+    probe = ("import sys; sys.path.insert(0, sys.argv[1]); import supply_sentinel, config_agent; "
+             "print(','.join(m for m in ('google.genai', 'dotenv', 'http.server', 'numpy') if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-c", probe, ROOT], cwd=workdir, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "", f"imported eagerly: {proc.stdout.strip()}"
+    print("✅ google.genai, dotenv, http.server and numpy are deferred")
+
+    assert os.listdir(workdir) == [], os.listdir(workdir)
+    print("✅ No logs directory or files created at import")
+
+
+if __name__ == "__main__":
+    test_import_is_side_effect_free()
@@ -0,0 +1,76 @@
+"""
+Test the shared supply graph
+Run this to verify that each material/location pair is scanned once for every business
+"""
+
+import os
+import tempfile
+
+from fake_genai import FakeGenaiClient
+from normalize import Normalizer
+from sentinel_engine import JsonAlertHistory, MonitoringEngine
+from supply_graph import SupplyGraph
+
+PAIRS = [("Lithium", "Chile"), ("Cobalt", "DRC"), ("Semiconductors", "Taiwan"), ("Copper", "Peru"),
+         ("Rare Earths", "China"), ("Nickel", "Indonesia"), ("Graphite", "China"), ("Palm Oil", "Malaysia")]
+
+
+def _business(i):
+    """Three dependencies per business, drawn from a small shared pool"""
+    return [{"material": m, "location": l} for m, l in (PAIRS[i % 8], PAIRS[(i * 3 + 1) % 8], PAIRS[(i * 5 + 2) % 8])]
+
+
+def test_inverted_index():
+    """Distinct pairs stay flat as businesses grow; priorities and renames are tracked"""
+    print("🧪 Testing supply graph")
+    graph = SupplyGraph(normalizer=Normalizer())
+    for i in range(1000):
+        graph.add_business(f"biz-{i}", _business(i))
+    stats = graph.stats()
+    assert stats["businesses"] == 1000 and stats["pairs"] <= len(PAIRS) and len(graph.pairs) == len(PAIRS)
+    assert stats["scans_saved"] == stats["edges"] - stats["pairs"]
+    print(f"✅ {stats['edges']:,} dependencies collapse to {stats['pairs']} pairs to scan")
+
+    # Spelling variants hit the same pair; the highest priority any business gives a pair wins
+    graph.add_business("vip", [{"material": "cobalt", "location": "Democratic Republic of Congo", "priority": "high"}])
+    assert "vip" in graph.dependents_of("Cobalt", "DRC")
+    rows = {(r["material"], r["location"]): r for r in graph.suppliers()}
+    assert rows[("Cobalt", "Democratic Republic of the Congo")]["priority"] == "high"
+    assert len(rows) == stats["pairs"]
+
+    graph.add_business("vip", [{"material": "Neon", "location": "Ukraine"}])
+    assert "vip" not in graph.dependents_of("Cobalt", "DRC") and graph.dependents_of("Neon", "Ukraine") == {"vip"}
+    graph.remove_business("vip")
+    assert all(r["material"] != "Neon" for r in graph.suppliers())
+    print("✅ Variants merged, priorities combined, businesses replaced and removed")
+
+
+def test_scan_once_and_fan_out():
+    """One scan per pair; the result reaches every dependent business and survives a reload"""
+    workdir = tempfile.mkdtemp(prefix="sentinel-graph-")
+    graph = SupplyGraph(os.path.join(workdir, "graph.json"), normalizer=Normalizer())
+    for i in range(200):
+        graph.add_business(f"biz-{i}", _business(i), context=f"Business {i}")
+
+    client = FakeGenaiClient(seed=2, latency_scale=0)
+    engine = MonitoringEngine(client, history=JsonAlertHistory(os.path.join(workdir, "h.json")),
+                              normalizer=Normalizer(), events=False)
+    pushed = 0
+    for result in engine.scan(graph.suppliers()):
+        pushed += len(graph.record(result))
+    assert client.calls["watchman"] <= 2 * graph.stats()["pairs"]
+    assert pushed == graph.stats()["edges"]
+    assert all(outcome is not None for _, _, outcome in graph.results_for("biz-7"))
+    assert graph.result("Lithium", "Chile") is not None and graph.result("Lithium", "Chile", max_age=-1) is None
+    print(f"✅ {graph.stats()['pairs']} scans pushed to {pushed} business dependencies "
+          f"({client.calls['watchman']} searches for {len(graph)} businesses)")
+
+    graph.save()
+    reloaded = SupplyGraph.load(graph.path, normalizer=Normalizer())
+    assert reloaded.stats() == graph.stats() and reloaded.contexts["biz-3"] == "Business 3"
+    print("✅ Graph saved and reloaded")
+
+
+if __name__ == "__main__":
+    test_inverted_index()
+    test_scan_once_and_fan_out()
@@ -0,0 +1,87 @@
+"""
+Test token accounting and per-cycle budgets
+Run this to verify per-supplier roll-ups and low-priority deferral
+"""
+
+import os
+import tempfile
+
+from fake_genai import FakeResponse, FakeUsage
+from token_ledger import TokenLedger, budget_from_env, load_deferred, prioritize, save_deferred
+
+
+def test_budget_defers_low_priority():
+    """Usage rolls up by supplier and stage; the budget defers everything but high priority"""
+    print("🧪 Testing token ledger")
+    suppliers = [{"material": f"Cobalt {i}", "location": "Chile", "priority": "low" if i % 2 else "normal"} for i in range(6)]
+    suppliers.append({"material": "Lithium", "location": "Chile", "priority": "high"})
+    ordered = prioritize(suppliers, deferred=[("Cobalt 4", "Chile")])
+    assert ordered[0]["material"] == "Lithium" and ordered[1]["material"] == "Cobalt 4"
+    print("✅ High priority first, then last cycle's deferrals")
+
+    ledger = TokenLedger(budget=1200)
+    scanned = []
+    for item in ordered:
+        if ledger.should_defer(item):
+            ledger.defer(item)
+            continue
+        ledger.record("watchman", FakeResponse("news", FakeUsage(100, 50, tool_tokens=150)), item["material"], item["location"])
+        ledger.record("analyst", FakeResponse("{}", FakeUsage(80, 20)), item["material"], item["location"])
+        scanned.append(item["material"])
+
+    summary = ledger.summary()
+    assert scanned == ["Lithium", "Cobalt 4", "Cobalt 0"]
+    assert summary["total"] == 3 * 400 and summary["deferred"] == 4
+    assert summary["by_stage"]["watchman"] == {"input": 300, "output": 150, "tool": 450}
+    assert ledger.supplier_rows(limit=1)[0]["total"] == 400
+    assert summary["estimated_cost_usd"] > 0
+    print(f"✅ Scanned {len(scanned)} suppliers, deferred {summary['deferred']} ({summary['total']} tokens)")
+
+    # Without a budget nothing is deferred, even with no usage metadata
+    ledger = TokenLedger()
+    ledger.record("config", FakeResponse("[]", None))
+    assert not ledger.should_defer(suppliers[1]) and ledger.total == 0
+    print("✅ Unlimited budget never defers")
+
+
+def test_deferred_carried_to_next_run():
+    """A one-shot run's deferred suppliers are saved and go first in the next run"""
+    print("🧪 Testing deferred carry-over")
+    path = os.path.join(tempfile.mkdtemp(prefix="sentinel-ledger-"), "deferred.json")
+    assert load_deferred(path) == []
+    save_deferred([("Tin", "Peru"), ("Zinc", "Bolivia")], path)
+    deferred = load_deferred(path)
+    assert deferred == [("Tin", "Peru"), ("Zinc", "Bolivia")]
+    suppliers = [{"material": m, "location": l} for m, l in (("Copper", "Chile"), ("Tin", "Peru"), ("Zinc", "Bolivia"))]
+    assert [item["material"] for item in prioritize(suppliers, deferred)] == ["Tin", "Zinc", "Copper"]
+    with open(path, "w") as f:
+        f.write("{torn")
+    assert load_deferred(path) == []
+    print("✅ Deferred suppliers survive the process and are scanned first")
+
+
+def test_budget_from_env():
+    print("🧪 Testing SENTINEL_TOKEN_BUDGET parsing")
+    saved = os.environ.get("SENTINEL_TOKEN_BUDGET")
+    try:
+        for value, expected in (("", None), ("0", None), ("200000", 200000), (" 5000 ", 5000)):
+            os.environ["SENTINEL_TOKEN_BUDGET"] = value
+            assert budget_from_env() == expected, value
+        os.environ["SENTINEL_TOKEN_BUDGET"] = "200k"
+        try:
+            budget_from_env()
+            raise AssertionError("malformed budget accepted")
+        except ValueError as e:
+            assert "SENTINEL_TOKEN_BUDGET" in str(e) and "200k" in str(e)
+    finally:
+        if saved is None:
+            os.environ.pop("SENTINEL_TOKEN_BUDGET", None)
+        else:
+            os.environ["SENTINEL_TOKEN_BUDGET"] = saved
+    print("✅ Budgets parsed; a malformed one is reported by name")
+
+
+if __name__ == "__main__":
+    test_budget_defers_low_priority()
+    test_deferred_carried_to_next_run()
+    test_budget_from_env()
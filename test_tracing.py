@@ -0,0 +1,97 @@
+"""
+Test per-supplier tracing
+Run this to verify span nesting, trace IDs and the Chrome trace export
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from logging_config import log_context
+from tracing import TraceBuffer, tracer, span, start_trace, export_chrome_trace
+
+
+def _scan(material):
+    with start_trace("supplier", material=material, location="Chile"):
+        with span("watchman") as stage:
+            with span("generate_content"):
+                assert log_context("watchman", material)["trace_id"] == stage.trace_id
+            stage.set(outcome="ok")
+
+
+def test_trace_export():
+    """Every supplier gets its own trace; nested spans share it and export as ph:X events"""
+    print("🧪 Testing tracing")
+    tracer.clear()
+    tracer.recording = False
+    _scan("Cobalt")
+    assert tracer.events() == []
+    print("✅ Nothing buffered while not recording (trace IDs still set)")
+
+    tracer.recording = True
+    threads = [threading.Thread(target=_scan, args=(f"Cobalt {i}",), name=f"scan-{i}") for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = tracer.events()
+    suppliers = [e for e in events if e["name"] == "supplier"]
+    assert len(suppliers) == 4 and len(events) == 12
+    assert len({e["args"]["trace_id"] for e in suppliers}) == 4
+    by_id = {e["args"]["span_id"]: e for e in events}
+    for event in events:
+        parent = by_id.get(event["args"].get("parent_id"))
+        if parent is not None:
+            assert parent["args"]["trace_id"] == event["args"]["trace_id"]
+            assert parent["ts"] <= event["ts"] and event["ts"] + event["dur"] <= parent["ts"] + parent["dur"] + 1
+    print("✅ Spans nest inside their supplier trace")
+
+    assert "trace_id" not in log_context("dispatcher")
+    print("✅ Log context carries the trace ID only inside a trace")
+
+    path = os.path.join(tempfile.mkdtemp(prefix="sentinel-trace-"), "cycle.json")
+    assert export_chrome_trace(path) == 12
+    with open(path, "r") as f:
+        document = json.load(f)
+    named = {e["tid"]: e["args"]["name"] for e in document["traceEvents"] if e["ph"] == "M"}
+    assert all(e["tid"] in named for e in document["traceEvents"] if e["ph"] == "X")
+    assert all(name.startswith("scan-") for name in named.values())
+    print("✅ Chrome trace export with thread names")
+    tracer.recording = False
+    tracer.clear()
+
+
+def test_capture_per_run():
+    """Concurrent runs (Streamlit sessions) each capture only their own spans; nothing reaches the shared buffer"""
+    print("🧪 Testing per-run capture")
+    tracer.clear()
+    buffers = {}
+
+    def run(name):
+        buffers[name] = TraceBuffer()
+        token = tracer.capture(buffers[name])
+        try:
+            for i in range(3):
+                _scan(f"{name} {i}")
+        finally:
+            tracer.release(token)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("alice", "bob")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name, buffer in buffers.items():
+        materials = {e["args"]["material"] for e in buffer.events() if e["name"] == "supplier"}
+        assert materials == {f"{name} {i}" for i in range(3)} and len(buffer) == 9
+    assert tracer.events() == []
+    _scan("after")
+    assert tracer.events() == []
+    print("✅ Each run saw its own 9 spans; the shared buffer stayed empty")
+
+
+if __name__ == "__main__":
+    test_trace_export()
+    test_capture_per_run()
@@ -0,0 +1,159 @@
+"""
+SupplySentinel Token Ledger
+Per-cycle token and cost accounting by supplier and stage, with an optional
+token budget that defers low-priority suppliers instead of overrunning
+
+    ledger = TokenLedger(budget=200_000)
+    for item in prioritize(suppliers):
+        if ledger.should_defer(item):
+            ledger.defer(item)
+            continue
+        ...  # agents call ledger.record(stage, response, material, location)
+    print(ledger.summary())
+"""
+
+import json
+import os
+import threading
+
+from logging_config import LOGS_DIR
+from stage_metrics import record_model_call
+
+# Suppliers deferred for budget, carried to the next run (the CLI is one-shot by default)
+DEFERRED_FILE = os.path.join(LOGS_DIR, "deferred.json")
+
+TOKEN_KINDS = ("input", "output", "tool")
+
+# USD per 1M tokens for gemini-2.5-flash (paid tier); tool-use prompt tokens bill as input
+TOKEN_PRICES = {"input": 0.30, "output": 2.50, "tool": 0.30}
+
+# Suppliers may carry "priority": "high" | "normal" | "low" in suppliers.json;
+# high-priority suppliers are always scanned, even over budget
+PRIORITY_RANK = {"high": 0, "normal": 1, "low": 2}
+
+_USAGE_ATTRS = (("input", "prompt_token_count"),
+                ("output", "candidates_token_count"),
+                ("tool", "tool_use_prompt_token_count"))
+
+
+def supplier_priority(item):
+    priority = str(item.get("priority", "normal")).lower()
+    return priority if priority in PRIORITY_RANK else "normal"
+
+
+def prioritize(suppliers, deferred=()):
+    """High priority first, then suppliers deferred last cycle, then the rest (stable order)"""
+    carried = set(deferred)
+    return sorted(suppliers, key=lambda item: (PRIORITY_RANK[supplier_priority(item)],
+                                              (item.get("material"), item.get("location")) not in carried))
+
+
+def budget_from_env():
+    """SENTINEL_TOKEN_BUDGET (tokens per cycle); unset or 0 means unlimited, anything else non-numeric is a ValueError"""
+    value = os.getenv("SENTINEL_TOKEN_BUDGET", "").strip()
+    if not value:
+        return None
+    try:
+        budget = int(value)
+    except ValueError:
+        raise ValueError(f"SENTINEL_TOKEN_BUDGET must be a whole number of tokens per cycle, got {value!r}") from None
+    return budget if budget > 0 else None
+
+
+def load_deferred(path=DEFERRED_FILE):
+    """[(material, location)] deferred by the last run; empty when none were or the file is unreadable"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [tuple(pair) for pair in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def save_deferred(deferred, path=DEFERRED_FILE):
+    """Replace the carried-over list atomically"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([list(pair) for pair in deferred], f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def estimate_cost(tokens):
+    return sum(tokens.get(kind, 0) * TOKEN_PRICES[kind] for kind in TOKEN_KINDS) / 1_000_000
+
+
+class TokenLedger:
+    """Thread-safe token counts for one cycle, keyed by supplier and by stage"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self.by_supplier = {}  # (material, location) -> {kind: tokens}
+        self.by_stage = {}     # stage -> {kind: tokens}
+        self.totals = dict.fromkeys(TOKEN_KINDS, 0)
+        self.calls = 0
+        self.deferred = []
+
+    def record(self, stage, response, material=None, location=None):
+        """Count a model call's usage metadata (also feeds the Prometheus counters)"""
+        record_model_call(stage, response)
+        usage = getattr(response, "usage_metadata", None)
+        tokens = {kind: (getattr(usage, attr, None) or 0) if usage is not None else 0
+                  for kind, attr in _USAGE_ATTRS}
+        with self._lock:
+            self.calls += 1
+            buckets = [self.totals, self.by_stage.setdefault(stage, dict.fromkeys(TOKEN_KINDS, 0))]
+            if material is not None:
+                buckets.append(self.by_supplier.setdefault((material, location), dict.fromkeys(TOKEN_KINDS, 0)))
+            for bucket in buckets:
+                for kind, count in tokens.items():
+                    bucket[kind] += count
+        return tokens
+
+    @property
+    def total(self):
+        return sum(self.totals.values())
+
+    def projected_per_supplier(self):
+        """Mean tokens per supplier scanned so far (0 before the first one)"""
+        with self._lock:
+            if not self.by_supplier:
+                return 0
+            return sum(sum(tokens.values()) for tokens in self.by_supplier.values()) / len(self.by_supplier)
+
+    def should_defer(self, item):
+        """True if scanning this supplier would likely push the cycle over budget"""
+        if self.budget is None or supplier_priority(item) == "high":
+            return False
+        return self.total + self.projected_per_supplier() > self.budget
+
+    def defer(self, item):
+        with self._lock:
+            self.deferred.append((item.get("material"), item.get("location")))
+
+    def supplier_rows(self, limit=None):
+        """Per-supplier usage, heaviest first"""
+        with self._lock:
+            rows = [{"material": material, "location": location, **tokens, "total": sum(tokens.values())}
+                    for (material, location), tokens in self.by_supplier.items()]
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def summary(self):
+        """Cycle roll-up for logs and MetricsTracker"""
+        with self._lock:
+            totals = dict(self.totals)
+            by_stage = {stage: dict(tokens) for stage, tokens in self.by_stage.items()}
+            deferred = len(self.deferred)
+            calls = self.calls
+        return {
+            **totals,
+            "total": sum(totals.values()),
+            "calls": calls,
+            "estimated_cost_usd": round(estimate_cost(totals), 6),
+            "by_stage": by_stage,
+            "budget": self.budget,
+            "deferred": deferred,
+        }
@@ -0,0 +1,227 @@
+"""
+SupplySentinel Tracing
+Lightweight in-process spans, exportable as Chrome trace-event JSON
+
+Every supplier pass gets its own trace ID; stages, model calls and file writes
+inside it become nested spans. Export a cycle and open it in chrome://tracing
+or https://ui.perfetto.dev to see where the time went:
+
+    with start_trace("supplier", material="Cobalt", location="Chile"):
+        with span("watchman"):
+            ...
+    export_chrome_trace("logs/traces/cycle-1.json")
+
+Spans always carry trace IDs (log lines are correlated by them), but finished
+spans are only kept when something will read them:
+
+    tracer.recording = True             # process-wide buffer (the CLI, for --trace)
+
+    run_trace = TraceBuffer()           # one run's spans only (a Streamlit session)
+    token = tracer.capture(run_trace)
+    try:
+        ...                             # spans closed here, or in threads/tasks started here
+    finally:
+        tracer.release(token)
+
+A process with no consumer, such as the --serve API, never buffers them.
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+
+# Oldest spans are dropped beyond this, so a long-running recorder cannot grow without bound
+MAX_EVENTS = 200_000
+
+_current = contextvars.ContextVar("sentinel_span", default=None)
+_capture = contextvars.ContextVar("sentinel_trace_capture", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "args", "start_ns", "tid", "_token")
+
+    def __init__(self, name, trace_id, parent_id, args):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.args = args
+
+    def set(self, **args):
+        """Attach extra arguments (e.g. an outcome) before the span closes"""
+        self.args.update(args)
+
+
+class TraceBuffer:
+    """Finished spans as Chrome "complete" (ph: X) events, oldest dropped beyond max_events"""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._events = []
+        self._threads = {}
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def append(self, event):
+        with self._lock:
+            self._threads[event["tid"]] = threading.current_thread().name
+            self._events.append(event)
+            if len(self._events) > self.max_events:
+                overflow = len(self._events) - self.max_events
+                del self._events[:overflow]
+                self.dropped += overflow
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._threads.clear()
+            self.dropped = 0
+
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def chrome_trace(self):
+        """Trace-event document: spans plus thread-name metadata"""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in threads.items()]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+
+class Tracer:
+    """Opens and closes spans; finished ones go to a captured TraceBuffer or, when recording, the shared one"""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = True
+        self.recording = False  # keep finished spans for events() / chrome_trace()
+        self.buffer = TraceBuffer(max_events)
+        self._epoch_ns = time.perf_counter_ns()
+
+    @property
+    def dropped(self):
+        return self.buffer.dropped
+
+    def capture(self, buffer):
+        """Send spans closed in the current context (and threads/tasks it starts) to buffer; returns a token"""
+        return _capture.set(buffer)
+
+    def release(self, token):
+        _capture.reset(token)
+
+    def _open(self, name, args, new_trace):
+        parent = _current.get()
+        if new_trace or parent is None:
+            trace_id = uuid.uuid4().hex[:16]
+        else:
+            trace_id = parent.trace_id
+        span = Span(name, trace_id, parent.span_id if parent else None, args)
+        span.tid = threading.get_ident()
+        span._token = _current.set(span)
+        span.start_ns = time.perf_counter_ns()
+        return span
+
+    def _close(self, span, error):
+        end_ns = time.perf_counter_ns()
+        _current.reset(span._token)
+        target = _capture.get()
+        if target is None:
+            if not self.recording:
+                return
+            target = self.buffer
+        args = {"trace_id": span.trace_id, "span_id": span.span_id, **span.args}
+        if span.parent_id is not None:
+            args["parent_id"] = span.parent_id
+        if error is not None:
+            args["error"] = type(error).__name__
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": (span.start_ns - self._epoch_ns) / 1000,
+            "dur": (end_ns - span.start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": span.tid,
+            "args": args,
+        }
+        target.append(event)
+
+    def clear(self):
+        self.buffer.clear()
+
+    def events(self):
+        return self.buffer.events()
+
+    def chrome_trace(self):
+        return self.buffer.chrome_trace()
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "name", "args", "new_trace", "span")
+
+    def __init__(self, tracer, name, args, new_trace):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.new_trace = new_trace
+        self.span = None
+
+    def __enter__(self):
+        if self.tracer.enabled:
+            self.span = self.tracer._open(self.name, self.args, self.new_trace)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.tracer._close(self.span, exc)
+        return False
+
+    def set(self, **args):
+        if self.span is not None:
+            self.span.set(**args)
+
+    @property
+    def trace_id(self):
+        return self.span.trace_id if self.span is not None else None
+
+
+# Process-wide tracer shared by the CLI, the Streamlit app and benchmarks
+tracer = Tracer()
+
+
+def span(name, **args):
+    """Nested span under the current one: `with span("generate_content", model=...): ...`"""
+    return _SpanContext(tracer, name, args, new_trace=False)
+
+
+def start_trace(name, **args):
+    """Root span with a fresh trace ID (one per supplier pass)"""
+    return _SpanContext(tracer, name, args, new_trace=True)
+
+
+def current_trace_id():
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+
+def export_chrome_trace(path):
+    """Write the collected spans as Chrome trace-event JSON; returns the span count"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    document = tracer.chrome_trace()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(document, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return sum(1 for event in document["traceEvents"] if event["ph"] == "X")